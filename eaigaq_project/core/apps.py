@@ -1,7 +1,15 @@
 # core/apps.py
 
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
 
 class CoreConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'core'
+
+    def ready(self):
+        from . import audit, signals  # noqa: F401
+        from .search import create_postgres_indexes
+
+        post_migrate.connect(create_postgres_indexes, sender=self)
+        audit.connect()
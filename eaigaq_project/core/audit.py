@@ -0,0 +1,205 @@
+# core/audit.py
+
+import contextvars
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import models
+from django.db import transaction
+from django.db.models.signals import post_delete, post_init, post_save
+from django.utils import timezone
+
+CREATE = 'create'
+UPDATE = 'update'
+DELETE = 'delete'
+
+# Модели, которые не аудируются: сам журнал и производные данные
+EXCLUDED_MODELS = {'auditentry', 'auditoutbox', 'recordingsegment', 'searchtoken', 'statcounter', 'tombstone'}
+# Поля, значения которых не попадают в журнал
+EXCLUDED_FIELDS = {'password'}
+
+_current_request = contextvars.ContextVar('audit_request', default=None)
+
+
+class AuditUserMiddleware:
+    """
+    Запоминает текущий запрос, чтобы сигналы аудита знали, кто вносит изменения.
+    Работает и под WSGI, и под ASGI без перевода запроса в отдельный поток.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        token = _current_request.set(request)
+        try:
+            return self.get_response(request)
+        finally:
+            _current_request.reset(token)
+
+    async def __acall__(self, request):
+        token = _current_request.set(request)
+        try:
+            return await self.get_response(request)
+        finally:
+            _current_request.reset(token)
+
+
+def current_user():
+    request = _current_request.get()
+    user = getattr(request, 'user', None)
+    if user is not None and user.is_authenticated:
+        return user
+    return None
+
+
+# ---------------------------
+# Снимки и разница полей
+# ---------------------------
+
+def _audited_fields(model):
+    return [
+        field for field in model._meta.concrete_fields
+        if field.name not in EXCLUDED_FIELDS and not isinstance(field, models.BinaryField)
+    ]
+
+
+def snapshot(instance):
+    # Только загруженные значения: обращение к отложенному полю вызвало бы запрос
+    values = instance.__dict__
+    return {field.attname: values[field.attname] for field in _audited_fields(type(instance)) if field.attname in values}
+
+
+def build_entry(instance, action, user=None, changes=None):
+    """
+    Собирает (не сохраняя) запись исходящей очереди аудита. changes — {поле: [было, стало]}
+    для обновлений; для создания и удаления в data пишутся все значения.
+    """
+    from .models import AuditOutbox
+
+    if changes is None:
+        data = snapshot(instance)
+    else:
+        data = changes
+    return AuditOutbox(
+        object_id=instance.pk,
+        table_name=instance._meta.db_table,
+        class_name=type(instance).__name__,
+        action=action,
+        fields=sorted(data),
+        data=data,
+        user=user,
+        region=user.region if user else None,
+        department_id=user.department_id if user else None,
+        created=timezone.now(),
+    )
+
+
+# ---------------------------
+# Запись
+# ---------------------------
+
+def record(entries):
+    """
+    Кладёт записи в исходящую очередь аудита (AuditOutbox) в текущей транзакции:
+    изменение и запись фиксируются или откатываются вместе. Очередь — таблица без
+    индексов, в журнал (AuditEntry) её переносит команда drain_audit.
+    """
+    from .models import AuditOutbox
+
+    entries = list(entries)
+    if entries:
+        AuditOutbox.objects.bulk_create(entries, batch_size=getattr(settings, 'AUDIT_BATCH_SIZE', 500))
+
+
+def drain(batch_size=None):
+    """
+    Переносит одну пачку из очереди в журнал и удаляет её из очереди.
+    Строки блокируются с SKIP LOCKED, поэтому обработчиков может быть несколько.
+    Возвращает число перенесённых записей.
+    """
+    from .models import AuditEntry, AuditOutbox
+
+    batch_size = batch_size or getattr(settings, 'AUDIT_BATCH_SIZE', 500)
+    names = [field.attname for field in AuditOutbox._meta.concrete_fields if not field.primary_key]
+    with transaction.atomic():
+        rows = list(AuditOutbox.objects.select_for_update(skip_locked=True).order_by('id')[:batch_size])
+        if not rows:
+            return 0
+        AuditEntry.objects.bulk_create(
+            AuditEntry(**{name: getattr(row, name) for name in names}) for row in rows
+        )
+        AuditOutbox.objects.filter(pk__in=[row.pk for row in rows]).delete()
+    return len(rows)
+
+
+def record_instances(instances, action, user=None, changes=None):
+    """
+    Для массовых операций (bulk_create / update), которые не отправляют сигналы.
+    """
+    if user is None:
+        user = current_user()
+    record(build_entry(instance, action, user, changes) for instance in instances)
+
+
+# ---------------------------
+# Сигналы
+# ---------------------------
+
+def _is_audited(sender):
+    return sender._meta.app_label == 'core' and sender._meta.model_name not in EXCLUDED_MODELS
+
+
+def _audited_attnames(model, update_fields=None):
+    fields = _audited_fields(model)
+    if update_fields is not None:
+        update_fields = set(update_fields)
+        fields = [field for field in fields if field.name in update_fields or field.attname in update_fields]
+    return [field.attname for field in fields]
+
+
+def _on_init(sender, instance, **kwargs):
+    # Прежние значения берутся из уже загруженных полей, без повторного чтения перед сохранением
+    if instance.pk is not None and _is_audited(sender):
+        instance._audit_previous = snapshot(instance)
+
+
+def _on_save(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    if raw or not _is_audited(sender):
+        return
+    previous = instance.__dict__.get('_audit_previous')
+    instance._audit_previous = snapshot(instance)
+    if created:
+        entry = build_entry(instance, CREATE, current_user())
+    else:
+        current = snapshot(instance)
+        if update_fields is not None:
+            names = set(_audited_attnames(sender, update_fields))
+            current = {name: value for name, value in current.items() if name in names}
+        previous = previous or {}
+        changes = {
+            name: [previous.get(name), value]
+            for name, value in current.items()
+            if name not in previous or previous[name] != value
+        }
+        if not changes:
+            return
+        entry = build_entry(instance, UPDATE, current_user(), changes)
+    record([entry])
+
+
+def _on_delete(sender, instance, **kwargs):
+    if _is_audited(sender):
+        record([build_entry(instance, DELETE, current_user())])
+
+
+def connect():
+    post_init.connect(_on_init, dispatch_uid='audit_post_init')
+    post_save.connect(_on_save, dispatch_uid='audit_post_save')
+    post_delete.connect(_on_delete, dispatch_uid='audit_post_delete')
@@ -0,0 +1,63 @@
+# core/backends.py
+
+import asyncio
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth import backends, get_user_model
+from django.contrib.auth.hashers import verify_password
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """
+    Пул потоков для хеширования паролей. Размер ограничен (AUTH_HASH_WORKERS),
+    чтобы волна входов в начале смены не заняла все потоки процесса.
+    """
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ThreadPoolExecutor(
+                    max_workers=getattr(settings, 'AUTH_HASH_WORKERS', 4), thread_name_prefix='auth-hash'
+                )
+    return _pool
+
+
+async def run_hasher(func, *args):
+    return await asyncio.get_running_loop().run_in_executor(get_pool(), functools.partial(func, *args))
+
+
+class ModelBackend(backends.ModelBackend):
+    """
+    ModelBackend, у которого асинхронная аутентификация не блокирует цикл
+    событий: пользователь читается асинхронным ORM, а проверка пароля
+    (PBKDF2, сотни миллисекунд CPU) выполняется в пуле потоков.
+    Синхронный authenticate() не меняется.
+    """
+
+    async def aauthenticate(self, request, username=None, password=None, **kwargs):
+        UserModel = get_user_model()
+        if username is None:
+            username = kwargs.get(UserModel.USERNAME_FIELD)
+        if username is None or password is None:
+            return None
+        try:
+            user = await UserModel._default_manager.aget_by_natural_key(username)
+        except UserModel.DoesNotExist:
+            # Хешируем впустую, чтобы время ответа не выдавало существование пользователя (#20760)
+            await run_hasher(UserModel().set_password, password)
+            return None
+        is_correct, must_update = await run_hasher(verify_password, password, user.password)
+        if is_correct and must_update:
+            # Пароль захеширован устаревшими параметрами — перехешируем
+            await run_hasher(user.set_password, password)
+            user._password = None
+            await user.asave(update_fields=['password'])
+        if is_correct and self.user_can_authenticate(user):
+            return user
+        return None
@@ -0,0 +1,311 @@
+# core/biometrics.py
+
+import io
+import threading
+import time
+
+import numpy as np
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+EMBEDDING_DTYPE = np.dtype('<f4')
+
+
+# ---------------------------
+# Кодировщик: изображение -> вектор признаков
+# ---------------------------
+
+class PixelProjectionEncoder:
+    """
+    Локальный кодировщик без внешних моделей.
+
+    Изображение приводится к квадрату side x side в оттенках серого,
+    нормализуется по яркости и контрасту и проецируется фиксированной
+    случайной матрицей в вектор длины dim (L2-нормированный float32).
+    Пакет изображений кодируется одним матричным умножением.
+
+    Реальную нейросетевую модель можно подключить через FACE_EMBEDDING_ENCODER,
+    реализовав тот же интерфейс (dim, preprocess, embed, encode).
+    """
+    dim = 128
+    side = 64
+    seed = 20240901
+
+    def __init__(self):
+        rng = np.random.default_rng(self.seed)
+        self.projection = rng.standard_normal((self.side * self.side, self.dim)).astype(np.float32)
+        self.projection /= np.sqrt(self.dim)
+
+    def preprocess(self, image):
+        """
+        Принимает bytes, файл, PIL.Image или numpy-массив, возвращает вектор пикселей float32.
+        """
+        from PIL import Image, ImageOps, UnidentifiedImageError
+
+        if isinstance(image, np.ndarray):
+            image = Image.fromarray(image)
+        elif not isinstance(image, Image.Image):
+            content = image.read() if hasattr(image, 'read') else bytes(image)
+            try:
+                image = Image.open(io.BytesIO(content))
+                image.load()
+            except (UnidentifiedImageError, OSError):
+                raise ValueError('Не удалось прочитать изображение.')
+        image = ImageOps.fit(image.convert('L'), (self.side, self.side))
+        pixels = np.asarray(image, dtype=np.float32).reshape(-1)
+        pixels -= pixels.mean()
+        std = pixels.std()
+        if std > 0:
+            pixels /= std
+        return pixels
+
+    def embed(self, pixels):
+        """
+        pixels: массив (n, side*side). Возвращает (n, dim) L2-нормированных векторов.
+        """
+        vectors = np.asarray(pixels, dtype=np.float32) @ self.projection
+        return normalize(vectors)
+
+    def encode(self, image):
+        return self.embed(self.preprocess(image)[np.newaxis, :])[0]
+
+
+_encoder = None
+_encoder_lock = threading.Lock()
+
+
+def get_encoder():
+    global _encoder
+    if _encoder is None:
+        with _encoder_lock:
+            if _encoder is None:
+                _encoder = import_string(settings.FACE_EMBEDDING_ENCODER)()
+    return _encoder
+
+
+def login_enabled():
+    """
+    Вход по лицу разрешён только явно (FACE_LOGIN_ENABLED) и только с настоящим
+    кодировщиком: PixelProjectionEncoder для выдачи сессии не используется.
+    """
+    return getattr(settings, 'FACE_LOGIN_ENABLED', False) and not isinstance(
+        get_encoder(), PixelProjectionEncoder,
+    )
+
+
+def recognition_enabled():
+    """
+    Распознавание с камер тоже открывает сессии (присутствия), поэтому и ему нужен
+    настоящий кодировщик. FACE_ALLOW_PIXEL_ENCODER — только для тестов и разработки.
+    """
+    return getattr(settings, 'FACE_ALLOW_PIXEL_ENCODER', False) or not isinstance(
+        get_encoder(), PixelProjectionEncoder,
+    )
+
+
+def normalize(vectors):
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    norms[norms == 0] = 1
+    return (vectors / norms).astype(np.float32, copy=False)
+
+
+def to_bytes(vector):
+    return np.asarray(vector, dtype=EMBEDDING_DTYPE).tobytes()
+
+
+def from_bytes(data):
+    return np.frombuffer(bytes(data), dtype=EMBEDDING_DTYPE)
+
+
+# ---------------------------
+# Индекс векторов активных пользователей
+# ---------------------------
+
+class _Partition:
+    """
+    Векторы пользователей одного региона: матрица (n, dim) с запасом по ёмкости
+    и параллельные массивы user_id / department_id.
+    """
+
+    def __init__(self, dim, capacity=64):
+        self.size = 0
+        self.matrix = np.zeros((capacity, dim), dtype=np.float32)
+        self.user_ids = np.zeros(capacity, dtype=np.int64)
+        self.department_ids = np.zeros(capacity, dtype=np.int64)
+        self.rows = {}
+
+    def upsert(self, user_id, department_id, vector):
+        row = self.rows.get(user_id)
+        if row is None:
+            if self.size == len(self.user_ids):
+                self._grow()
+            row = self.size
+            self.size += 1
+            self.rows[user_id] = row
+            self.user_ids[row] = user_id
+        self.department_ids[row] = department_id or 0
+        self.matrix[row] = vector
+
+    def discard(self, user_id):
+        row = self.rows.pop(user_id, None)
+        if row is None:
+            return None
+        vector = self.matrix[row].copy()
+        last = self.size - 1
+        if row != last:
+            # Переносим последнюю строку на место удалённой — O(dim)
+            self.matrix[row] = self.matrix[last]
+            self.user_ids[row] = self.user_ids[last]
+            self.department_ids[row] = self.department_ids[last]
+            self.rows[int(self.user_ids[row])] = row
+        self.size = last
+        return vector
+
+    def scores(self, vectors, department_id=None):
+        """
+        Косинусная близость пакета векторов (m, dim) ко всем строкам: (m, n).
+        """
+        scores = vectors @ self.matrix[:self.size].T
+        if department_id is not None:
+            scores[:, self.department_ids[:self.size] != department_id] = -np.inf
+        return scores
+
+    def _grow(self):
+        capacity = len(self.user_ids) * 2
+        self.matrix = np.resize(self.matrix, (capacity, self.matrix.shape[1]))
+        self.user_ids = np.resize(self.user_ids, capacity)
+        self.department_ids = np.resize(self.department_ids, capacity)
+
+
+class FaceIndex:
+    """
+    Процессный индекс эталонных векторов активных пользователей, разбитый по регионам.
+
+    Идентификация 1:N — одно матричное умножение по разделу региона
+    (или по всем разделам, если регион не указан). Индекс загружается лениво,
+    поддерживается сигналами при изменении пользователей и векторов и
+    полностью перечитывается раз в FACE_INDEX_MAX_AGE секунд, чтобы
+    подхватить изменения, сделанные другими процессами.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._partitions = {}
+        self._regions = {}
+        self._loaded_at = None
+
+    @property
+    def loaded(self):
+        return self._loaded_at is not None
+
+    def ensure_loaded(self):
+        max_age = getattr(settings, 'FACE_INDEX_MAX_AGE', 300)
+        if self._loaded_at is None or time.monotonic() - self._loaded_at > max_age:
+            self.rebuild()
+
+    def rebuild(self):
+        from .models import FaceEmbedding
+
+        rows = FaceEmbedding.objects.filter(user__is_active=True).values_list(
+            'user_id', 'user__region', 'user__department_id', 'user__department__region', 'vector'
+        )
+        dim = get_encoder().dim
+        partitions, regions = {}, {}
+        for user_id, region, department_id, department_region, vector in rows.iterator(chunk_size=2000):
+            region = region or department_region
+            partition = partitions.get(region)
+            if partition is None:
+                partition = partitions[region] = _Partition(dim)
+            partition.upsert(user_id, department_id, from_bytes(vector))
+            regions[user_id] = region
+        with self._lock:
+            self._partitions, self._regions = partitions, regions
+            self._loaded_at = time.monotonic()
+
+    def clear(self):
+        with self._lock:
+            self._partitions, self._regions = {}, {}
+            self._loaded_at = None
+
+    def upsert(self, user_id, region, department_id, vector):
+        with self._lock:
+            if not self.loaded:
+                return
+            self._discard(user_id)
+            partition = self._partitions.get(region)
+            if partition is None:
+                partition = self._partitions[region] = _Partition(len(vector))
+            partition.upsert(user_id, department_id, vector)
+            self._regions[user_id] = region
+
+    def discard(self, user_id):
+        with self._lock:
+            self._discard(user_id)
+
+    def sync_user(self, user, vector=None):
+        """
+        Обновляет положение пользователя в индексе после изменения его
+        активности, региона, отделения или эталонного вектора.
+        """
+        from .models import FaceEmbedding
+
+        with self._lock:
+            if not self.loaded:
+                return
+            previous = self._discard(user.pk)
+            if not user.is_active:
+                return
+            if vector is None:
+                vector = previous
+            if vector is None:
+                data = FaceEmbedding.objects.filter(user_id=user.pk).values_list('vector', flat=True).first()
+                if data is None:
+                    return
+                vector = from_bytes(data)
+            region = user.region or (user.department.region if user.department_id else None)
+            self.upsert(user.pk, region, user.department_id, vector)
+
+    def identify(self, vector, region=None, department_id=None):
+        """
+        Возвращает (user_id, score) наиболее похожего пользователя
+        или (None, score), если сходство ниже FACE_MATCH_THRESHOLD.
+        """
+        [(user_id, score)] = self.identify_batch(
+            np.asarray(vector, dtype=np.float32)[np.newaxis, :], region, department_id
+        )
+        return user_id, score
+
+    def identify_batch(self, vectors, region=None, department_id=None):
+        self.ensure_loaded()
+        threshold = settings.FACE_MATCH_THRESHOLD
+        count = len(vectors)
+        best_ids = np.zeros(count, dtype=np.int64)
+        best_scores = np.full(count, -np.inf, dtype=np.float32)
+        with self._lock:
+            if region is None:
+                partitions = self._partitions.values()
+            else:
+                partitions = [self._partitions[region]] if region in self._partitions else []
+            for partition in partitions:
+                if partition.size == 0:
+                    continue
+                scores = partition.scores(vectors, department_id)
+                rows = scores.argmax(axis=1)
+                top = scores[np.arange(count), rows]
+                better = top > best_scores
+                best_scores[better] = top[better]
+                best_ids[better] = partition.user_ids[rows[better]]
+        return [
+            (int(user_id) if score >= threshold else None, float(score))
+            for user_id, score in zip(best_ids, best_scores)
+        ]
+
+    def _discard(self, user_id):
+        region = self._regions.pop(user_id, None)
+        partition = self._partitions.get(region)
+        if partition is None:
+            return None
+        return partition.discard(user_id)
+
+
+face_index = FaceIndex()
@@ -0,0 +1,75 @@
+# core/cache.py
+
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+
+_MISSING = object()
+
+
+class LRUCache:
+    """
+    Потокобезопасный процессный LRU-кэш с ограничением по размеру и
+    необязательным временем жизни записей (ttl, секунды).
+
+    Кэш живёт в памяти одного процесса; время жизни ограничивает
+    устаревание данных, изменённых другими процессами.
+    """
+
+    def __init__(self, maxsize=1024, ttl=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            item = self._data.get(key, _MISSING)
+            if item is not _MISSING:
+                value, expires = item
+                if expires is None or expires > time.monotonic():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+            self.misses += 1
+            return default
+
+    def set(self, key, value):
+        expires = time.monotonic() + self.ttl if self.ttl else None
+        with self._lock:
+            self._data[key] = (value, expires)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def delete_many(self, keys):
+        with self._lock:
+            for key in keys:
+                self._data.pop(key, None)
+
+    def keys(self):
+        with self._lock:
+            return list(self._data)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+# Кэш сканирования штрихкодов: barcode -> компактное представление ВД и поля области видимости
+barcode_cache = LRUCache(
+    maxsize=getattr(settings, 'BARCODE_CACHE_SIZE', 10000),
+    ttl=getattr(settings, 'BARCODE_CACHE_TTL', 60),
+)
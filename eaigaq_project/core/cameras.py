@@ -0,0 +1,160 @@
+# core/cameras.py
+
+import time
+from urllib.parse import parse_qs, urlsplit
+
+import numpy as np
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+
+try:
+    import cv2
+except ImportError:
+    cv2 = None
+
+# Источник кадров — итерируемый объект, выдающий пары (время в секундах epoch, кадр).
+# Кадр — numpy-массив (H, W, 3) RGB или уже сжатый JPEG (bytes).
+
+
+class FakeSource:
+    """
+    Синтетические кадры без оборудования: градиент со сдвигающейся полосой и
+    номером кадра в первых пикселях. При realtime=False кадры выдаются сразу,
+    а время идёт от start с шагом 1/fps — для тестов и нагрузочных замеров.
+    """
+
+    def __init__(self, fps=25, width=320, height=240, frames=None, realtime=True, start=None):
+        self.fps = fps
+        self.width = width
+        self.height = height
+        self.frames = frames
+        self.realtime = realtime
+        self.start = time.time() if start is None else start
+        self._closed = False
+
+    def __iter__(self):
+        gradient = np.linspace(0, 255, self.width, dtype=np.uint8)
+        base = np.repeat(np.tile(gradient, (self.height, 1))[:, :, np.newaxis], 3, axis=2)
+        clock = time.monotonic()
+        number = 0
+        while not self._closed and (self.frames is None or number < self.frames):
+            timestamp = self.start + number / self.fps
+            if self.realtime:
+                delay = clock + number / self.fps - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+                timestamp = time.time()
+            frame = base.copy()
+            column = number * 4 % self.width
+            frame[:, column:column + 8] = (255, 0, 0)
+            frame[0, :4, 0] = np.frombuffer(number.to_bytes(4, 'big'), dtype=np.uint8)
+            yield timestamp, frame
+            number += 1
+
+    def close(self):
+        self._closed = True
+
+
+class MJPEGFileSource:
+    """
+    Файл или поток MJPEG (склеенные JPEG, как отдают IP-камеры): кадры выделяются
+    по маркерам начала и конца JPEG без декодирования и идут на запись как есть.
+    """
+    chunk_size = 1 << 16
+
+    def __init__(self, path, fps=25, loop=False, realtime=True):
+        self.path = path
+        self.fps = fps
+        self.loop = loop
+        self.realtime = realtime
+        self._closed = False
+
+    def __iter__(self):
+        clock = time.monotonic()
+        number = 0
+        while not self._closed:
+            for frame in self._read():
+                if self._closed:
+                    return
+                if self.realtime:
+                    delay = clock + number / self.fps - time.monotonic()
+                    if delay > 0:
+                        time.sleep(delay)
+                yield time.time(), frame
+                number += 1
+            if not self.loop:
+                return
+
+    def _read(self):
+        buffer = b''
+        with open(self.path, 'rb') as file:
+            while chunk := file.read(self.chunk_size):
+                buffer += chunk
+                while True:
+                    begin = buffer.find(b'\xff\xd8')
+                    end = buffer.find(b'\xff\xd9', begin + 2) if begin >= 0 else -1
+                    if end < 0:
+                        break
+                    yield buffer[begin:end + 2]
+                    buffer = buffer[end + 2:]
+
+    def close(self):
+        self._closed = True
+
+
+class DeviceSource:
+    """
+    Локальное устройство (номер /dev/videoN) или сетевой поток (rtsp://, http://)
+    через OpenCV. Нужен пакет opencv-python(-headless).
+    """
+
+    def __init__(self, address):
+        if cv2 is None:
+            raise ImproperlyConfigured('Для захвата с устройства нужен пакет opencv-python-headless.')
+        self.address = address
+        self.capture = None
+
+    def __iter__(self):
+        self.capture = cv2.VideoCapture(self.address)
+        if not self.capture.isOpened():
+            raise OSError(f'Не удалось открыть источник {self.address!r}.')
+        while self.capture is not None:
+            ok, frame = self.capture.read()
+            if not ok:
+                return
+            yield time.time(), cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+
+    def close(self):
+        capture, self.capture = self.capture, None
+        if capture is not None:
+            capture.release()
+
+
+def _flag(value):
+    return value.lower() in ('1', 'true', 'yes')
+
+
+def open_source(camera):
+    """
+    Источник кадров камеры по CAMERA_SOURCES[device_id]:
+        fake://?fps=25&width=320&height=240   — синтетические кадры;
+        file:///path/video.mjpeg?fps=25&loop=1 — файл MJPEG;
+        rtsp://..., http://...                 — сетевой поток (OpenCV);
+    без записи — локальное устройство с номером device_id (OpenCV).
+    """
+    address = getattr(settings, 'CAMERA_SOURCES', {}).get(str(camera.device_id))
+    if address is None:
+        return DeviceSource(camera.device_id)
+    parts = urlsplit(address)
+    params = {key: values[-1] for key, values in parse_qs(parts.query).items()}
+    if parts.scheme == 'fake':
+        return FakeSource(
+            fps=float(params.get('fps', 25)),
+            width=int(params.get('width', 320)),
+            height=int(params.get('height', 240)),
+        )
+    if parts.scheme == 'file':
+        return MJPEGFileSource(
+            parts.path, fps=float(params.get('fps', 25)), loop=_flag(params.get('loop', '0')),
+        )
+    return DeviceSource(address)
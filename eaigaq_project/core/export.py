@@ -0,0 +1,273 @@
+# core/export.py
+
+import csv
+import datetime
+import json
+import re
+import zipfile
+from xml.sax.saxutils import escape
+
+from django.utils import timezone
+
+from .models import MaterialEvidenceStatus, Region
+
+CSV = 'csv'
+XLSX = 'xlsx'
+FORMATS = {
+    CSV: 'text/csv; charset=utf-8',
+    XLSX: 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+}
+
+# Строк данных на листе XLSX: предел Excel — 1 048 576 строк вместе с заголовком
+XLSX_SHEET_ROWS = 1048575
+
+
+class Column:
+    """
+    Колонка выгрузки: заголовок, поля для QuerySet.values_list и функция,
+    которая превращает значения этих полей в значение ячейки.
+    """
+
+    __slots__ = ('header', 'fields', 'format')
+
+    def __init__(self, header, *fields, format=None):
+        self.header = header
+        self.fields = fields
+        self.format = format
+
+    def value(self, values):
+        return self.format(*values) if self.format else values[0]
+
+
+def choice(choices):
+    labels = {value: str(label) for value, label in choices.choices}
+    return lambda value: labels.get(value, value)
+
+
+def full_name(first_name, last_name):
+    return f'{first_name or ""} {last_name or ""}'.strip() or None
+
+
+def as_json(value):
+    return json.dumps(value, ensure_ascii=False, default=str) if value else None
+
+
+EVIDENCE_COLUMNS = (
+    Column('ID', 'id'),
+    Column('Название ВД', 'name'),
+    Column('Описание ВД', 'description'),
+    Column('Штрихкод', 'barcode'),
+    Column('Статус', 'status', format=choice(MaterialEvidenceStatus)),
+    Column('Дело', 'case__name'),
+    Column('Отделение', 'case__department__name'),
+    Column('Группа', 'group__name'),
+    Column('Создал', 'created_by__first_name', 'created_by__last_name', format=full_name),
+    Column('У кого', 'last_holder__first_name', 'last_holder__last_name', format=full_name),
+    Column('Последнее событие', 'last_event_at'),
+    Column('Создано', 'created'),
+    Column('Обновлено', 'updated'),
+    Column('Активно', 'active'),
+)
+
+AUDIT_COLUMNS = (
+    Column('ID', 'id'),
+    Column('Время', 'created'),
+    Column('Действие', 'action'),
+    Column('Объект', 'class_name'),
+    Column('ID объекта', 'object_id'),
+    Column('Поля', 'fields', format=as_json),
+    Column('Данные', 'data', format=as_json),
+    Column('Пользователь', 'user__username'),
+    Column('ФИО', 'user__first_name', 'user__last_name', format=full_name),
+    Column('Регион', 'region', format=choice(Region)),
+    Column('Отделение', 'department__name'),
+)
+
+
+def query_fields(columns):
+    return [field for column in columns for field in column.fields]
+
+
+def rows(columns, queryset, chunk_size):
+    """
+    Строки выгрузки по QuerySet.values_list(...).iterator(): в памяти не больше
+    одной пачки chunk_size строк (на PostgreSQL — серверный курсор).
+    """
+    spans = []
+    start = 0
+    for column in columns:
+        spans.append((column, start, start + len(column.fields)))
+        start += len(column.fields)
+    for values in queryset.values_list(*query_fields(columns)).iterator(chunk_size=chunk_size):
+        yield [column.value(values[begin:end]) for column, begin, end in spans]
+
+
+# Начало текста, которое Excel и LibreOffice принимают за формулу (CSV/formula injection)
+_FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+
+def _cell_text(value):
+    if value is None:
+        return ''
+    if isinstance(value, bool):
+        return 'Да' if value else 'Нет'
+    if isinstance(value, datetime.datetime):
+        if timezone.is_aware(value):
+            value = timezone.localtime(value)
+        return value.strftime('%Y-%m-%d %H:%M:%S')
+    return str(value)
+
+
+def _csv_text(value):
+    # Пользовательский текст (название, описание ВД) не должен выполниться как формула.
+    # Только для CSV: в XLSX текст пишется строкой (inlineStr) и формулой не считается
+    if isinstance(value, str) and value.startswith(_FORMULA_PREFIXES):
+        return f"'{value}"
+    return _cell_text(value)
+
+
+class _Echo:
+    # Файл для csv.writer, который просто возвращает записанную строку
+    def write(self, value):
+        return value
+
+
+def csv_stream(columns, rows):
+    # BOM — чтобы Excel открыл UTF-8 с кириллицей без мастера импорта
+    yield '\ufeff'
+    writer = csv.writer(_Echo())
+    yield writer.writerow([column.header for column in columns])
+    for row in rows:
+        yield writer.writerow([_csv_text(value) for value in row])
+
+
+class _Sink:
+    """
+    Поток без seek для zipfile: накапливает записанные байты до следующего
+    drain(), после чего их можно отдать клиенту.
+    """
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+# Символы, недопустимые в XML 1.0
+_XML_ILLEGAL = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f\ufffe\uffff]')
+
+
+def _xlsx_cell(value):
+    if value is None:
+        return '<c/>'
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return f'<c><v>{value}</v></c>'
+    text = escape(_XML_ILLEGAL.sub('', _cell_text(value)))
+    return f'<c t="inlineStr"><is><t xml:space="preserve">{text}</t></is></c>'
+
+
+def _xlsx_row(values):
+    return ('<row>' + ''.join(_xlsx_cell(value) for value in values) + '</row>').encode('utf-8')
+
+
+_SHEET_HEAD = (
+    b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    b'<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+)
+_SHEET_TAIL = b'</sheetData></worksheet>'
+
+
+def xlsx_stream(columns, rows, title, flush_rows=1000):
+    """
+    Потоковая запись XLSX без сторонних библиотек: книга — ZIP-архив XML-файлов,
+    и zipfile умеет писать его в поток без seek. Каждый лист сжимается по мере
+    поступления строк и отдаётся клиенту кусками, поэтому ни книга целиком, ни
+    её временный файл не создаются. После XLSX_SHEET_ROWS строк начинается
+    новый лист; описание книги записывается в конце архива, когда число листов известно.
+    """
+    sink = _Sink()
+    header = _xlsx_row([column.header for column in columns])
+    sheets = 0
+    with zipfile.ZipFile(sink, 'w', zipfile.ZIP_DEFLATED) as archive:
+        sheet = None
+        count = 0
+        for row in rows:
+            if sheet is None or count == XLSX_SHEET_ROWS:
+                if sheet is not None:
+                    sheet.write(_SHEET_TAIL)
+                    sheet.close()
+                sheets += 1
+                sheet = archive.open(f'xl/worksheets/sheet{sheets}.xml', 'w', force_zip64=True)
+                sheet.write(_SHEET_HEAD + header)
+                count = 0
+            sheet.write(_xlsx_row(row))
+            count += 1
+            if count % flush_rows == 0:
+                yield sink.drain()
+        if sheet is None:
+            sheets = 1
+            sheet = archive.open('xl/worksheets/sheet1.xml', 'w')
+            sheet.write(_SHEET_HEAD + header)
+        sheet.write(_SHEET_TAIL)
+        sheet.close()
+        for name, content in _xlsx_package(title, sheets):
+            archive.writestr(name, content)
+    yield sink.drain()
+
+
+def _xlsx_package(title, sheets):
+    # Имя листа в Excel: до 31 символа, без []:*?/\
+    title = re.sub(r'[\[\]:*?/\\]', ' ', title)[:28]
+    names = [title if sheets == 1 else f'{title} {n}' for n in range(1, sheets + 1)]
+    overrides = ''.join(
+        f'<Override PartName="/xl/worksheets/sheet{n}.xml" '
+        f'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        for n in range(1, sheets + 1)
+    )
+    yield '[Content_Types].xml', (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        f'{overrides}</Types>'
+    )
+    yield '_rels/.rels', (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+        'Target="xl/workbook.xml"/></Relationships>'
+    )
+    sheet_entries = ''.join(
+        f'<sheet name="{escape(name, {chr(34): "&quot;"})}" sheetId="{n}" r:id="rId{n}"/>'
+        for n, name in enumerate(names, 1)
+    )
+    yield 'xl/workbook.xml', (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+        f'<sheets>{sheet_entries}</sheets></workbook>'
+    )
+    relationships = ''.join(
+        f'<Relationship Id="rId{n}" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+        f'Target="worksheets/sheet{n}.xml"/>'
+        for n in range(1, sheets + 1)
+    )
+    yield 'xl/_rels/workbook.xml.rels', (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        f'{relationships}</Relationships>'
+    )
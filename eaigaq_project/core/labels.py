@@ -0,0 +1,329 @@
+# core/labels.py
+
+import functools
+import hashlib
+import io
+import json
+import multiprocessing
+import struct
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from django.conf import settings
+
+from .storage import label_store
+
+try:
+    import qrcode
+except ImportError:  # pragma: no cover - QR-этикетки доступны только с пакетом qrcode
+    qrcode = None
+
+# Меняется вместе с раскладкой этикетки — старые изображения в кэше перестают находиться
+LABEL_VERSION = 1
+
+CODE128 = 'code128'
+QR = 'qr'
+PDF = 'pdf'
+PNG = 'png'
+FORMATS = {PDF: 'application/pdf', PNG: 'image/png'}
+
+# Ширины штрихов и пробелов символов Code 128 (значения 0–106; 103–105 — старт A/B/C, 106 — стоп)
+_CODE128_PATTERNS = (
+    '212222', '222122', '222221', '121223', '121322', '131222', '122213', '122312', '132212', '221213',
+    '221312', '231212', '112232', '122132', '122231', '113222', '123122', '123221', '223211', '221132',
+    '221231', '213212', '223112', '312131', '311222', '321122', '321221', '312212', '322112', '322211',
+    '212123', '212321', '232121', '111323', '131123', '131321', '112313', '132113', '132311', '211313',
+    '231113', '231311', '112133', '112331', '132131', '113123', '113321', '133121', '313121', '211331',
+    '231131', '213113', '213311', '213131', '311123', '311321', '331121', '312113', '312311', '332111',
+    '314111', '221411', '431111', '111224', '111422', '121124', '121421', '141122', '141221', '112214',
+    '112412', '122114', '122411', '142112', '142211', '241211', '221114', '413111', '241112', '134111',
+    '111242', '121142', '121241', '114212', '124112', '124211', '411212', '421112', '421211', '212141',
+    '214121', '412121', '111143', '111341', '131141', '114113', '114311', '411113', '411311', '113141',
+    '114131', '311141', '411131', '211412', '211214', '211232', '2331112',
+)
+_START_B = 104
+_STOP = 106
+# Тихая зона по краям штрихкода, в модулях
+_QUIET_ZONE = 10
+
+
+def code128_widths(text):
+    """
+    Ширины элементов (штрих, пробел, штрих, ...) в модулях для Code 128B.
+    Поддерживаются печатные символы ASCII — этого достаточно для UUID.
+    """
+    values = []
+    for char in text:
+        code = ord(char)
+        if not 32 <= code < 127:
+            raise ValueError(f'Символ {char!r} нельзя закодировать в Code 128B.')
+        values.append(code - 32)
+    checksum = (_START_B + sum(position * value for position, value in enumerate(values, 1))) % 103
+    return [int(width) for value in [_START_B, *values, checksum, _STOP] for width in _CODE128_PATTERNS[value]]
+
+
+def page_size(dpi):
+    # Лист A4
+    return round(210 / 25.4 * dpi), round(297 / 25.4 * dpi)
+
+
+def label_layout():
+    """
+    (dpi, колонки, строки, поле листа в px, размер этикетки в px) из настроек.
+    """
+    dpi = getattr(settings, 'LABEL_DPI', 300)
+    columns, rows = getattr(settings, 'LABEL_GRID', (2, 8))
+    margin = round(getattr(settings, 'LABEL_PAGE_MARGIN_MM', 5) / 25.4 * dpi)
+    width, height = page_size(dpi)
+    return dpi, columns, rows, margin, ((width - 2 * margin) // columns, (height - 2 * margin) // rows)
+
+
+@functools.lru_cache(maxsize=16)
+def _font(path, size):
+    from PIL import ImageFont
+
+    if path:
+        try:
+            return ImageFont.truetype(path, size)
+        except OSError:
+            pass
+    return ImageFont.load_default(size=size)
+
+
+def _fit(draw, text, font, width):
+    # Обрезает строку с многоточием, чтобы она поместилась по ширине
+    text = ' '.join((text or '').split())
+    if draw.textlength(text, font=font) <= width:
+        return text
+    while text and draw.textlength(text + '…', font=font) > width:
+        text = text[:-1]
+    return text + '…'
+
+
+def render_label(spec):
+    """
+    PNG одной этикетки. spec — (символика, штрихкод, строки текста, размер, шрифт).
+    Выполняется в процессах пула, поэтому зависит только от Pillow и аргументов.
+    """
+    from PIL import Image, ImageDraw
+
+    symbology, barcode, lines, (width, height), font_path = spec
+    image = Image.new('1', (width, height), 1)
+    draw = ImageDraw.Draw(image)
+    padding = height // 14
+    title_font, text_font, code_font = (_font(font_path, height // size) for size in (9, 11, 12))
+
+    left = padding
+    if symbology == QR:
+        qr = qrcode.QRCode(border=0, box_size=1)
+        qr.add_data(barcode)
+        qr.make(fit=True)
+        matrix = qr.get_matrix()
+        module = (height - 2 * padding) // len(matrix)
+        for y, row in enumerate(matrix):
+            for x, dark in enumerate(row):
+                if dark:
+                    draw.rectangle(
+                        (left + x * module, padding + y * module, left + (x + 1) * module - 1, padding + (y + 1) * module - 1),
+                        fill=0,
+                    )
+        left += module * len(matrix) + padding
+
+    text_width = width - left - padding
+    top = padding
+    for line, font in zip(lines, (title_font, text_font)):
+        draw.text((left, top), _fit(draw, line, font, text_width), font=font, fill=0)
+        top += font.size + padding // 2
+
+    bottom = height - padding - code_font.size
+    if symbology == CODE128:
+        widths = code128_widths(barcode)
+        module = max(1, (width - 2 * padding) // (sum(widths) + 2 * _QUIET_ZONE))
+        x = (width - module * sum(widths)) // 2
+        for position, element in enumerate(widths):
+            if position % 2 == 0:
+                draw.rectangle((x, top + padding // 2, x + element * module - 1, bottom - padding // 2), fill=0)
+            x += element * module
+        text = _fit(draw, barcode, code_font, width - 2 * padding)
+        draw.text(((width - draw.textlength(text, font=code_font)) // 2, bottom), text, font=code_font, fill=0)
+    else:
+        draw.text((left, bottom), _fit(draw, barcode, code_font, text_width), font=code_font, fill=0)
+
+    buffer = io.BytesIO()
+    image.save(buffer, 'PNG')
+    return buffer.getvalue()
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """
+    Пул процессов рендеринга (LABEL_RENDER_WORKERS). Процессы запускаются через
+    spawn: fork процесса с потоками (журнал аудита, слушатель push) небезопасен.
+    """
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ProcessPoolExecutor(
+                    max_workers=getattr(settings, 'LABEL_RENDER_WORKERS', 4),
+                    mp_context=multiprocessing.get_context('spawn'),
+                )
+    return _pool
+
+
+def _reset_pool():
+    global _pool
+    with _pool_lock:
+        _pool = None
+
+
+def _render_many(specs):
+    # На одном ядре пул только добавит запуск процессов и передачу данных
+    if len(specs) < getattr(settings, 'LABEL_POOL_THRESHOLD', 50) or getattr(settings, 'LABEL_RENDER_WORKERS', 4) < 2:
+        return [render_label(spec) for spec in specs]
+    try:
+        return list(get_pool().map(render_label, specs, chunksize=16))
+    except BrokenProcessPool:
+        # Процесс пула убит (например, OOM) — пересоздадим пул в следующий раз
+        _reset_pool()
+        return [render_label(spec) for spec in specs]
+
+
+def cache_key(spec):
+    return hashlib.sha256(json.dumps([LABEL_VERSION, *spec], ensure_ascii=False).encode('utf-8')).hexdigest()
+
+
+def label_images(items, symbology=CODE128):
+    """
+    PNG этикеток для [(штрихкод, [строки текста])]. Готовые этикетки берутся из
+    дискового кэша (ключ — хэш штрихкода, текста и раскладки), недостающие
+    рендерятся — большими пачками в пуле процессов — и сохраняются в кэш.
+    """
+    *_, size = label_layout()
+    font_path = getattr(settings, 'LABEL_FONT', None)
+    specs = [(symbology, barcode, list(lines), size, font_path) for barcode, lines in items]
+    keys = [cache_key(spec) for spec in specs]
+    images = [None] * len(specs)
+    missing = []
+    for index, key in enumerate(keys):
+        if label_store.exists(key):
+            with label_store.open(key) as file:
+                images[index] = file.read()
+        else:
+            missing.append(index)
+    for index, content in zip(missing, _render_many([specs[index] for index in missing])):
+        images[index] = content
+        label_store.put(content, digest=keys[index])
+    return images
+
+
+def _png_image(content):
+    """
+    (ширина, высота, сжатые данные) 1-битного PNG из кэша. Данные IDAT — это
+    zlib с построчными фильтрами PNG, и PDF принимает их как есть (FlateDecode
+    с предиктором PNG), без распаковки и повторного сжатия.
+    """
+    position = 8
+    chunks = []
+    while position < len(content):
+        length, kind = struct.unpack('>I4s', content[position:position + 8])
+        data = content[position + 8:position + 8 + length]
+        if kind == b'IHDR':
+            width, height, depth, color, _, _, interlace = struct.unpack('>IIBBBBB', data)
+            if (depth, color, interlace) != (1, 0, 0):
+                raise ValueError('Ожидается 1-битный PNG без чересстрочности.')
+        elif kind == b'IDAT':
+            chunks.append(data)
+        position += 12 + length
+    return width, height, b''.join(chunks)
+
+
+def _pdf(pages, dpi, size):
+    """
+    PDF из этикеток: pages — [[(x, y, PNG), ...], ...] в пикселях листа.
+    Каждая этикетка — отдельное изображение страницы, собранное из данных PNG,
+    поэтому сборка PDF не перекодирует растр.
+    """
+    scale = 72 / dpi
+    page_width, page_height = size[0] * scale, size[1] * scale
+    objects = [None, None]  # 1 — каталог, 2 — дерево страниц
+
+    def add(body):
+        objects.append(body)
+        return len(objects)
+
+    page_ids = []
+    for labels_on_page in pages:
+        resources = []
+        commands = []
+        for number, (x, y, content) in enumerate(labels_on_page):
+            width, height, data = _png_image(content)
+            image_id = add(
+                b'<< /Type /XObject /Subtype /Image /Width %d /Height %d /ColorSpace /DeviceGray '
+                b'/BitsPerComponent 1 /Filter /FlateDecode '
+                b'/DecodeParms << /Predictor 15 /Colors 1 /BitsPerComponent 1 /Columns %d >> /Length %d >>\n'
+                b'stream\n%s\nendstream' % (width, height, width, len(data), data)
+            )
+            resources.append(b'/Im%d %d 0 R' % (number, image_id))
+            commands.append(
+                b'q %.3f 0 0 %.3f %.3f %.3f cm /Im%d Do Q' % (
+                    width * scale, height * scale, x * scale, page_height - (y + height) * scale, number
+                )
+            )
+        stream = b'\n'.join(commands)
+        contents_id = add(b'<< /Length %d >>\nstream\n%s\nendstream' % (len(stream), stream))
+        page_ids.append(add(
+            b'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 %.3f %.3f] /Resources << /XObject << %s >> >> '
+            b'/Contents %d 0 R >>' % (page_width, page_height, b' '.join(resources), contents_id)
+        ))
+    objects[0] = b'<< /Type /Catalog /Pages 2 0 R >>'
+    objects[1] = b'<< /Type /Pages /Kids [%s] /Count %d >>' % (
+        b' '.join(b'%d 0 R' % page_id for page_id in page_ids), len(page_ids)
+    )
+
+    output = io.BytesIO()
+    output.write(b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n')
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(output.tell())
+        output.write(b'%d 0 obj\n%s\nendobj\n' % (number, body))
+    xref = output.tell()
+    output.write(b'xref\n0 %d\n0000000000 65535 f \n' % (len(objects) + 1))
+    output.write(b''.join(b'%010d 00000 n \n' % offset for offset in offsets))
+    output.write(b'trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n' % (len(objects) + 1, xref))
+    return output.getvalue()
+
+
+def render_sheets(items, file_format=PDF, symbology=CODE128, page=None):
+    """
+    Листы A4 с этикетками. Возвращает (байты, число листов): PDF — все листы,
+    PNG — один лист page (с 1).
+    """
+    from PIL import Image
+
+    dpi, columns, rows, margin, (width, height) = label_layout()
+    per_page = columns * rows
+    images = label_images(items, symbology)
+    pages = max(1, -(-len(images) // per_page))
+
+    def positions(start):
+        for position, content in enumerate(images[start:start + per_page]):
+            row, column = divmod(position, columns)
+            yield margin + column * width, margin + row * height, content
+
+    if file_format == PDF:
+        return _pdf([list(positions(start)) for start in range(0, pages * per_page, per_page)], dpi, page_size(dpi)), pages
+
+    page = page or 1
+    if not 1 <= page <= pages:
+        raise ValueError(f'Лист {page} вне диапазона 1–{pages}.')
+    sheet = Image.new('1', page_size(dpi), 1)
+    for x, y, content in positions((page - 1) * per_page):
+        sheet.paste(Image.open(io.BytesIO(content)), (x, y))
+    buffer = io.BytesIO()
+    sheet.save(buffer, 'PNG', dpi=(dpi, dpi))
+    return buffer.getvalue(), pages
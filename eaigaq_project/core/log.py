@@ -0,0 +1,41 @@
+# core/log.py
+
+import atexit
+import json
+import logging
+import queue
+from logging.handlers import QueueHandler, QueueListener
+
+# Стандартные атрибуты LogRecord — всё остальное пришло через extra
+_RECORD_ATTRS = set(vars(logging.makeLogRecord({}))) | {'message', 'asctime', 'taskName'}
+
+
+class StructuredFormatter(logging.Formatter):
+    """
+    Одна строка JSON на запись: время, уровень, логгер, сообщение и поля из extra.
+    """
+
+    def format(self, record):
+        data = {
+            'time': self.formatTime(record),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        data.update((key, value) for key, value in vars(record).items() if key not in _RECORD_ATTRS)
+        if record.exc_info:
+            data['exc_info'] = self.formatException(record.exc_info)
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+
+class NonBlockingHandler(QueueHandler):
+    """
+    Кладёт записи в очередь и возвращается сразу; в поток вывода их пишет
+    фоновый QueueListener. Запрос не ждёт медленного stdout/stderr.
+    """
+
+    def __init__(self):
+        super().__init__(queue.SimpleQueue())
+        self.listener = QueueListener(self.queue, logging.StreamHandler(), respect_handler_level=True)
+        self.listener.start()
+        atexit.register(self.listener.stop)
@@ -0,0 +1,44 @@
+# core/management/commands/audit_partitions.py
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from core import partitions
+
+
+class Command(BaseCommand):
+    help = (
+        'Обслуживание журнала аудита. '
+        'setup — перевести таблицу в секционированную по месяцам (PostgreSQL); '
+        'ensure — создать секции на ближайшие месяцы (запускать по cron ежемесячно); '
+        'prune — удалить (и при необходимости выгрузить в архив) записи старше --keep-months.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('action', choices=['setup', 'ensure', 'prune'])
+        parser.add_argument('--months-ahead', type=int, default=3)
+        parser.add_argument('--keep-months', type=int, default=24)
+        parser.add_argument('--archive-dir', default=None)
+
+    def handle(self, *args, **options):
+        action = options['action']
+
+        if action in ('setup', 'ensure'):
+            if not partitions.uses_postgres():
+                raise CommandError('Секционирование поддерживается только на PostgreSQL.')
+            if action == 'setup':
+                if partitions.is_partitioned():
+                    self.stdout.write('Таблица уже секционирована.')
+                else:
+                    partitions.convert_to_partitioned(options['months_ahead'])
+                    self.stdout.write(self.style.SUCCESS('Таблица журнала аудита секционирована.'))
+            partitions.ensure_partitions(options['months_ahead'])
+            self.stdout.write(self.style.SUCCESS('Секции на ближайшие месяцы созданы.'))
+            return
+
+        if options['keep_months'] < 1:
+            raise CommandError('--keep-months должен быть не меньше 1.')
+        current = partitions.month_start(timezone.now())
+        before = partitions.add_months(current, -options['keep_months'])
+        partitions.prune(before, archive_dir=options['archive_dir'], log=self.stdout.write)
+        self.stdout.write(self.style.SUCCESS(f'Записи до {before:%Y-%m} удалены.'))
@@ -0,0 +1,32 @@
+# core/management/commands/backfill_event_cases.py
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import OuterRef, Subquery
+
+from core.models import MaterialEvidence, MaterialEvidenceEvent
+
+
+class Command(BaseCommand):
+    help = (
+        'Заполняет дело (case) у событий ВД, записанных до появления этого поля: '
+        'без него события не попадают в хронологию дела и не видны руководителям. '
+        'Идёт пачками по --batch-size, повторный запуск ничего не меняет.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        case_id = Subquery(MaterialEvidence.objects.filter(pk=OuterRef('material_evidence_id')).values('case_id')[:1])
+        total = 0
+        while True:
+            with transaction.atomic():
+                ids = list(
+                    MaterialEvidenceEvent.objects.filter(case__isnull=True, material_evidence__case__isnull=False)
+                    .values_list('pk', flat=True)[:options['batch_size']]
+                )
+                if not ids:
+                    break
+                total += MaterialEvidenceEvent.objects.filter(pk__in=ids).update(case_id=case_id)
+        self.stdout.write(self.style.SUCCESS(f'Событиям ВД заполнено дело: {total}'))
@@ -0,0 +1,86 @@
+# core/management/commands/bench_json.py
+
+import datetime
+import decimal
+import io
+import timeit
+import uuid
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+from core import renderers
+from core.models import Case, Department, EvidenceGroup, MaterialEvidence, MaterialEvidenceStatus, User
+from core.parsers import FastJSONParser
+from core.serializers import MaterialEvidenceFlatSerializer, MaterialEvidenceSerializer
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает рендеринг и разбор JSON: core.renderers.FastJSONRenderer / core.parsers.FastJSONParser '
+        'против стандартных классов DRF на страницах /api/material-evidences/ и данных с «сырыми» типами'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--items', type=int, default=100, help='ВД на странице (по умолчанию 100)')
+        parser.add_argument('--number', type=int, default=200, help='Повторов на замер (по умолчанию 200)')
+
+    def handle(self, *args, **options):
+        if renderers.orjson is None:
+            self.stderr.write('orjson не установлен: FastJSONRenderer совпадает со стандартным рендерером.')
+        payloads = self.payloads(options['items'])
+        number = options['number']
+        self.stdout.write(f'{"данные":<22}{"байт":>10}{"DRF, мс":>12}{"fast, мс":>12}{"ускорение":>12}')
+        for name, data in payloads.items():
+            self.compare(f'render {name}', len(JSONRenderer().render(data)), number,
+                         lambda: JSONRenderer().render(data), lambda: renderers.FastJSONRenderer().render(data))
+            body = JSONRenderer().render(data)
+            self.compare(f'parse {name}', len(body), number,
+                         lambda: JSONParser().parse(io.BytesIO(body)), lambda: FastJSONParser().parse(io.BytesIO(body)))
+
+    def compare(self, name, size, number, baseline, candidate):
+        base = min(timeit.repeat(baseline, number=number, repeat=3)) / number * 1000
+        fast = min(timeit.repeat(candidate, number=number, repeat=3)) / number * 1000
+        self.stdout.write(f'{name:<22}{size:>10}{base:>12.3f}{fast:>12.3f}{base / fast:>11.1f}x')
+
+    def payloads(self, items):
+        """
+        Страницы списка ВД в полном и плоском представлении — данные сериализаторов
+        по объектам в памяти (без запросов к БД) — и словари с datetime, UUID,
+        Decimal и ленивыми строками, которые идут через кодировщик DRF.
+        """
+        now = timezone.now()
+        department = Department(id=1, name='Отделение полиции № 1', region='ASTANA')
+        user = User(
+            id=1, username='ivanov', first_name='Иван', last_name='Иванов', rank='капитан',
+            role='USER', region='ASTANA', department=department,
+        )
+        case = Case(
+            id=1, name='Дело № 2024-000117', description='Кража со взломом', creator=user, investigator=user,
+            department=department, created=now, updated=now,
+        )
+        group = EvidenceGroup(id=1, name='Изъятое при обыске', case=case, created_by=user, created=now, updated=now)
+        statuses = MaterialEvidenceStatus.values
+        evidence = [
+            MaterialEvidence(
+                id=n, name=f'Вещественное доказательство {n}', description='Описание изъятого предмета ' * 3,
+                case=case, group=group, created_by=user, last_holder=user, status=statuses[n % len(statuses)],
+                barcode=f'{n:013d}', created=now, updated=now, last_event_at=now,
+            )
+            for n in range(1, items + 1)
+        ]
+        raw = [
+            {
+                'id': uuid.uuid4(), 'at': now - datetime.timedelta(minutes=n), 'day': now.date(),
+                'amount': decimal.Decimal('1234.50'), 'status': _('Хранение'), 'tags': ['a', 'b'], n: n,
+            }
+            for n in range(items)
+        ]
+        return {
+            'evidence': {'results': MaterialEvidenceSerializer(evidence, many=True).data},
+            'evidence flat': {'results': MaterialEvidenceFlatSerializer(evidence, many=True).data},
+            'raw types': raw,
+        }
@@ -0,0 +1,31 @@
+# core/management/commands/drain_audit.py
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from core import audit
+
+
+class Command(BaseCommand):
+    help = (
+        'Переносит записи аудита из исходящей очереди (AuditOutbox) в журнал пачками '
+        'по --batch-size. С --interval работает постоянно, опрашивая очередь с этим '
+        'периодом в секундах; без него — разбирает очередь и завершается.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=None)
+        parser.add_argument('--interval', type=float, default=None)
+
+    def handle(self, *args, **options):
+        total = 0
+        while True:
+            moved = audit.drain(options['batch_size'])
+            total += moved
+            if moved:
+                continue
+            if options['interval'] is None:
+                break
+            time.sleep(options['interval'])
+        self.stdout.write(self.style.SUCCESS(f'Перенесено записей аудита: {total}'))
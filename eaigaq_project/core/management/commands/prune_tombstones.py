@@ -0,0 +1,13 @@
+# core/management/commands/prune_tombstones.py
+
+from django.core.management.base import BaseCommand
+
+from core import sync
+
+
+class Command(BaseCommand):
+    help = 'Удаляет надгробия дельта-синхронизации старше SYNC_TOMBSTONE_RETENTION_DAYS'
+
+    def handle(self, *args, **options):
+        count = sync.prune()
+        self.stdout.write(self.style.SUCCESS(f'Удалено надгробий: {count}'))
@@ -0,0 +1,23 @@
+# core/management/commands/rebuild_search_index.py
+
+from django.core.management.base import BaseCommand
+
+from core import search
+from core.models import Case, MaterialEvidence
+
+
+class Command(BaseCommand):
+    help = 'Перестраивает поисковый индекс по делам и вещественным доказательствам'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        if search.uses_postgres():
+            search.create_postgres_indexes()
+            self.stdout.write(self.style.SUCCESS('GIN-индексы PostgreSQL проверены.'))
+            return
+        for model in (Case, MaterialEvidence):
+            count = search.rebuild_inverted_index(model, batch_size=options['batch_size'])
+            self.stdout.write(f'{model._meta.verbose_name_plural}: проиндексировано {count}')
+        self.stdout.write(self.style.SUCCESS('Поисковый индекс перестроен.'))
@@ -0,0 +1,13 @@
+# core/management/commands/rebuild_stats.py
+
+from django.core.management.base import BaseCommand
+
+from core import stats
+
+
+class Command(BaseCommand):
+    help = 'Полностью пересчитывает счётчики дашборда (дела, ВД по статусам, активные сессии)'
+
+    def handle(self, *args, **options):
+        count = stats.rebuild()
+        self.stdout.write(self.style.SUCCESS(f'Счётчики пересчитаны: {count} строк.'))
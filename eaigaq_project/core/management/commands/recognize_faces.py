@@ -0,0 +1,70 @@
+# core/management/commands/recognize_faces.py
+
+import json
+import signal
+import threading
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.biometrics import recognition_enabled
+from core.cameras import open_source
+from core.models import Camera, CameraType
+from core.recognition import RecognitionPipeline
+
+
+class Command(BaseCommand):
+    help = (
+        'Распознавание лиц с активных камер типа FACE_ID: распознанные сотрудники получают '
+        'сессии присутствия (Session с камерой). Список камер перечитывается каждые --refresh '
+        'секунд, тогда же выводятся счётчики конвейера и задержки по стадиям.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--camera', type=int, action='append', default=[], help='ID камеры (можно несколько)')
+        parser.add_argument('--refresh', type=float, default=30, help='Период проверки камер, секунды')
+        parser.add_argument('--duration', type=float, default=0, help='Остановиться через N секунд (0 — не останавливаться)')
+
+    def handle(self, *args, **options):
+        if not recognition_enabled():
+            raise CommandError(
+                'Задайте нейросетевой кодировщик в FACE_EMBEDDING_ENCODER: '
+                'с PixelProjectionEncoder сессии присутствия не открываются.'
+            )
+        stopping = threading.Event()
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(signum, lambda *_: stopping.set())
+        deadline = time.monotonic() + options['duration'] if options['duration'] else None
+        pipeline = RecognitionPipeline().start()
+        try:
+            while not stopping.is_set():
+                self.refresh(pipeline, options['camera'])
+                timeout = options['refresh']
+                if deadline is not None:
+                    timeout = min(timeout, max(deadline - time.monotonic(), 0))
+                if stopping.wait(timeout) or (deadline is not None and time.monotonic() >= deadline):
+                    break
+        finally:
+            pipeline.stop()
+            self.stdout.write(json.dumps(pipeline.stats(), ensure_ascii=False))
+
+    def refresh(self, pipeline, camera_ids):
+        cameras = Camera.objects.filter(type=CameraType.FACE_ID, active=True)
+        if camera_ids:
+            cameras = cameras.filter(pk__in=camera_ids)
+        cameras = {camera.pk: camera for camera in cameras}
+        for camera_id, alive in pipeline.cameras().items():
+            if not alive or camera_id not in cameras:
+                pipeline.remove_camera(camera_id)
+                self.stdout.write(f'Камера {camera_id} остановлена')
+        running = pipeline.cameras()
+        for camera_id, camera in cameras.items():
+            if camera_id in running:
+                continue
+            try:
+                pipeline.add_camera(camera, open_source(camera))
+            except Exception as exc:
+                self.stderr.write(f'Камера {camera_id} не запущена: {exc}')
+                continue
+            self.stdout.write(self.style.SUCCESS(f'Камера {camera_id} ({camera.name}): распознавание начато'))
+        self.stdout.write(json.dumps(pipeline.stats(), ensure_ascii=False))
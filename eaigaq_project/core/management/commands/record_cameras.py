@@ -0,0 +1,68 @@
+# core/management/commands/record_cameras.py
+
+import signal
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.cameras import open_source
+from core.models import Camera, CameraType
+from core.recording import Recorder
+
+
+class Command(BaseCommand):
+    help = (
+        'Запись активных камер типа REC в сегменты RECORDING_ROOT. Список камер '
+        'перечитывается каждые --refresh секунд: новые камеры подключаются, отключённые '
+        'останавливаются, упавшие (источник закрылся) перезапускаются.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--camera', type=int, action='append', default=[], help='ID камеры (можно несколько)')
+        parser.add_argument('--refresh', type=float, default=30, help='Период проверки камер, секунды')
+        parser.add_argument('--duration', type=float, default=0, help='Остановиться через N секунд (0 — не останавливаться)')
+
+    def handle(self, *args, **options):
+        stopping = threading.Event()
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(signum, lambda *_: stopping.set())
+        deadline = time.monotonic() + options['duration'] if options['duration'] else None
+        recorders = {}
+        try:
+            while not stopping.is_set():
+                self.refresh(recorders, options['camera'])
+                timeout = options['refresh']
+                if deadline is not None:
+                    timeout = min(timeout, max(deadline - time.monotonic(), 0))
+                if stopping.wait(timeout) or (deadline is not None and time.monotonic() >= deadline):
+                    break
+        finally:
+            for recorder in recorders.values():
+                recorder.stop()
+            for camera_id, recorder in recorders.items():
+                recorder.join()
+                self.stdout.write(f'Камера {camera_id}: {recorder.stats()}')
+
+    def refresh(self, recorders, camera_ids):
+        cameras = Camera.objects.filter(type=CameraType.REC, active=True)
+        if camera_ids:
+            cameras = cameras.filter(pk__in=camera_ids)
+        cameras = {camera.pk: camera for camera in cameras}
+        for camera_id in list(recorders):
+            recorder = recorders[camera_id]
+            if camera_id not in cameras or not recorder.is_alive():
+                recorder.stop()
+                recorder.join()
+                del recorders[camera_id]
+                self.stdout.write(f'Камера {camera_id} остановлена: {recorder.stats()}')
+        for camera_id, camera in cameras.items():
+            if camera_id in recorders:
+                self.stdout.write(f'Камера {camera_id}: {recorders[camera_id].stats()}')
+                continue
+            try:
+                recorders[camera_id] = Recorder(camera, open_source(camera)).start()
+            except Exception as exc:
+                self.stderr.write(f'Камера {camera_id} не запущена: {exc}')
+                continue
+            self.stdout.write(self.style.SUCCESS(f'Камера {camera_id} ({camera.name}): запись начата'))
@@ -1,10 +1,13 @@
 # core/models.py
 
 from django.contrib.auth.models import AbstractUser
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db import models
 from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 
+from .storage import face_store
+
 
 class Region(models.TextChoices):
     AKMOLA = 'AKMOLA', _('Акмолинская область')
@@ -34,6 +37,14 @@ class Department(models.Model):
         choices=Region.choices,
         default=Region.ASTANA
     )
+    # Версия для ETag представлений, куда отделение входит вложенным
+    updated = models.DateTimeField(_('Обновлено'), auto_now=True)
+
+    class Meta:
+        indexes = [
+            # Отделения региона: список и разрешение области видимости главного по региону
+            models.Index(fields=['region', 'name'], name='department_region_idx'),
+        ]
 
     def __str__(self):
         return f"{self.name} ({self.get_region_display()})"
@@ -42,7 +53,9 @@ class Department(models.Model):
 class User(AbstractUser):
     phone_number = models.CharField(_('Номер телефона'), max_length=20, blank=True)
     rank = models.CharField(_('Звание'), max_length=50, blank=True)
-    face_data = models.BinaryField(_('Данные лица'), blank=True, null=True)
+    # Сами данные лица лежат в файловом хранилище (core.storage.face_store),
+    # в таблице пользователей хранится только их хэш
+    face_data_digest = models.CharField(_('Хэш данных лица'), max_length=64, blank=True, editable=False)
     department = models.ForeignKey(
         Department,
         on_delete=models.SET_NULL,
@@ -69,18 +82,73 @@ class User(AbstractUser):
         choices=ROLE_CHOICES,
         default='USER',
     )
+    # Версия для ETag представлений, куда сотрудник входит вложенным
+    updated = models.DateTimeField(_('Обновлено'), auto_now=True)
+
+    class Meta(AbstractUser.Meta):
+        indexes = [
+            models.Index(fields=['department', 'date_joined'], name='user_department_idx'),
+            models.Index(fields=['region'], name='user_region_idx'),
+        ]
 
     def __str__(self):
         return f"{self.get_full_name()} - ({self.rank})"
 
-    # Заглушки для методов распознавания лица
+    @property
+    def has_face_data(self):
+        return bool(self.face_data_digest)
+
+    def open_face_data(self):
+        if not self.face_data_digest:
+            return None
+        return face_store.open(self.face_data_digest)
+
     def set_face_data(self, image):
-        # TODO: Реализовать сохранение данных лица
-        pass
+        """
+        Сохраняет изображение лица (bytes или файл) в хранилище, запоминает его хэш
+        и записывает эталонный вектор признаков. Пользователь должен быть сохранён.
+        """
+        from .biometrics import get_encoder, to_bytes
+
+        content = image.read() if hasattr(image, 'read') else bytes(image)
+        vector = get_encoder().encode(content)
+        self.face_data_digest = face_store.put(content)
+        FaceEmbedding.objects.update_or_create(user=self, defaults={'vector': to_bytes(vector)})
+
+    def clear_face_data(self):
+        self.face_data_digest = ''
+        FaceEmbedding.objects.filter(user=self).delete()
 
     def verify_face(self, image):
-        # TODO: Реализовать проверку лица
-        return False
+        """
+        Проверка 1:1 — совпадает ли лицо на изображении с эталоном пользователя.
+        """
+        from django.conf import settings
+        from .biometrics import from_bytes, get_encoder
+
+        data = FaceEmbedding.objects.filter(user=self).values_list('vector', flat=True).first()
+        if data is None:
+            return False
+        try:
+            vector = get_encoder().encode(image)
+        except ValueError:
+            return False
+        return float(vector @ from_bytes(data)) >= settings.FACE_MATCH_THRESHOLD
+
+
+class FaceEmbedding(models.Model):
+    """
+    Эталонный вектор признаков лица пользователя (float32, little-endian).
+    Хранится отдельно от User, чтобы не читать его в обычных запросах.
+    """
+    user = models.OneToOneField(
+        User, on_delete=models.CASCADE, primary_key=True, related_name='face_embedding', verbose_name=_('Пользователь')
+    )
+    vector = models.BinaryField(_('Вектор признаков'))
+    updated = models.DateTimeField(_('Обновлено'), auto_now=True)
+
+    def __str__(self):
+        return f"Вектор лица пользователя {self.user_id}"
 
 
 class Case(models.Model):
@@ -104,6 +172,15 @@ class Case(models.Model):
     created = models.DateTimeField(_('Создано'), default=timezone.now)
     updated = models.DateTimeField(_('Обновлено'), auto_now=True)
 
+    class Meta:
+        # Индексы повторяют форму запросов списков: фильтр области видимости + сортировка по created
+        indexes = [
+            models.Index(fields=['department', 'created'], name='case_department_idx'),
+            models.Index(fields=['creator', 'created'], name='case_creator_idx'),
+            # Дельта-синхронизация читает изменения диапазоном по (updated, id)
+            models.Index(fields=['updated', 'id'], name='case_updated_idx'),
+        ]
+
     def __str__(self):
         return self.name
 
@@ -128,6 +205,13 @@ class EvidenceGroup(models.Model):
     updated = models.DateTimeField(_('Обновлено'), auto_now=True)
     active = models.BooleanField(_('Активна'), default=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['case', 'created'], name='evidencegroup_case_idx'),
+            models.Index(fields=['created_by', 'created'], name='evidencegroup_creator_idx'),
+            models.Index(fields=['updated', 'id'], name='evidencegroup_updated_idx'),
+        ]
+
     def __str__(self):
         return self.name
 
@@ -159,15 +243,36 @@ class MaterialEvidence(models.Model):
     created = models.DateTimeField(_('Создано'), default=timezone.now)
     updated = models.DateTimeField(_('Обновлено'), auto_now=True)
     active = models.BooleanField(_('Активно'), default=True)
+    # Денормализованное состояние по последнему событию (обновляется при добавлении события)
+    last_holder = models.ForeignKey(
+        User, on_delete=models.SET_NULL, null=True, blank=True, related_name='material_evidences_held',
+        verbose_name=_('Последний ответственный')
+    )
+    last_event_at = models.DateTimeField(_('Последнее событие'), null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['case', 'created'], name='evidence_case_idx'),
+            models.Index(fields=['created_by', 'created'], name='evidence_creator_idx'),
+            models.Index(fields=['updated', 'id'], name='evidence_updated_idx'),
+        ]
 
     def __str__(self):
         return self.name
 
 class MaterialEvidenceEvent(models.Model):
+    """
+    Событие цепочки хранения ВД. Журнал только дополняется; текущий статус
+    и последний ответственный переносятся в MaterialEvidence (см. core/signals.py).
+    """
     user = models.ForeignKey(User, on_delete=models.CASCADE, verbose_name=_('Пользователь'))
     material_evidence = models.ForeignKey(
         MaterialEvidence, on_delete=models.CASCADE, related_name='events', verbose_name=_('Вещественное доказательство')
     )
+    # Дело ВД на момент события — для выборки хронологии дела одним диапазоном по индексу
+    case = models.ForeignKey(
+        Case, on_delete=models.SET_NULL, null=True, blank=True, related_name='evidence_events', verbose_name=_('Дело')
+    )
     action = models.CharField(
         _('Действие'),
         max_length=20,
@@ -175,6 +280,12 @@ class MaterialEvidenceEvent(models.Model):
     )
     created = models.DateTimeField(_('Создано'), default=timezone.now)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['material_evidence', 'created'], name='evidenceevent_evidence_idx'),
+            models.Index(fields=['case', 'created'], name='evidenceevent_case_idx'),
+        ]
+
     def __str__(self):
         return f"{self.action} - {self.user} - {self.created.strftime('%Y-%m-%d %H:%M:%S')}"
 
@@ -185,6 +296,15 @@ class Session(models.Model):
     login = models.DateTimeField(_('Вход'), default=timezone.now)
     logout = models.DateTimeField(_('Выход'), null=True, blank=True)
     active = models.BooleanField(_('Активна'), default=True)
+    # Сессия присутствия, открытая камерой FACE_ID по распознанному лицу (core/recognition.py)
+    camera = models.ForeignKey(
+        'Camera', on_delete=models.SET_NULL, null=True, blank=True, related_name='sessions', verbose_name=_('Камера')
+    )
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'login'], name='session_user_idx'),
+        ]
 
     def __str__(self):
         return f"Сессия пользователя {self.user} от {self.login.strftime('%Y-%m-%d %H:%M:%S')}"
@@ -209,19 +329,176 @@ class Camera(models.Model):
     updated = models.DateTimeField(_('Обновлено'), auto_now=True)
     active = models.BooleanField(_('Активна'), default=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['updated', 'id'], name='camera_updated_idx'),
+        ]
+
     def __str__(self):
         return self.name
 
 
+class RecordingSegment(models.Model):
+    """
+    Сегмент записи камеры (core/recording.py): файл кадров <path>.seg и индекс
+    <path>.idx (время кадра -> смещение) в RECORDING_ROOT. Пока сегмент пишется,
+    end пуст. Сегменты ищутся по (camera, start): длительность сегмента не больше
+    RECORDING_SEGMENT_SECONDS, поэтому интервал — это диапазон по индексу.
+    """
+    camera = models.ForeignKey(
+        Camera, on_delete=models.PROTECT, related_name='segments', verbose_name=_('Камера')
+    )
+    start = models.DateTimeField(_('Начало'))
+    end = models.DateTimeField(_('Конец'), null=True, blank=True)
+    path = models.CharField(_('Путь'), max_length=255)
+    frames = models.PositiveIntegerField(_('Кадров'), default=0)
+    size = models.BigIntegerField(_('Размер'), default=0)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['camera', 'start'], name='segment_camera_start_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.camera_id}:{self.start.strftime('%Y-%m-%d %H:%M:%S')}"
+
+
 class AuditEntry(models.Model):
+    """
+    Запись журнала аудита. На PostgreSQL таблица секционируется по месяцам
+    (см. core/partitions.py), поэтому внешние ключи не создаются на уровне БД.
+    Регион и отделение пользователя денормализованы, чтобы фильтр по области
+    видимости не требовал соединения с таблицей пользователей.
+    """
     object_id = models.IntegerField(_('ID объекта'))
     table_name = models.CharField(_('Имя таблицы'), max_length=255)
     class_name = models.CharField(_('Имя класса'), max_length=255)
     action = models.CharField(_('Действие'), max_length=10)
-    fields = models.TextField(_('Поля'))
-    data = models.TextField(_('Данные'))
+    fields = models.JSONField(_('Поля'), default=list)
+    data = models.JSONField(_('Данные'), default=dict, encoder=DjangoJSONEncoder)
     created = models.DateTimeField(_('Создано'), default=timezone.now)
-    user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, verbose_name=_('Пользователь'))
+    user = models.ForeignKey(
+        User, on_delete=models.SET_NULL, null=True, blank=True, db_constraint=False, verbose_name=_('Пользователь')
+    )
+    region = models.CharField(_('Регион'), max_length=50, choices=Region.choices, null=True, blank=True)
+    department = models.ForeignKey(
+        Department, on_delete=models.SET_NULL, null=True, blank=True, db_constraint=False,
+        related_name='+', verbose_name=_('Отделение')
+    )
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['table_name', 'object_id', 'created'], name='auditentry_object_idx'),
+            models.Index(fields=['region', 'created'], name='auditentry_region_idx'),
+            models.Index(fields=['department', 'created'], name='auditentry_department_idx'),
+            models.Index(fields=['user', 'created'], name='auditentry_user_idx'),
+        ]
 
     def __str__(self):
         return f"Аудит {self.action} на {self.class_name} пользователем {self.user}"
+
+
+class AuditOutbox(models.Model):
+    """
+    Исходящая очередь журнала аудита: пишется в транзакции изменения, без индексов,
+    и переносится в AuditEntry пачками командой drain_audit.
+    """
+    object_id = models.IntegerField(_('ID объекта'))
+    table_name = models.CharField(_('Имя таблицы'), max_length=255)
+    class_name = models.CharField(_('Имя класса'), max_length=255)
+    action = models.CharField(_('Действие'), max_length=10)
+    fields = models.JSONField(_('Поля'), default=list)
+    data = models.JSONField(_('Данные'), default=dict, encoder=DjangoJSONEncoder)
+    created = models.DateTimeField(_('Создано'), default=timezone.now)
+    user = models.ForeignKey(
+        User, on_delete=models.DO_NOTHING, null=True, blank=True, db_constraint=False,
+        related_name='+', verbose_name=_('Пользователь')
+    )
+    region = models.CharField(_('Регион'), max_length=50, choices=Region.choices, null=True, blank=True)
+    department = models.ForeignKey(
+        Department, on_delete=models.DO_NOTHING, null=True, blank=True, db_constraint=False,
+        related_name='+', verbose_name=_('Отделение')
+    )
+
+    def __str__(self):
+        return f"Аудит {self.action} на {self.class_name} (в очереди)"
+
+
+class SearchToken(models.Model):
+    """
+    Инвертированный индекс для поиска по делам и ВД на СУБД без полнотекстового
+    поиска (SQLite). На PostgreSQL не используется.
+    """
+    kind = models.CharField(_('Тип объекта'), max_length=50)
+    token = models.CharField(_('Слово'), max_length=64)
+    object_id = models.BigIntegerField(_('ID объекта'))
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['kind', 'token'], name='searchtoken_kind_token_idx'),
+            models.Index(fields=['kind', 'object_id'], name='searchtoken_kind_object_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.kind}:{self.object_id} {self.token}"
+
+
+class StatCounter(models.Model):
+    """
+    Счётчик для дашборда по (вид, отделение, статус). Обновляется
+    инкрементально (core/stats.py), полностью пересчитывается командой
+    rebuild_stats. Регион копируется из отделения для выборки одним индексом.
+    """
+    kind = models.CharField(_('Показатель'), max_length=20)
+    region = models.CharField(_('Регион'), max_length=50, choices=Region.choices, null=True, blank=True)
+    department = models.ForeignKey(
+        Department, on_delete=models.DO_NOTHING, null=True, blank=True, db_constraint=False,
+        related_name='+', verbose_name=_('Отделение')
+    )
+    status = models.CharField(_('Статус'), max_length=20, blank=True)
+    value = models.BigIntegerField(_('Значение'), default=0)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['region', 'kind'], name='statcounter_region_idx'),
+        ]
+        constraints = [
+            # Одна строка на ячейку; ВД без дела считаются в ячейке без отделения,
+            # а NULL в обычном уникальном индексе не совпадают — для неё отдельный частичный индекс
+            models.UniqueConstraint(fields=['department', 'kind', 'status'], name='statcounter_department_key'),
+            models.UniqueConstraint(
+                fields=['kind', 'status'], condition=models.Q(department__isnull=True), name='statcounter_orphan_key'
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.kind}:{self.department_id}:{self.status} = {self.value}"
+
+
+class Tombstone(models.Model):
+    """
+    Отметка об исчезновении объекта из области видимости (удаление или перенос
+    в другое отделение) — для дельта-синхронизации клиентов (core/sync.py).
+    Хранится SYNC_TOMBSTONE_RETENTION_DAYS дней.
+    """
+    kind = models.CharField(_('Тип объекта'), max_length=50)
+    object_id = models.BigIntegerField(_('ID объекта'))
+    department = models.ForeignKey(
+        Department, on_delete=models.DO_NOTHING, null=True, blank=True, db_constraint=False,
+        related_name='+', verbose_name=_('Отделение')
+    )
+    owner = models.ForeignKey(
+        User, on_delete=models.DO_NOTHING, null=True, blank=True, db_constraint=False,
+        related_name='+', verbose_name=_('Владелец')
+    )
+    created = models.DateTimeField(_('Создано'), default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['kind', 'created', 'id'], name='tombstone_kind_idx'),
+            models.Index(fields=['department', 'kind', 'created'], name='tombstone_department_idx'),
+            models.Index(fields=['owner', 'kind', 'created'], name='tombstone_owner_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.kind}:{self.object_id}"
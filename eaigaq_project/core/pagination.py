@@ -0,0 +1,221 @@
+# core/pagination.py
+
+import base64
+import json
+from collections import OrderedDict
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError as DjangoValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Курсорная (keyset) пагинация.
+
+    Страница выбирается условием по ключу сортировки (например,
+    ``created < X OR (created = X AND id < Y)``), а не через OFFSET,
+    поэтому запрос одинаково быстр и на первой, и на тысячной странице.
+
+    Настройки можно переопределить на уровне ViewSet:
+        pagination_ordering  — ключ сортировки, последнее поле должно быть уникальным (обычно 'id');
+        page_size            — размер страницы по умолчанию;
+        max_page_size        — максимальный размер страницы, который может запросить клиент;
+        pagination_count     — включать ли общее количество записей (COUNT(*)) в ответ.
+    """
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    count_query_param = 'count'
+    invalid_cursor_message = 'Некорректный курсор.'
+
+    page_size = api_settings.PAGE_SIZE or 20
+    max_page_size = 100
+    ordering = ('-created', '-id')
+    include_count = True
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.ordering = tuple(getattr(view, 'pagination_ordering', self.ordering))
+        self.page_size = self.get_page_size(request, view)
+
+        cursor = self.decode_cursor(request)
+        if cursor is None:
+            position, reverse = None, False
+        else:
+            position, reverse = cursor
+
+        self.count = None
+        if self.get_include_count(request, view):
+            self.count = queryset.count()
+
+        ordering = self._reverse_ordering(self.ordering) if reverse else self.ordering
+        queryset = queryset.order_by(*ordering)
+        if position is not None:
+            queryset = queryset.filter(self._keyset_filter(queryset.model, ordering, position))
+
+        # Берём на одну запись больше, чтобы узнать, есть ли следующая страница
+        results = list(queryset[:self.page_size + 1])
+        has_more = len(results) > self.page_size
+        results = results[:self.page_size]
+
+        if reverse:
+            results.reverse()
+            self.has_next = position is not None
+            self.has_previous = has_more
+        else:
+            self.has_next = has_more
+            self.has_previous = position is not None
+
+        self.page = results
+        return results
+
+    def get_paginated_response(self, data):
+        payload = OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+        ])
+        if self.count is not None:
+            payload['count'] = self.count
+        payload['results'] = data
+        return Response(payload)
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'count': {'type': 'integer'},
+                'results': schema,
+            },
+        }
+
+    def get_schema_operation_parameters(self, view):
+        return [
+            {
+                'name': self.cursor_query_param,
+                'required': False,
+                'in': 'query',
+                'schema': {'type': 'string'},
+            },
+            {
+                'name': self.page_size_query_param,
+                'required': False,
+                'in': 'query',
+                'schema': {'type': 'integer'},
+            },
+            {
+                'name': self.count_query_param,
+                'required': False,
+                'in': 'query',
+                'schema': {'type': 'boolean'},
+            },
+        ]
+
+    # ---------------------------
+    # Параметры запроса
+    # ---------------------------
+
+    def get_page_size(self, request, view):
+        default = getattr(view, 'page_size', self.page_size)
+        maximum = getattr(view, 'max_page_size', self.max_page_size)
+        try:
+            requested = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return min(default, maximum)
+        if requested <= 0:
+            return min(default, maximum)
+        return min(requested, maximum)
+
+    def get_include_count(self, request, view):
+        value = request.query_params.get(self.count_query_param)
+        if value is not None:
+            return value.lower() in ('1', 'true', 'yes')
+        return getattr(view, 'pagination_count', self.include_count)
+
+    # ---------------------------
+    # Курсоры
+    # ---------------------------
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            raw = base64.urlsafe_b64decode(encoded.encode('ascii')).decode('utf-8')
+            data = json.loads(raw)
+            position = data['p']
+            reverse = bool(data.get('r', False))
+        except (TypeError, ValueError, KeyError, UnicodeError):
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(position, list) or len(position) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+        return position, reverse
+
+    def encode_cursor(self, position, reverse):
+        raw = json.dumps({'p': position, 'r': int(reverse)}, separators=(',', ':'))
+        encoded = base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii')
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded)
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self._position(self.page[-1]), reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self.encode_cursor(self._position(self.page[0]), reverse=True)
+
+    # ---------------------------
+    # Условие keyset
+    # ---------------------------
+
+    def _position(self, instance):
+        position = []
+        for field in self.ordering:
+            value = getattr(instance, field.lstrip('-'))
+            if hasattr(value, 'isoformat'):
+                value = value.isoformat()
+            position.append(value)
+        return position
+
+    def _keyset_filter(self, model, ordering, position):
+        """
+        Строит условие "строго после позиции" для составного ключа сортировки:
+        (a > x) OR (a = x AND b > y) OR ...
+        """
+        values = []
+        for field, value in zip(ordering, position):
+            name = field.lstrip('-')
+            try:
+                values.append(model._meta.get_field(name).to_python(value))
+            except FieldDoesNotExist:
+                # Аннотация (например, rank при поиске) — значение уже в JSON-типе
+                if not isinstance(value, (int, float, str)):
+                    raise NotFound(self.invalid_cursor_message)
+                values.append(value)
+            except DjangoValidationError:
+                raise NotFound(self.invalid_cursor_message)
+
+        condition = Q()
+        for index, field in enumerate(ordering):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            term = Q(**{f'{name}__{lookup}': values[index]})
+            for previous_field, previous_value in zip(ordering[:index], values[:index]):
+                term &= Q(**{previous_field.lstrip('-'): previous_value})
+            condition |= term
+        return condition
+
+    @staticmethod
+    def _reverse_ordering(ordering):
+        return tuple(field[1:] if field.startswith('-') else f'-{field}' for field in ordering)
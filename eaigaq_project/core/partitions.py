@@ -0,0 +1,203 @@
+# core/partitions.py
+
+import csv
+import gzip
+import json
+import os
+from datetime import datetime, timezone as dt_timezone
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import AuditEntry
+
+ARCHIVE_FIELDS = [
+    'id', 'object_id', 'table_name', 'class_name', 'action', 'fields', 'data',
+    'created', 'user_id', 'region', 'department_id',
+]
+
+
+# ---------------------------
+# Месяцы
+# ---------------------------
+
+def month_start(value):
+    value = timezone.localtime(value, dt_timezone.utc) if timezone.is_aware(value) else value
+    return datetime(value.year, value.month, 1, tzinfo=dt_timezone.utc)
+
+
+def add_months(value, months):
+    index = value.year * 12 + value.month - 1 + months
+    return value.replace(year=index // 12, month=index % 12 + 1, day=1)
+
+
+def partition_name(start):
+    return f'{AuditEntry._meta.db_table}_p{start:%Y%m}'
+
+
+# ---------------------------
+# PostgreSQL: секционирование по месяцам
+# ---------------------------
+
+def uses_postgres():
+    return connection.vendor == 'postgresql'
+
+
+def is_partitioned():
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT EXISTS (SELECT 1 FROM pg_partitioned_table p JOIN pg_class c ON c.oid = p.partrelid '
+            'WHERE c.relname = %s)',
+            [AuditEntry._meta.db_table],
+        )
+        return cursor.fetchone()[0]
+
+
+def list_partitions():
+    """
+    Возвращает [(начало месяца, имя секции)] по возрастанию.
+    """
+    table = AuditEntry._meta.db_table
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid '
+            'JOIN pg_class p ON p.oid = i.inhparent WHERE p.relname = %s',
+            [table],
+        )
+        names = [row[0] for row in cursor.fetchall()]
+    partitions = []
+    prefix = f'{table}_p'
+    for name in names:
+        suffix = name[len(prefix):]
+        if name.startswith(prefix) and len(suffix) == 6 and suffix.isdigit():
+            start = datetime(int(suffix[:4]), int(suffix[4:]), 1, tzinfo=dt_timezone.utc)
+            partitions.append((start, name))
+    return sorted(partitions)
+
+
+def create_partition(cursor, start):
+    table = AuditEntry._meta.db_table
+    end = add_months(start, 1)
+    cursor.execute(
+        f'CREATE TABLE IF NOT EXISTS {partition_name(start)} PARTITION OF {table} '
+        f"FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+    )
+
+
+def ensure_partitions(months_ahead=3):
+    """
+    Создаёт секции с текущего месяца на months_ahead месяцев вперёд.
+    """
+    start = month_start(timezone.now())
+    with connection.cursor() as cursor:
+        for offset in range(months_ahead + 1):
+            create_partition(cursor, add_months(start, offset))
+
+
+def convert_to_partitioned(months_ahead=3):
+    """
+    Переводит обычную таблицу журнала в секционированную по created.
+    Данные переносятся в помесячные секции, индексы из Meta создаются
+    на родительской таблице и наследуются секциями.
+    """
+    table = AuditEntry._meta.db_table
+    legacy = f'{table}_unpartitioned'
+    sequence = f'{table}_id_seq'
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute(f'ALTER TABLE {table} RENAME TO {legacy}')
+            # Переименование таблицы не трогает её ограничения: освобождаем имя первичного ключа
+            cursor.execute(f'ALTER TABLE {legacy} RENAME CONSTRAINT {table}_pkey TO {legacy}_pkey')
+            cursor.execute(f'ALTER TABLE {legacy} ALTER COLUMN id DROP IDENTITY IF EXISTS')
+            cursor.execute(f'ALTER TABLE {legacy} ALTER COLUMN id DROP DEFAULT')
+            cursor.execute(f'CREATE TABLE {table} (LIKE {legacy} INCLUDING DEFAULTS) PARTITION BY RANGE (created)')
+            # Последовательность serial могла остаться от старой таблицы — передаём её новой,
+            # иначе DROP TABLE старой таблицы удалит и её
+            cursor.execute(f'CREATE SEQUENCE IF NOT EXISTS {sequence}')
+            cursor.execute(f'ALTER SEQUENCE {sequence} OWNED BY {table}.id')
+            cursor.execute(f"SELECT setval('{sequence}', COALESCE((SELECT MAX(id) FROM {legacy}), 0) + 1, false)")
+            cursor.execute(f"ALTER TABLE {table} ALTER COLUMN id SET DEFAULT nextval('{sequence}')")
+            # Ключ секционирования обязан входить в первичный ключ
+            cursor.execute(f'ALTER TABLE {table} ADD CONSTRAINT {table}_pkey PRIMARY KEY (id, created)')
+
+            cursor.execute(f'SELECT MIN(created) FROM {legacy}')
+            oldest = cursor.fetchone()[0]
+            start = month_start(oldest or timezone.now())
+            last = add_months(month_start(timezone.now()), months_ahead)
+            while start <= last:
+                create_partition(cursor, start)
+                start = add_months(start, 1)
+            # Секция по умолчанию — чтобы запись не падала, если ensure давно не запускался
+            cursor.execute(f'CREATE TABLE IF NOT EXISTS {table}_default PARTITION OF {table} DEFAULT')
+
+            cursor.execute(f'INSERT INTO {table} SELECT * FROM {legacy}')
+            cursor.execute(f'DROP TABLE {legacy}')
+
+        # Индексы — в той же транзакции: при ошибке не останется секционированной таблицы без них.
+        # Их имена освобождаются только после DROP TABLE старой таблицы
+        with connection.schema_editor() as schema_editor:
+            for index in AuditEntry._meta.indexes:
+                schema_editor.add_index(AuditEntry, index)
+
+
+# ---------------------------
+# Хранение и архивирование
+# ---------------------------
+
+def archive(queryset, path):
+    """
+    Выгружает записи журнала в CSV (gzip) потоково; возвращает число строк.
+    """
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    count = 0
+    with gzip.open(path, 'wt', encoding='utf-8', newline='') as stream:
+        writer = csv.writer(stream)
+        writer.writerow(ARCHIVE_FIELDS)
+        for row in queryset.order_by().values_list(*ARCHIVE_FIELDS).iterator(chunk_size=5000):
+            row = list(row)
+            row[5] = json.dumps(row[5], ensure_ascii=False)
+            row[6] = json.dumps(row[6], ensure_ascii=False)
+            writer.writerow(row)
+            count += 1
+    return count
+
+
+def prune(before, archive_dir=None, batch_size=5000, log=None):
+    """
+    Удаляет записи журнала старше before (начало месяца).
+    На секционированной таблице PostgreSQL целые секции отсоединяются и удаляются
+    (DROP TABLE без сканирования строк); иначе — пакетами DELETE. Секция по
+    умолчанию целиком не удаляется (в ней могут быть и свежие записи, если ensure
+    не запускался): старые строки из неё удаляются тем же пакетным DELETE.
+    """
+    log = log or (lambda message: None)
+    queryset = AuditEntry.objects.filter(created__lt=before)
+    if uses_postgres() and is_partitioned():
+        for start, name in list_partitions():
+            if add_months(start, 1) > before:
+                continue
+            if archive_dir:
+                rows = archive(
+                    AuditEntry.objects.filter(created__gte=start, created__lt=add_months(start, 1)),
+                    os.path.join(archive_dir, f'{name}.csv.gz'),
+                )
+                log(f'{name}: в архив выгружено {rows} записей')
+            with transaction.atomic(), connection.cursor() as cursor:
+                cursor.execute(f'ALTER TABLE {AuditEntry._meta.db_table} DETACH PARTITION {name}')
+                cursor.execute(f'DROP TABLE {name}')
+            log(f'{name}: секция удалена')
+        # Старше before остались только строки секции по умолчанию
+        if not queryset.exists():
+            return
+        log(f'{AuditEntry._meta.db_table}_default: удаление записей до {before:%Y-%m}')
+
+    if archive_dir:
+        rows = archive(queryset, os.path.join(archive_dir, f'auditentry_before_{before:%Y%m}.csv.gz'))
+        log(f'В архив выгружено {rows} записей')
+    deleted = 0
+    while True:
+        ids = list(queryset.values_list('id', flat=True)[:batch_size])
+        if not ids:
+            break
+        deleted += AuditEntry.objects.filter(id__in=ids).delete()[0]
+    log(f'Удалено {deleted} записей')
@@ -0,0 +1,60 @@
+# core/profiles.py
+
+import hashlib
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import transaction
+from django.utils.http import quote_etag
+
+KEY = 'core:profile:{}'
+
+
+def get_cache():
+    return caches[getattr(settings, 'PROFILE_CACHE_ALIAS', 'default')]
+
+
+def enabled():
+    """
+    Профили кэшируются только в общем для процессов кэше (Redis, Memcached, БД):
+    сброс из locmem дошёл бы только до процесса, где изменили пользователя,
+    а остальные воркеры отдавали бы устаревший профиль до истечения TTL.
+    """
+    return not isinstance(get_cache(), LocMemCache)
+
+
+def build(user):
+    """
+    Сериализует профиль пользователя для current_user и кладёт его в кэш
+    готовым JSON вместе с ETag и хэшем сессии (для проверки сессии без запросов).
+    Профиль неактивного пользователя не кэшируется.
+    """
+    from .renderers import FastJSONRenderer
+    from .serializers import UserSerializer
+
+    body = FastJSONRenderer().render(UserSerializer(user).data)
+    profile = {
+        'body': body,
+        'etag': f'W/{quote_etag(hashlib.sha1(body).hexdigest()[:32])}',
+        'session_hash': user.get_session_auth_hash(),
+    }
+    if user.is_active and enabled():
+        get_cache().set(KEY.format(user.pk), profile, getattr(settings, 'PROFILE_CACHE_TTL', 300))
+    return profile
+
+
+async def aget(user_id):
+    if not enabled():
+        return None
+    return await get_cache().aget(KEY.format(user_id))
+
+
+def invalidate(user_ids):
+    """
+    Сбрасывает профили после фиксации транзакции: иначе параллельный запрос
+    успел бы закэшировать ещё не изменённые данные.
+    """
+    keys = [KEY.format(user_id) for user_id in user_ids]
+    if keys and enabled():
+        transaction.on_commit(lambda: get_cache().delete_many(keys))
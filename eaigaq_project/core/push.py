@@ -0,0 +1,191 @@
+# core/push.py
+
+import asyncio
+import json
+import logging
+import select
+import threading
+
+from django.conf import settings
+from django.db import transaction
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = 'eaigaq_push'
+
+# Сообщение подписчику, чья очередь переполнилась: часть изменений потеряна,
+# клиент должен перечитать данные (например, через sync)
+RESYNC = {'kind': 'resync'}
+
+
+class Subscription:
+    """
+    Очередь сообщений одного подключения. Живёт в цикле событий ASGI-сервера,
+    а сообщения приходят из потоков, где выполняются синхронные представления.
+    """
+
+    def __init__(self, broker, loop, maxsize):
+        self.broker = broker
+        self.loop = loop
+        self.queue = asyncio.Queue(maxsize=maxsize)
+
+    def deliver(self, message):
+        try:
+            self.loop.call_soon_threadsafe(self._put, message)
+        except RuntimeError:
+            # Цикл событий уже закрыт — подключение завершилось
+            self.close()
+
+    def _put(self, message):
+        try:
+            self.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(RESYNC)
+
+    async def get(self):
+        return await self.queue.get()
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+
+class LocalBroker:
+    """
+    Pub/sub в пределах процесса: publish раздаёт сообщение всем подпискам.
+    Подходит для одного ASGI-процесса и для разработки; для нескольких
+    процессов — PostgresBroker или своя реализация с тем же интерфейсом
+    (publish / subscribe / unsubscribe), указанная в PUSH_BROKER.
+    """
+
+    def __init__(self):
+        self._subscriptions = set()
+        self._lock = threading.Lock()
+
+    def publish(self, message):
+        self.deliver(message)
+
+    def deliver(self, message):
+        with self._lock:
+            subscriptions = list(self._subscriptions)
+        for subscription in subscriptions:
+            subscription.deliver(message)
+
+    def subscribe(self):
+        subscription = Subscription(self, asyncio.get_running_loop(), getattr(settings, 'PUSH_QUEUE_SIZE', 1000))
+        with self._lock:
+            self._subscriptions.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscriptions.discard(subscription)
+
+
+class PostgresBroker(LocalBroker):
+    """
+    Межпроцессный вариант на LISTEN/NOTIFY PostgreSQL: publish отправляет
+    NOTIFY, а фоновый поток каждого ASGI-процесса слушает канал и раздаёт
+    сообщения локальным подпискам. Отдельный брокер сообщений не нужен.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._listener = None
+
+    def publish(self, message):
+        from django.db import connection
+
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_notify(%s, %s)', [CHANNEL, json.dumps(message)])
+
+    def subscribe(self):
+        self._ensure_listening()
+        return super().subscribe()
+
+    def _ensure_listening(self):
+        with self._lock:
+            if self._listener is None or not self._listener.is_alive():
+                self._listener = threading.Thread(target=self._listen, name='push-listener', daemon=True)
+                self._listener.start()
+
+    def _listen(self):
+        from django.db import connections
+
+        wrapper = connections['default']
+        while True:
+            try:
+                raw = wrapper.get_new_connection(wrapper.get_connection_params())
+                raw.autocommit = True
+                with raw.cursor() as cursor:
+                    cursor.execute(f'LISTEN {CHANNEL}')
+                if callable(getattr(raw, 'notifies', None)):
+                    # psycopg 3
+                    for notify in raw.notifies():
+                        self.deliver(json.loads(notify.payload))
+                else:
+                    # psycopg2
+                    while True:
+                        if select.select([raw], [], [], 30) == ([], [], []):
+                            continue
+                        raw.poll()
+                        while raw.notifies:
+                            self.deliver(json.loads(raw.notifies.pop(0).payload))
+            except Exception:
+                logger.exception('Потеряно подключение LISTEN %s, переподключение', CHANNEL)
+                self.deliver(RESYNC)
+                threading.Event().wait(5)
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_broker():
+    global _broker
+    if _broker is None:
+        with _broker_lock:
+            if _broker is None:
+                _broker = import_string(getattr(settings, 'PUSH_BROKER', 'core.push.LocalBroker'))()
+    return _broker
+
+
+def enabled():
+    return getattr(settings, 'PUSH_ENABLED', False)
+
+
+def publish(kind, action, pk, department_id=None, owner_id=None, **extra):
+    """
+    Публикует изменение после фиксации транзакции. department_id и owner_id —
+    поля области видимости, по которым поток фильтрует получателей.
+    """
+    if not enabled():
+        return
+    message = {
+        'kind': kind, 'action': action, 'id': pk,
+        'department_id': department_id, 'owner_id': owner_id, **extra,
+    }
+    transaction.on_commit(lambda: _publish(message))
+
+
+def publish_many(messages):
+    if not enabled():
+        return
+    messages = list(messages)
+    if messages:
+        transaction.on_commit(lambda: [_publish(message) for message in messages])
+
+
+def _publish(message):
+    try:
+        get_broker().publish(message)
+    except Exception:
+        logger.exception('Не удалось опубликовать изменение %s', message.get('kind'))
+
+
+def visible(scope, message):
+    if message['kind'] == RESYNC['kind']:
+        return True
+    return scope.allows(department_id=message.get('department_id'), owner_id=message.get('owner_id'))
@@ -0,0 +1,417 @@
+# core/recognition.py
+
+import io
+import logging
+import multiprocessing
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import numpy as np
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import close_old_connections, connections
+from django.utils.module_loading import import_string
+
+from .biometrics import face_index, recognition_enabled
+from .recording import from_micros, to_micros
+
+try:
+    import cv2
+except ImportError:
+    cv2 = None
+
+logger = logging.getLogger(__name__)
+
+STAGES = ('queue', 'detect', 'embed', 'match', 'emit')
+
+
+# ---------------------------
+# Обнаружение лиц
+# ---------------------------
+
+def to_gray(frame):
+    """
+    Кадр источника (JPEG или массив RGB) -> массив uint8 (H, W) в оттенках серого.
+    """
+    from PIL import Image
+
+    if isinstance(frame, np.ndarray):
+        if frame.ndim == 2:
+            return frame
+        return np.asarray(Image.fromarray(frame).convert('L'))
+    return np.asarray(Image.open(io.BytesIO(frame)).convert('L'))
+
+
+class WholeFrameDetector:
+    """
+    Весь кадр — одно лицо: для терминалов, где камера снимает лицо крупным
+    планом (как фото в biometric_auth). Детектор с тем же интерфейсом
+    подключается через FACE_DETECTOR.
+    """
+
+    def detect(self, images):
+        """
+        images: список массивов (H, W). Возвращает для каждого список вырезанных лиц.
+        """
+        return [[image] for image in images]
+
+
+class HaarCascadeDetector:
+    """
+    Каскад Хаара из OpenCV: находит лица в кадре общего плана.
+    Нужен пакет opencv-python(-headless).
+    """
+    min_size = 48
+
+    def __init__(self):
+        if cv2 is None:
+            raise ImportError('Для HaarCascadeDetector нужен пакет opencv-python-headless.')
+        self.cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
+
+    def detect(self, images):
+        faces = []
+        for image in images:
+            boxes = self.cascade.detectMultiScale(image, 1.1, 5, minSize=(self.min_size, self.min_size))
+            faces.append([image[y:y + h, x:x + w] for x, y, w, h in boxes])
+        return faces
+
+
+def embed_frames(frames, detector, encoder):
+    """
+    Лица в пачке кадров с нескольких камер и их векторы: обнаружение по всей
+    пачке, затем одно матричное умножение encoder.embed на все найденные лица.
+    Возвращает (векторы (n, dim), номер кадра для каждого вектора, время
+    обнаружения, время кодирования).
+    """
+    started = time.perf_counter()
+    faces = detector.detect([to_gray(frame) for frame in frames])
+    detected = time.perf_counter()
+    owners = [number for number, found in enumerate(faces) for _ in found]
+    if owners:
+        pixels = np.stack([encoder.preprocess(face) for found in faces for face in found])
+        vectors = encoder.embed(pixels)
+    else:
+        vectors = np.empty((0, getattr(encoder, 'dim', 0)), dtype=np.float32)
+    return vectors, owners, detected - started, time.perf_counter() - detected
+
+
+# Кодировщик и детектор процесса пула: создаются один раз при запуске процесса
+_worker = None
+
+
+def _init_worker(encoder_path, detector_path):
+    global _worker
+    _worker = (import_string(detector_path)(), import_string(encoder_path)())
+
+
+def _embed_in_worker(frames):
+    return embed_frames(frames, *_worker)
+
+
+# ---------------------------
+# Счётчики
+# ---------------------------
+
+class LatencyCounter:
+    __slots__ = ('count', 'total', 'max')
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, seconds, count=1):
+        self.count += count
+        self.total += seconds * count
+        self.max = max(self.max, seconds)
+
+    def snapshot(self):
+        return {
+            'count': self.count,
+            'mean_ms': round(self.total / self.count * 1000, 2) if self.count else None,
+            'max_ms': round(self.max * 1000, 2),
+        }
+
+
+# ---------------------------
+# Сессии присутствия
+# ---------------------------
+
+class Presence:
+    """
+    Превращает распознавания в сессии: первое распознавание пользователя камерой
+    открывает Session (camera, login), следующие только продлевают её в памяти,
+    а после FACE_SESSION_TIMEOUT секунд без распознаваний сессия закрывается
+    (logout — время последнего распознавания). Сессии сохраняются через ORM,
+    поэтому счётчики и поток изменений обновляются обычными сигналами.
+    """
+
+    def __init__(self):
+        self.timeout = getattr(settings, 'FACE_SESSION_TIMEOUT', 60)
+        self._open = {}
+
+    def seen(self, user_id, camera_id, time_us):
+        from .models import Session, User
+
+        key = (user_id, camera_id)
+        if key in self._open:
+            self._open[key][1] = max(self._open[key][1], time_us)
+            return False
+        if not User.objects.filter(pk=user_id, is_active=True).exists():
+            return False
+        session = Session.objects.create(user_id=user_id, camera_id=camera_id, login=from_micros(time_us))
+        self._open[key] = [session, time_us]
+        return True
+
+    def expire(self, now_us=None):
+        now_us = to_micros(time.time()) if now_us is None else now_us
+        limit = self.timeout * 1_000_000
+        for key, (session, last_us) in list(self._open.items()):
+            if now_us - last_us >= limit:
+                self._close(session, last_us)
+                del self._open[key]
+
+    def close_all(self):
+        for session, last_us in self._open.values():
+            self._close(session, last_us)
+        self._open.clear()
+
+    @staticmethod
+    def _close(session, last_us):
+        session.logout = from_micros(last_us)
+        session.active = False
+        session.save(update_fields=['logout', 'active'])
+
+    @staticmethod
+    def recover():
+        # Сессии, оставшиеся открытыми после аварийной остановки распознавания
+        from .models import Session
+
+        for session in Session.objects.filter(camera__isnull=False, active=True):
+            session.logout = session.logout or session.login
+            session.active = False
+            session.save(update_fields=['logout', 'active'])
+
+
+# ---------------------------
+# Конвейер
+# ---------------------------
+
+class _Mailbox:
+    """
+    Последний кадр камеры. Новый кадр заменяет ещё не взятый — под нагрузкой
+    распознаётся самое свежее, а не очередь из устаревших кадров.
+    """
+    __slots__ = ('frame',)
+
+    def __init__(self):
+        self.frame = None
+
+
+class RecognitionPipeline:
+    """
+    Распознавание лиц с камер FACE_ID. На каждую камеру — поток захвата,
+    который кладёт кадр в _Mailbox своей камеры. Диспетчер собирает последние
+    кадры всех камер в пачку (до FACE_PIPELINE_BATCH_SIZE), отдаёт её в пул
+    процессов (FACE_PIPELINE_WORKERS) на обнаружение и кодирование лиц,
+    сравнивает векторы с индексом face_index одним вызовом identify_batch
+    и передаёт распознавания в Presence.
+
+    В обработке не больше одной пачки на процесс пула; кадры, которые ждали
+    дольше FACE_FRAME_MAX_AGE секунд, отбрасываются как устаревшие. Для стадий
+    queue (ожидание кадра), detect, embed, match и emit ведутся счётчики задержек.
+    """
+
+    def __init__(self):
+        self.workers = getattr(settings, 'FACE_PIPELINE_WORKERS', 1)
+        self.batch_size = getattr(settings, 'FACE_PIPELINE_BATCH_SIZE', 32)
+        self.max_age = getattr(settings, 'FACE_FRAME_MAX_AGE', 1.0)
+        self.presence = Presence()
+        self.latency = {stage: LatencyCounter() for stage in STAGES}
+        self.counters = dict.fromkeys(('frames', 'dropped', 'stale', 'batches', 'faces', 'matched', 'unknown', 'sessions'), 0)
+        self._cameras = {}
+        self._lock = threading.Lock()
+        self._ready = threading.Event()
+        self._stopping = threading.Event()
+        self._pool = None
+        self._local = None
+        self._in_flight = []
+        self._thread = threading.Thread(target=self._dispatch, name='face-dispatch', daemon=True)
+
+    # Камеры
+
+    def add_camera(self, camera, source):
+        mailbox = _Mailbox()
+        thread = threading.Thread(
+            target=self._capture, args=(camera.pk, source, mailbox), name=f'camera-{camera.pk}-faces', daemon=True,
+        )
+        with self._lock:
+            self._cameras[camera.pk] = (source, mailbox, thread)
+        thread.start()
+
+    def remove_camera(self, camera_id):
+        with self._lock:
+            source, mailbox, thread = self._cameras.pop(camera_id)
+        source.close()
+        thread.join()
+
+    def cameras(self):
+        # {id камеры: жив ли поток захвата}
+        with self._lock:
+            return {camera_id: thread.is_alive() for camera_id, (_, _, thread) in self._cameras.items()}
+
+    def _capture(self, camera_id, source, mailbox):
+        try:
+            for timestamp, frame in source:
+                with self._lock:
+                    if mailbox.frame is not None:
+                        self.counters['dropped'] += 1
+                    mailbox.frame = (time.monotonic(), to_micros(timestamp), frame)
+                    self.counters['frames'] += 1
+                self._ready.set()
+        except Exception:
+            logger.exception('Ошибка захвата кадров камеры %s', camera_id)
+        finally:
+            source.close()
+
+    # Диспетчер
+
+    def start(self):
+        if not recognition_enabled():
+            raise ImproperlyConfigured(
+                'Распознавание с камер требует настоящего кодировщика в FACE_EMBEDDING_ENCODER, '
+                'PixelProjectionEncoder для него не используется.'
+            )
+        Presence.recover()
+        if self.workers > 1:
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_init_worker,
+                initargs=(settings.FACE_EMBEDDING_ENCODER, settings.FACE_DETECTOR),
+            )
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stopping.set()
+        self._ready.set()
+        with self._lock:
+            camera_ids = list(self._cameras)
+        for camera_id in camera_ids:
+            self.remove_camera(camera_id)
+        self._thread.join()
+        if self._pool is not None:
+            self._pool.shutdown(cancel_futures=True)
+
+    def _take_batch(self):
+        now = time.monotonic()
+        frames = []
+        with self._lock:
+            # Самые давние кадры — первыми, остальные дождутся следующей пачки
+            waiting = sorted(
+                (mailbox.frame[0], camera_id, mailbox)
+                for camera_id, (_, mailbox, _) in self._cameras.items() if mailbox.frame is not None
+            )
+            for captured, camera_id, mailbox in waiting:
+                if len(frames) == self.batch_size:
+                    break
+                _, time_us, frame = mailbox.frame
+                mailbox.frame = None
+                if now - captured > self.max_age:
+                    self.counters['stale'] += 1
+                    continue
+                frames.append((captured, camera_id, time_us, frame))
+        for captured, *_ in frames:
+            self.latency['queue'].add(now - captured)
+        return frames
+
+    def _dispatch(self):
+        try:
+            while not self._stopping.is_set():
+                self._ready.wait(0.5)
+                self._ready.clear()
+                self._collect()
+                while len(self._in_flight) < max(self.workers, 1) and not self._stopping.is_set():
+                    batch = self._take_batch()
+                    if not batch:
+                        break
+                    self._submit(batch)
+                    self._collect()
+                close_old_connections()
+                self.presence.expire()
+            for batch, future in self._in_flight:
+                future.cancel()
+            self._in_flight.clear()
+        except Exception:
+            logger.exception('Ошибка конвейера распознавания')
+        finally:
+            try:
+                self.presence.close_all()
+            finally:
+                connections.close_all()
+
+    def _submit(self, batch):
+        frames = [frame for *_, frame in batch]
+        self.counters['batches'] += 1
+        if self._pool is not None:
+            try:
+                future = self._pool.submit(_embed_in_worker, frames)
+            except BrokenProcessPool:
+                logger.exception('Пул распознавания недоступен, пачки обрабатываются в потоке диспетчера')
+                self._pool = None
+            else:
+                future.add_done_callback(lambda _: self._ready.set())
+                self._in_flight.append((batch, future))
+                return
+        self._handle(batch, embed_frames(frames, *self._local_stages()))
+
+    def _local_stages(self):
+        # На одном ядре (FACE_PIPELINE_WORKERS=1) пул только добавил бы передачу кадров между процессами
+        if self._local is None:
+            from .biometrics import get_encoder
+
+            self._local = (import_string(settings.FACE_DETECTOR)(), get_encoder())
+        return self._local
+
+    def _collect(self):
+        pending = []
+        for batch, future in self._in_flight:
+            if not future.done():
+                pending.append((batch, future))
+                continue
+            try:
+                result = future.result()
+            except Exception:
+                logger.exception('Не удалось обработать пачку кадров')
+                continue
+            self._handle(batch, result)
+        self._in_flight = pending
+
+    def _handle(self, batch, result):
+        vectors, owners, detect_seconds, embed_seconds = result
+        self.latency['detect'].add(detect_seconds / len(batch), len(batch))
+        self.latency['embed'].add(embed_seconds / len(batch), len(batch))
+        self.counters['faces'] += len(owners)
+        if not owners:
+            return
+        started = time.perf_counter()
+        matches = face_index.identify_batch(vectors)
+        matched = time.perf_counter()
+        self.latency['match'].add(matched - started)
+        for number, (user_id, score) in zip(owners, matches):
+            if user_id is None:
+                self.counters['unknown'] += 1
+                continue
+            self.counters['matched'] += 1
+            _, camera_id, time_us, _ = batch[number]
+            if self.presence.seen(user_id, camera_id, time_us):
+                self.counters['sessions'] += 1
+        self.latency['emit'].add(time.perf_counter() - matched)
+
+    def stats(self):
+        with self._lock:
+            counters = dict(self.counters)
+        return {**counters, 'latency': {stage: counter.snapshot() for stage, counter in self.latency.items()}}
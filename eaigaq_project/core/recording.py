@@ -0,0 +1,347 @@
+# core/recording.py
+
+import datetime
+import io
+import logging
+import mmap
+import os
+import queue
+import struct
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import numpy as np
+from django.conf import settings
+from django.db import close_old_connections, connections
+
+logger = logging.getLogger(__name__)
+
+# Запись кадра в файле сегмента: время (мкс epoch), длина JPEG, затем сами байты
+RECORD_HEADER = struct.Struct('<qI')
+# Индекс сегмента: время кадра и смещение его записи в файле сегмента
+INDEX_ENTRY = struct.Struct('<qQ')
+INDEX_DTYPE = np.dtype([('time', '<i8'), ('offset', '<u8')])
+
+SEGMENT_SUFFIX = '.seg'
+INDEX_SUFFIX = '.idx'
+
+
+def get_root():
+    return getattr(settings, 'RECORDING_ROOT')
+
+
+def to_micros(moment):
+    if isinstance(moment, datetime.datetime):
+        moment = moment.timestamp()
+    return int(round(moment * 1_000_000))
+
+
+def from_micros(value):
+    return datetime.datetime.fromtimestamp(value / 1_000_000, tz=datetime.timezone.utc)
+
+
+def encode_jpeg(image, quality):
+    from PIL import Image
+
+    buffer = io.BytesIO()
+    Image.fromarray(image).save(buffer, 'JPEG', quality=quality)
+    return buffer.getvalue()
+
+
+# ---------------------------
+# Сегменты на диске
+# ---------------------------
+
+class SegmentWriter:
+    """
+    Сегмент, открытый на запись. Файл кадров создаётся сразу размером capacity
+    (разреженный) и отображается в память: запись кадра — копирование в mmap без
+    системного вызова. Запись индекса (16 байт) идёт в файл без буфера после
+    самого кадра, поэтому читатель видит в индексе только целиком записанные кадры.
+    При закрытии файл кадров обрезается до фактического размера.
+    """
+
+    def __init__(self, path, start_us, capacity):
+        self.path = path
+        self.start_us = start_us
+        self.end_us = start_us
+        self.capacity = capacity
+        self.position = 0
+        self.frames = 0
+        full_path = os.path.join(get_root(), path)
+        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+        self._file = open(full_path + SEGMENT_SUFFIX, 'w+b')
+        self._file.truncate(capacity)
+        self._map = mmap.mmap(self._file.fileno(), capacity)
+        self._index = open(full_path + INDEX_SUFFIX, 'wb', buffering=0)
+
+    def fits(self, size):
+        return self.position + RECORD_HEADER.size + size <= self.capacity
+
+    def append(self, time_us, data):
+        start = self.position + RECORD_HEADER.size
+        RECORD_HEADER.pack_into(self._map, self.position, time_us, len(data))
+        self._map[start:start + len(data)] = data
+        self._index.write(INDEX_ENTRY.pack(time_us, self.position))
+        self.position = start + len(data)
+        self.end_us = time_us
+        self.frames += 1
+
+    def close(self):
+        self._map.flush()
+        self._map.close()
+        self._file.truncate(self.position)
+        self._file.close()
+        self._index.close()
+
+
+def segment_path(camera_id, start_us):
+    # Каталог на камеру и день: RECORDING_ROOT/<id камеры>/ГГГГ/ММ/ДД/<начало, мкс>
+    day = from_micros(start_us)
+    return os.path.join(str(camera_id), f'{day:%Y}', f'{day:%m}', f'{day:%d}', str(start_us))
+
+
+def read_index(path):
+    """
+    Индекс сегмента, отображённый в память (только целые записи: сегмент может
+    ещё писаться). Пустой индекс — пустой массив.
+    """
+    index_path = os.path.join(get_root(), path) + INDEX_SUFFIX
+    count = os.path.getsize(index_path) // INDEX_DTYPE.itemsize
+    if not count:
+        return np.empty(0, dtype=INDEX_DTYPE)
+    return np.memmap(index_path, dtype=INDEX_DTYPE, mode='r', shape=(count,))
+
+
+def read_segment(path, start_us=None, end_us=None):
+    """
+    Кадры сегмента в интервале [start_us, end_us): начало находится двоичным
+    поиском по индексу, сами кадры читаются из файла, отображённого в память.
+    Возвращает пары (время, мкс; JPEG).
+    """
+    index = read_index(path)
+    times = index['time']
+    begin = 0 if start_us is None else int(np.searchsorted(times, start_us, 'left'))
+    end = len(index) if end_us is None else int(np.searchsorted(times, end_us, 'left'))
+    if begin >= end:
+        return
+    offsets = index['offset'][begin:end]
+    with open(os.path.join(get_root(), path) + SEGMENT_SUFFIX, 'rb') as file, \
+            mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        for offset in offsets:
+            offset = int(offset)
+            time_us, size = RECORD_HEADER.unpack_from(data, offset)
+            start = offset + RECORD_HEADER.size
+            yield time_us, data[start:start + size]
+
+
+def segments_between(camera_id, start, end):
+    """
+    Сегменты камеры, пересекающиеся с [start, end), по возрастанию начала.
+    Сегмент не длиннее RECORDING_SEGMENT_SECONDS, поэтому условие на start
+    ограничено с обеих сторон и читается диапазоном по индексу (camera, start).
+    """
+    from .models import RecordingSegment
+
+    longest = datetime.timedelta(seconds=getattr(settings, 'RECORDING_SEGMENT_SECONDS', 300))
+    segments = RecordingSegment.objects.filter(
+        camera_id=camera_id, start__gte=start - longest, start__lt=end,
+    ).order_by('start', 'id')
+    return [segment for segment in segments if segment.end is None or segment.end >= start]
+
+
+def frames_between(segments, start, end):
+    start_us, end_us = to_micros(start), to_micros(end)
+    for segment in segments:
+        try:
+            yield from read_segment(segment.path, start_us, end_us)
+        except FileNotFoundError:
+            logger.warning('Нет файлов сегмента %s камеры %s', segment.path, segment.camera_id)
+
+
+MJPEG_BOUNDARY = 'frame'
+
+
+def mjpeg_stream(frames):
+    """
+    Кадры как multipart/x-mixed-replace (MJPEG): браузер и видеоплееры
+    показывают его без перекодирования. Время кадра — в заголовке X-Timestamp (мкс).
+    """
+    for time_us, data in frames:
+        yield (
+            f'--{MJPEG_BOUNDARY}\r\nContent-Type: image/jpeg\r\nContent-Length: {len(data)}\r\n'
+            f'X-Timestamp: {time_us}\r\n\r\n'
+        ).encode('ascii') + data + b'\r\n'
+
+
+def recover(camera_id):
+    """
+    Закрывает сегменты, оставшиеся открытыми после остановки записи без закрытия
+    (сбой, kill -9): конец и число кадров берутся из индекса, хвост файла кадров
+    за последней записью обрезается.
+    """
+    from .models import RecordingSegment
+
+    for segment in RecordingSegment.objects.filter(camera_id=camera_id, end__isnull=True):
+        try:
+            index = read_index(segment.path)
+            segment_file = os.path.join(get_root(), segment.path) + SEGMENT_SUFFIX
+            size = 0
+            if len(index):
+                with open(segment_file, 'rb') as file:
+                    file.seek(int(index['offset'][-1]))
+                    _, length = RECORD_HEADER.unpack(file.read(RECORD_HEADER.size))
+                size = int(index['offset'][-1]) + RECORD_HEADER.size + length
+            os.truncate(segment_file, size)
+        except FileNotFoundError:
+            index, size = [], 0
+        segment.frames = len(index)
+        segment.size = size
+        segment.end = from_micros(int(index['time'][-1])) if len(index) else segment.start
+        segment.save(update_fields=['end', 'frames', 'size'])
+
+
+# ---------------------------
+# Запись камеры
+# ---------------------------
+
+class Recorder:
+    """
+    Запись одной камеры: поток захвата читает источник (core/cameras.py),
+    кадры-массивы сжимаются в JPEG пулом из RECORDING_WORKERS потоков (Pillow
+    отпускает GIL), поток записи раскладывает их по сегментам в порядке захвата.
+
+    Одновременно в обработке не больше RECORDING_QUEUE_SIZE кадров. Когда
+    сжатие или диск не успевают, захват ждёт освобождения места (обратное
+    давление на источник). Живой источник остановить нельзя, поэтому его кадр
+    ждёт не дольше длительности кадра, а затем отбрасывается и учитывается
+    в dropped; файл с realtime=False просто читается медленнее.
+    """
+
+    def __init__(self, camera, source):
+        self.camera = camera
+        self.source = source
+        self.segment_seconds = getattr(settings, 'RECORDING_SEGMENT_SECONDS', 300)
+        self.segment_bytes = getattr(settings, 'RECORDING_SEGMENT_BYTES', 256 * 1024 * 1024)
+        self.quality = getattr(settings, 'RECORDING_JPEG_QUALITY', 80)
+        self.captured = 0
+        self.written = 0
+        self.dropped = 0
+        self._slots = threading.BoundedSemaphore(getattr(settings, 'RECORDING_QUEUE_SIZE', 50))
+        self._pending = queue.SimpleQueue()
+        self._pool = ThreadPoolExecutor(
+            max_workers=getattr(settings, 'RECORDING_WORKERS', 2),
+            thread_name_prefix=f'camera-{camera.pk}-encode',
+        )
+        self._stopping = threading.Event()
+        self._record = None
+        self._threads = [
+            threading.Thread(target=self._capture, name=f'camera-{camera.pk}-capture', daemon=True),
+            threading.Thread(target=self._write, name=f'camera-{camera.pk}-write', daemon=True),
+        ]
+
+    def start(self):
+        recover(self.camera.pk)
+        for thread in self._threads:
+            thread.start()
+        return self
+
+    def stop(self):
+        self._stopping.set()
+        self.source.close()
+
+    def join(self, timeout=None):
+        for thread in self._threads:
+            thread.join(timeout)
+        self._pool.shutdown(wait=False)
+
+    def is_alive(self):
+        return any(thread.is_alive() for thread in self._threads)
+
+    def stats(self):
+        return {'captured': self.captured, 'written': self.written, 'dropped': self.dropped}
+
+    def _reserve(self, live, frame_time):
+        while not self._slots.acquire(timeout=frame_time):
+            if live or self._stopping.is_set():
+                return False
+        return True
+
+    def _capture(self):
+        live = getattr(self.source, 'realtime', True)
+        frame_time = 1 / (getattr(self.source, 'fps', None) or 25)
+        try:
+            for timestamp, image in self.source:
+                if self._stopping.is_set():
+                    break
+                self.captured += 1
+                if not self._reserve(live, frame_time):
+                    self.dropped += 1
+                    continue
+                if isinstance(image, np.ndarray):
+                    future = self._pool.submit(encode_jpeg, image, self.quality)
+                else:
+                    future = Future()
+                    future.set_result(bytes(image))
+                self._pending.put((to_micros(timestamp), future))
+        except Exception:
+            logger.exception('Ошибка захвата кадров камеры %s', self.camera.pk)
+        finally:
+            self.source.close()
+            self._pending.put(None)
+
+    def _write(self):
+        segment = None
+        try:
+            while (item := self._pending.get()) is not None:
+                time_us, future = item
+                try:
+                    data = future.result()
+                except Exception:
+                    logger.exception('Не удалось сжать кадр камеры %s', self.camera.pk)
+                    self.dropped += 1
+                    continue
+                finally:
+                    self._slots.release()
+                if segment is not None:
+                    # Индекс сегмента должен быть упорядочен, даже если часы источника сдвинулись назад
+                    time_us = max(time_us, segment.end_us)
+                if segment is not None and (
+                    time_us - segment.start_us >= self.segment_seconds * 1_000_000 or not segment.fits(len(data))
+                ):
+                    segment = self._close(segment)
+                if segment is None:
+                    if RECORD_HEADER.size + len(data) > self.segment_bytes:
+                        logger.warning('Кадр камеры %s больше сегмента, пропущен', self.camera.pk)
+                        self.dropped += 1
+                        continue
+                    segment = self._open(time_us)
+                segment.append(time_us, data)
+                self.written += 1
+        except Exception:
+            logger.exception('Ошибка записи камеры %s', self.camera.pk)
+            self.stop()
+        finally:
+            if segment is not None:
+                self._close(segment)
+            connections.close_all()
+
+    def _open(self, start_us):
+        from .models import RecordingSegment
+
+        close_old_connections()
+        segment = SegmentWriter(segment_path(self.camera.pk, start_us), start_us, self.segment_bytes)
+        self._record = RecordingSegment.objects.create(
+            camera=self.camera, start=from_micros(start_us), path=segment.path,
+        )
+        return segment
+
+    def _close(self, segment):
+        segment.close()
+        record = self._record
+        record.end = from_micros(segment.end_us)
+        record.frames = segment.frames
+        record.size = segment.position
+        close_old_connections()
+        record.save(update_fields=['end', 'frames', 'size'])
+        return None
@@ -0,0 +1,38 @@
+# core/renderers.py
+
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils import encoders
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - без orjson работает стандартный json
+    orjson = None
+
+if orjson is not None:
+    # Даты и время — через кодировщик DRF, чтобы формат совпадал со стандартным
+    # рендерером (миллисекунды, 'Z' для UTC); ключи-числа допустимы, как в json
+    ORJSON_OPTIONS = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+
+_encoder = encoders.JSONEncoder()
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    JSON-рендерер на orjson с тем же результатом, что и JSONRenderer DRF:
+    компактный UTF-8, даты в формате DRF, ленивые строки gettext_lazy,
+    UUID, Decimal, timedelta и QuerySet — через кодировщик DRF.
+
+    Без orjson, а также для форматированного вывода (indent, Browsable API)
+    используется стандартный JSONRenderer.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None or self.get_indent(accepted_media_type, renderer_context or {}) is not None:
+            return super().render(data, accepted_media_type, renderer_context)
+        if data is None:
+            return b''
+        ret = orjson.dumps(data, default=_encoder.default, option=ORJSON_OPTIONS)
+        # Как и DRF: U+2028/U+2029 экранируются, чтобы JSON оставался подмножеством JavaScript
+        if b'\xe2\x80\xa8' in ret or b'\xe2\x80\xa9' in ret:
+            ret = ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+        return ret
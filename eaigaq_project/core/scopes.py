@@ -0,0 +1,146 @@
+# core/scopes.py
+
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models import Q
+
+from .cache import LRUCache
+
+REGION = 'REGION_HEAD'
+DEPARTMENT = 'DEPARTMENT_HEAD'
+
+# Версия структуры отделений: меняется при создании, удалении и переносе отделения
+# между регионами, чтобы закэшированные области видимости перестали совпадать по ключу.
+# Хранится в общем кэше (SCOPE_CACHE_ALIAS), поэтому сброс доходит до всех процессов
+DEPARTMENT_VERSION_KEY = 'core:scopes:department_version'
+
+scope_cache = LRUCache(
+    maxsize=getattr(settings, 'SCOPE_CACHE_SIZE', 4096),
+    ttl=getattr(settings, 'SCOPE_CACHE_TTL', 30),
+)
+
+
+class Scope:
+    """
+    Область видимости пользователя: роль, регион, отделение и — для главного
+    по региону — заранее вычисленный список отделений региона.
+
+    Фильтры строятся по столбцам внешних ключей (department_id IN (...),
+    created_by_id = ...), поэтому таблица отделений в запрос не попадает.
+    """
+
+    __slots__ = ('user_id', 'role', 'region', 'department_id', 'department_ids')
+
+    def __init__(self, user_id, role, region, department_id, department_ids=()):
+        self.user_id = user_id
+        self.role = role
+        self.region = region
+        self.department_id = department_id
+        self.department_ids = tuple(department_ids)
+
+    def q(self, department=None, owner=None, region=None):
+        """
+        Условие для модели, где department, owner и region — пути (только прямые
+        внешние ключи, чтобы соединения не размножали строки) к отделению, к
+        пользователю-владельцу и к полю региона. Путь region, если есть, используется
+        для главного по региону вместо списка отделений.
+        """
+        if self.role == REGION:
+            if region is not None:
+                return Q(**{region: self.region})
+            if department is not None:
+                return Q(**{f'{department}__in': self.department_ids})
+        elif self.role == DEPARTMENT:
+            if department is not None:
+                return Q(**{department: self.department_id})
+        elif owner is not None:
+            return Q(**{owner: self.user_id})
+        # Для роли не задан путь — ничего не видно
+        return Q(pk__in=[])
+
+    def allows(self, department_id=None, owner_id=None, region=None):
+        """
+        Та же проверка для уже загруженных значений (например, из кэша).
+        """
+        if self.role == REGION:
+            if region is not None:
+                return region == self.region
+            return department_id is not None and department_id in self.department_ids
+        elif self.role == DEPARTMENT:
+            return department_id is not None and department_id == self.department_id
+        return owner_id is not None and owner_id == self.user_id
+
+
+def resolve(user):
+    from .models import Department
+
+    key = (user.pk, user.role, user.region, user.department_id, department_version())
+    scope = scope_cache.get(key)
+    if scope is None:
+        department_ids = ()
+        if user.role == REGION:
+            department_ids = Department.objects.filter(region=user.region).values_list('id', flat=True)
+        scope = Scope(user.pk, user.role, user.region, user.department_id, department_ids)
+        scope_cache.set(key, scope)
+    return scope
+
+
+def get_scope(request):
+    """
+    Область видимости текущего пользователя; вычисляется один раз за запрос.
+    """
+    request = getattr(request, '_request', request)
+    scope = getattr(request, '_scope', None)
+    if scope is None or scope.user_id != request.user.pk:
+        scope = request._scope = resolve(request.user)
+    return scope
+
+
+def _version_cache():
+    return caches[getattr(settings, 'SCOPE_CACHE_ALIAS', 'default')]
+
+
+def department_version():
+    # Начальное значение — время, чтобы после вытеснения ключа версия не повторила прежнюю
+    return _version_cache().get_or_set(DEPARTMENT_VERSION_KEY, time.time_ns, timeout=None)
+
+
+def _bump_department_version():
+    cache = _version_cache()
+    try:
+        cache.incr(DEPARTMENT_VERSION_KEY)
+    except ValueError:
+        cache.set(DEPARTMENT_VERSION_KEY, time.time_ns(), timeout=None)
+
+
+def invalidate_departments():
+    _bump_department_version()
+    # И ещё раз после фиксации: область, которую другой процесс успел вычислить
+    # по данным до фиксации, не переживёт её
+    transaction.on_commit(_bump_department_version)
+
+
+def invalidate_user(user_id):
+    scope_cache.delete_many([key for key in scope_cache.keys() if key[0] == user_id])
+
+
+class ScopedQuerysetMixin:
+    """
+    Ограничивает queryset областью видимости пользователя. ViewSet задаёт пути:
+    scope_department, scope_owner и (необязательно) scope_region.
+    """
+    scope_department = None
+    scope_owner = None
+    scope_region = None
+
+    @property
+    def scope(self):
+        return get_scope(self.request)
+
+    def scope_queryset(self, queryset):
+        return queryset.filter(
+            self.scope.q(department=self.scope_department, owner=self.scope_owner, region=self.scope_region)
+        )
@@ -0,0 +1,174 @@
+# core/search.py
+
+import re
+
+from django.db import connection, transaction
+from django.db.models import Count, IntegerField, OuterRef, Q, Subquery, Value
+
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+MIN_TOKEN_LENGTH = 2
+MAX_TOKEN_LENGTH = 64
+MAX_QUERY_TOKENS = 8
+
+SEARCH_CONFIG = 'russian'
+
+# Поля, по которым ищем, для каждой модели (имя модели -> поля)
+SEARCH_FIELDS = {
+    'case': ('name', 'description'),
+    'materialevidence': ('name', 'description', 'barcode'),
+}
+
+
+def uses_postgres():
+    return connection.vendor == 'postgresql'
+
+
+def tokenize(text):
+    tokens = set()
+    for token in TOKEN_RE.findall((text or '').lower().replace('ё', 'е')):
+        if MIN_TOKEN_LENGTH <= len(token) <= MAX_TOKEN_LENGTH:
+            tokens.add(token)
+    return tokens
+
+
+def search(queryset, query):
+    """
+    Фильтрует queryset по строке поиска и аннотирует его полем rank
+    (чем больше, тем релевантнее). Области видимости queryset не меняет —
+    они должны быть применены заранее.
+    """
+    fields = SEARCH_FIELDS[queryset.model._meta.model_name]
+    if uses_postgres():
+        return _search_postgres(queryset, query, fields)
+    return _search_inverted_index(queryset, query)
+
+
+# ---------------------------
+# PostgreSQL: полнотекстовый поиск + триграммы
+# ---------------------------
+
+def _search_postgres(queryset, query, fields):
+    from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector, TrigramSimilarity
+
+    vector = SearchVector(*fields, config=SEARCH_CONFIG)
+    search_query = SearchQuery(query, config=SEARCH_CONFIG, search_type='websearch')
+    condition = Q(search_vector=search_query) | Q(name__trigram_similar=query)
+    if 'barcode' in fields:
+        condition |= Q(barcode=query)
+    return queryset.annotate(
+        search_vector=vector,
+        rank=SearchRank(vector, search_query) + TrigramSimilarity('name', query),
+    ).filter(condition)
+
+
+def create_postgres_indexes(sender=None, using='default', **kwargs):
+    """
+    Создаёт GIN-индексы для поиска (post_migrate). Выражения индексов совпадают
+    с теми, что строит _search_postgres, поэтому планировщик их использует.
+    """
+    from django.db import connections
+    from .models import Case, MaterialEvidence
+
+    db = connections[using]
+    if db.vendor != 'postgresql':
+        return
+    statements = ['CREATE EXTENSION IF NOT EXISTS pg_trgm']
+    for model in (Case, MaterialEvidence):
+        table = model._meta.db_table
+        fields = SEARCH_FIELDS[model._meta.model_name]
+        document = " || ' ' || ".join(f"COALESCE(({field})::text, '')" for field in fields)
+        statements.append(
+            f'CREATE INDEX IF NOT EXISTS {table}_search_fts ON {table} '
+            f"USING gin (to_tsvector('{SEARCH_CONFIG}'::regconfig, {document}))"
+        )
+        statements.append(
+            f'CREATE INDEX IF NOT EXISTS {table}_search_trgm ON {table} USING gin (name gin_trgm_ops)'
+        )
+    with db.cursor() as cursor:
+        for statement in statements:
+            cursor.execute(statement)
+
+
+# ---------------------------
+# Остальные СУБД (SQLite для разработки): инвертированный индекс SearchToken
+# ---------------------------
+
+def _token_filter(tokens):
+    # Поиск по префиксу через диапазон, чтобы использовать индекс (kind, token)
+    condition = Q()
+    for token in tokens:
+        condition |= Q(token__gte=token, token__lt=token + '\uffff')
+    return condition
+
+
+def _search_inverted_index(queryset, query):
+    from .models import SearchToken
+
+    tokens = sorted(tokenize(query))[:MAX_QUERY_TOKENS]
+    if not tokens:
+        return queryset.none().annotate(rank=Value(0, output_field=IntegerField()))
+    matches = SearchToken.objects.filter(kind=queryset.model._meta.model_name).filter(_token_filter(tokens))
+    rank = Subquery(
+        matches.filter(object_id=OuterRef('pk'))
+        .values('object_id')
+        .annotate(hits=Count('token', distinct=True))
+        .values('hits')[:1],
+        output_field=IntegerField(),
+    )
+    return queryset.filter(pk__in=matches.values('object_id')).annotate(rank=rank)
+
+
+def index_object(instance):
+    """
+    Перестраивает записи инвертированного индекса для одного объекта.
+    """
+    index_objects([instance])
+
+
+def index_objects(instances):
+    """
+    Перестраивает записи инвертированного индекса для набора объектов одной модели
+    (используется и при bulk_create, который не отправляет сигналы).
+    """
+    from .models import SearchToken
+
+    if not instances:
+        return
+    kind = instances[0]._meta.model_name
+    tokens = []
+    for instance in instances:
+        words = set()
+        for field in SEARCH_FIELDS[kind]:
+            words |= tokenize(getattr(instance, field))
+        tokens.extend(SearchToken(kind=kind, token=word, object_id=instance.pk) for word in words)
+    with transaction.atomic():
+        SearchToken.objects.filter(kind=kind, object_id__in=[instance.pk for instance in instances]).delete()
+        SearchToken.objects.bulk_create(tokens)
+
+
+def unindex_object(instance):
+    from .models import SearchToken
+
+    SearchToken.objects.filter(kind=instance._meta.model_name, object_id=instance.pk).delete()
+
+
+def rebuild_inverted_index(model, batch_size=1000):
+    from .models import SearchToken
+
+    kind = model._meta.model_name
+    fields = SEARCH_FIELDS[kind]
+    SearchToken.objects.filter(kind=kind).delete()
+    batch = []
+    count = 0
+    for values in model.objects.values_list('pk', *fields).iterator(chunk_size=batch_size):
+        pk, texts = values[0], values[1:]
+        tokens = set()
+        for text in texts:
+            tokens |= tokenize(text)
+        batch.extend(SearchToken(kind=kind, token=token, object_id=pk) for token in tokens)
+        count += 1
+        if len(batch) >= batch_size:
+            SearchToken.objects.bulk_create(batch)
+            batch = []
+    SearchToken.objects.bulk_create(batch)
+    return count
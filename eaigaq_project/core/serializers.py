@@ -1,9 +1,11 @@
 # core/serializers.py
 
+import uuid
+
 from rest_framework import serializers
 from .models import (
     User, Department, Case, MaterialEvidence, MaterialEvidenceEvent,
-    Session, Camera, AuditEntry, EvidenceGroup
+    Session, Camera, AuditEntry, EvidenceGroup, MaterialEvidenceStatus, RecordingSegment
 )
 
 class DepartmentSerializer(serializers.ModelSerializer):
@@ -22,12 +24,13 @@ class UserSerializer(serializers.ModelSerializer):
     region_display = serializers.CharField(source='get_region_display', read_only=True)
     role_display = serializers.CharField(source='get_role_display', read_only=True)
     full_name = serializers.CharField(source='get_full_name', read_only=True)
+    has_face_data = serializers.BooleanField(read_only=True)
 
     class Meta:
         model = User
         fields = [
             'id', 'username', 'password', 'first_name', 'last_name', 'full_name',
-            'email', 'phone_number', 'rank', 'face_data',
+            'email', 'phone_number', 'rank', 'has_face_data',
             'department', 'department_id', 'region', 'region_display',
             'role', 'role_display', 'is_active'
         ]
@@ -98,15 +101,16 @@ class MaterialEvidenceSerializer(serializers.ModelSerializer):
         allow_null=True
     )
     group_name = serializers.CharField(source='group.name', read_only=True)
+    last_holder_name = serializers.CharField(source='last_holder.get_full_name', read_only=True, default=None)
 
     class Meta:
         model = MaterialEvidence
         fields = [
             'id', 'name', 'description', 'case', 'case_id', 'created_by',
             'status', 'status_display', 'barcode', 'created', 'updated', 'active',
-            'group_id', 'group_name',
+            'group_id', 'group_name', 'last_holder', 'last_holder_name', 'last_event_at',
         ]
-        read_only_fields = ['created_by', 'created', 'updated', 'barcode']
+        read_only_fields = ['created_by', 'created', 'updated', 'barcode', 'last_holder', 'last_event_at']
 
     def create(self, validated_data):
         validated_data['created_by'] = self.context['request'].user
@@ -115,8 +119,66 @@ class MaterialEvidenceSerializer(serializers.ModelSerializer):
         return super().create(validated_data)
 
     def generate_unique_barcode(self):
-        import uuid
-        return str(uuid.uuid4())
+        return generate_barcodes(1)[0]
+
+
+def generate_barcodes(count):
+    return [str(uuid.uuid4()) for _ in range(count)]
+
+
+class MaterialEvidenceBulkItemSerializer(serializers.Serializer):
+    """
+    Элемент пакетной регистрации ВД. Дело и группа передаются идентификаторами
+    и проверяются во ViewSet одним запросом на весь пакет.
+    """
+    name = serializers.CharField(max_length=255)
+    description = serializers.CharField(allow_blank=True)
+    case_id = serializers.IntegerField()
+    group_id = serializers.IntegerField(required=False, allow_null=True)
+
+class MaterialEvidenceFlatSerializer(serializers.ModelSerializer):
+    """
+    Плоское представление ВД для списков: связи отдаются идентификаторами
+    и отображаемыми именами вместо вложенных объектов.
+    """
+    case_name = serializers.CharField(source='case.name', read_only=True, default=None)
+    created_by_name = serializers.CharField(source='created_by.get_full_name', read_only=True, default=None)
+    group_name = serializers.CharField(source='group.name', read_only=True, default=None)
+    status_display = serializers.CharField(source='get_status_display', read_only=True)
+    last_holder_name = serializers.CharField(source='last_holder.get_full_name', read_only=True, default=None)
+
+    class Meta:
+        model = MaterialEvidence
+        fields = [
+            'id', 'name', 'description', 'case_id', 'case_name',
+            'created_by_id', 'created_by_name', 'group_id', 'group_name',
+            'status', 'status_display', 'barcode', 'created', 'updated', 'active',
+            'last_holder_id', 'last_holder_name', 'last_event_at',
+        ]
+        read_only_fields = fields
+
+class MaterialEvidenceBulkStatusSerializer(serializers.Serializer):
+    """
+    Пакетная смена статуса ВД. Выборка задаётся ровно одним из полей:
+    group_id, case_id, ids или barcodes.
+    """
+    SELECTORS = ('group_id', 'case_id', 'ids', 'barcodes')
+
+    status = serializers.ChoiceField(choices=MaterialEvidenceStatus.choices)
+    group_id = serializers.IntegerField(required=False)
+    case_id = serializers.IntegerField(required=False)
+    ids = serializers.ListField(child=serializers.IntegerField(), required=False, allow_empty=False)
+    barcodes = serializers.ListField(child=serializers.CharField(), required=False, allow_empty=False)
+
+    def validate(self, attrs):
+        selectors = [name for name in self.SELECTORS if name in attrs]
+        if len(selectors) != 1:
+            raise serializers.ValidationError('Укажите ровно одно из полей: group_id, case_id, ids, barcodes.')
+        limit = self.context.get('limit')
+        if limit and len(attrs.get('ids') or attrs.get('barcodes') or ()) > limit:
+            raise serializers.ValidationError(f'Не более {limit} ВД за запрос.')
+        return attrs
+
 
 class MaterialEvidenceEventSerializer(serializers.ModelSerializer):
     user = UserSerializer(read_only=True)
@@ -137,18 +199,42 @@ class MaterialEvidenceEventSerializer(serializers.ModelSerializer):
         validated_data['user'] = self.context['request'].user
         return super().create(validated_data)
 
+class MaterialEvidenceEventFlatSerializer(serializers.ModelSerializer):
+    """
+    Плоское представление события ВД для списков.
+    """
+    user_name = serializers.CharField(source='user.get_full_name', read_only=True)
+    material_evidence_name = serializers.CharField(source='material_evidence.name', read_only=True)
+    material_evidence_barcode = serializers.CharField(source='material_evidence.barcode', read_only=True)
+    action_display = serializers.CharField(source='get_action_display', read_only=True)
+
+    class Meta:
+        model = MaterialEvidenceEvent
+        fields = [
+            'id', 'user_id', 'user_name', 'material_evidence_id', 'material_evidence_name',
+            'material_evidence_barcode', 'case_id', 'action', 'action_display', 'created',
+        ]
+        read_only_fields = fields
+
 class SessionSerializer(serializers.ModelSerializer):
     user = UserSerializer(read_only=True)
 
     class Meta:
         model = Session
-        fields = ['id', 'user', 'login', 'logout', 'active']
+        fields = ['id', 'user', 'login', 'logout', 'active', 'camera']
+        read_only_fields = ['camera']
 
 class CameraSerializer(serializers.ModelSerializer):
     class Meta:
         model = Camera
         fields = ['id', 'device_id', 'name', 'type', 'created', 'updated', 'active']
 
+class RecordingSegmentSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = RecordingSegment
+        fields = ['id', 'camera', 'start', 'end', 'frames', 'size']
+        read_only_fields = fields
+
 class AuditEntrySerializer(serializers.ModelSerializer):
     user = UserSerializer(read_only=True)
 
@@ -156,14 +242,53 @@ class AuditEntrySerializer(serializers.ModelSerializer):
         model = AuditEntry
         fields = [
             'id', 'object_id', 'table_name', 'class_name', 'action',
-            'fields', 'data', 'created', 'user'
+            'fields', 'data', 'created', 'user', 'region', 'department'
+        ]
+        read_only_fields = ['created', 'user', 'region', 'department']
+
+class EvidenceGroupItemSerializer(serializers.ModelSerializer):
+    """
+    ВД внутри группы: дело и группа уже известны из самой группы, поэтому
+    вложенные дело и пользователи не повторяются для каждого предмета.
+    """
+    status_display = serializers.CharField(source='get_status_display', read_only=True)
+    last_holder_name = serializers.CharField(source='last_holder.get_full_name', read_only=True, default=None)
+
+    class Meta:
+        model = MaterialEvidence
+        fields = [
+            'id', 'name', 'description', 'status', 'status_display', 'barcode',
+            'created', 'updated', 'active', 'last_holder', 'last_holder_name', 'last_event_at',
         ]
-        read_only_fields = ['created', 'user']
+        read_only_fields = fields
 
 class EvidenceGroupSerializer(serializers.ModelSerializer):
-    material_evidences = MaterialEvidenceSerializer(many=True, read_only=True)
+    """
+    Группа с вложенными ВД и сводкой по ним. Сводку (атрибуты evidence_count и
+    <status>_count) EvidenceGroupViewSet считает одним GROUP BY-запросом на
+    страницу; без этих атрибутов она считается по material_evidences.
+    """
+    material_evidences = EvidenceGroupItemSerializer(many=True, read_only=True)
+    evidence_count = serializers.SerializerMethodField()
+    status_counts = serializers.SerializerMethodField()
 
     class Meta:
         model = EvidenceGroup
-        fields = ['id', 'name', 'case', 'created_by', 'created', 'updated', 'active', 'material_evidences']
+        fields = [
+            'id', 'name', 'case', 'created_by', 'created', 'updated', 'active',
+            'evidence_count', 'status_counts', 'material_evidences',
+        ]
         read_only_fields = ['created_by', 'created', 'updated', 'material_evidences']
+
+    def get_evidence_count(self, obj):
+        if hasattr(obj, 'evidence_count'):
+            return obj.evidence_count
+        return len(obj.material_evidences.all())
+
+    def get_status_counts(self, obj):
+        if hasattr(obj, 'evidence_count'):
+            return {value: getattr(obj, f'{value.lower()}_count') for value in MaterialEvidenceStatus.values}
+        counts = dict.fromkeys(MaterialEvidenceStatus.values, 0)
+        for evidence in obj.material_evidences.all():
+            counts[evidence.status] = counts.get(evidence.status, 0) + 1
+        return counts
@@ -0,0 +1,441 @@
+# core/signals.py
+
+from collections import Counter
+
+from django.db.models import Q
+from django.db.models.signals import post_delete, post_init, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from . import profiles, push, scopes, search, stats, sync
+from .biometrics import face_index, from_bytes
+from .cache import barcode_cache
+from .models import (
+    Camera, Case, Department, EvidenceGroup, FaceEmbedding, MaterialEvidence, MaterialEvidenceEvent, Session, User,
+)
+
+
+# ---------------------------
+# Предыдущие значения полей
+# ---------------------------
+
+# Поля, изменение которых переносит объект между ячейками счётчиков или областями видимости.
+# Значения запоминаются при загрузке объекта и сбрасываются последним обработчиком post_save.
+TRACKED_FIELDS = {
+    Case: ('department_id',),
+    MaterialEvidence: ('case_id', 'status'),
+    EvidenceGroup: ('case_id',),
+    Session: ('user_id', 'active'),
+    User: ('department_id',),
+}
+
+
+def _current_state(instance):
+    # Только загруженные значения: отложенное поле не должно вызывать запрос
+    values = instance.__dict__
+    fields = TRACKED_FIELDS[type(instance)]
+    if not all(field in values for field in fields):
+        return None
+    return {field: values[field] for field in fields}
+
+
+def previous_state(instance):
+    """
+    Значения отслеживаемых полей на момент загрузки (или последнего сохранения);
+    None — если объект новый или поля были отложены.
+    """
+    return getattr(instance, '_tracked_state', None)
+
+
+def state_changed(instance):
+    previous, current = previous_state(instance), _current_state(instance)
+    return previous is not None and current is not None and previous != current
+
+
+@receiver(post_init, sender=Case)
+@receiver(post_init, sender=MaterialEvidence)
+@receiver(post_init, sender=EvidenceGroup)
+@receiver(post_init, sender=Session)
+@receiver(post_init, sender=User)
+def track_state(sender, instance, **kwargs):
+    instance._tracked_state = _current_state(instance) if instance.pk is not None else None
+
+
+# ---------------------------
+# Индекс лиц
+# ---------------------------
+
+@receiver(post_save, sender=FaceEmbedding)
+def face_embedding_saved(sender, instance, **kwargs):
+    face_index.sync_user(instance.user, from_bytes(instance.vector))
+
+
+@receiver(post_delete, sender=FaceEmbedding)
+def face_embedding_deleted(sender, instance, **kwargs):
+    face_index.discard(instance.user_id)
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, update_fields=None, **kwargs):
+    if update_fields is not None and not {'is_active', 'region', 'department'} & set(update_fields):
+        return
+    face_index.sync_user(instance)
+
+
+@receiver(post_delete, sender=User)
+def user_deleted(sender, instance, **kwargs):
+    face_index.discard(instance.pk)
+
+
+# ---------------------------
+# Области видимости
+# ---------------------------
+
+@receiver(post_save, sender=User)
+def user_scope_changed(sender, instance, created, update_fields=None, **kwargs):
+    if created or (update_fields is not None and not {'role', 'region', 'department'} & set(update_fields)):
+        return
+    scopes.invalidate_user(instance.pk)
+
+
+@receiver(post_save, sender=Department)
+@receiver(post_delete, sender=Department)
+def department_changed(sender, instance, **kwargs):
+    # Состав отделений региона входит в закэшированные области видимости
+    scopes.invalidate_departments()
+
+
+# ---------------------------
+# Кэш профиля текущего пользователя
+# ---------------------------
+
+@receiver(post_save, sender=User)
+def profile_user_saved(sender, instance, created, update_fields=None, **kwargs):
+    # update_last_login при каждом входе не меняет профиль
+    if created or (update_fields is not None and set(update_fields) <= {'last_login'}):
+        return
+    profiles.invalidate([instance.pk])
+
+
+@receiver(post_delete, sender=User)
+def profile_user_deleted(sender, instance, **kwargs):
+    profiles.invalidate([instance.pk])
+
+
+@receiver(post_save, sender=Department)
+@receiver(pre_delete, sender=Department)
+def profile_department_changed(sender, instance, **kwargs):
+    # Отделение вложено в профили своих сотрудников
+    profiles.invalidate(User.objects.filter(department=instance).values_list('pk', flat=True))
+
+
+# ---------------------------
+# Поисковый индекс (только без PostgreSQL)
+# ---------------------------
+
+@receiver(post_save, sender=Case)
+@receiver(post_save, sender=MaterialEvidence)
+def searchable_saved(sender, instance, **kwargs):
+    if not search.uses_postgres():
+        search.index_object(instance)
+
+
+@receiver(post_delete, sender=Case)
+@receiver(post_delete, sender=MaterialEvidence)
+def searchable_deleted(sender, instance, **kwargs):
+    if not search.uses_postgres():
+        search.unindex_object(instance)
+
+
+# ---------------------------
+# Кэш штрихкодов
+# ---------------------------
+
+@receiver(post_save, sender=MaterialEvidence)
+@receiver(post_delete, sender=MaterialEvidence)
+def material_evidence_changed(sender, instance, **kwargs):
+    barcode_cache.delete(instance.barcode)
+
+
+@receiver(post_save, sender=Case)
+@receiver(post_delete, sender=Case)
+def case_changed(sender, instance, **kwargs):
+    # Название и отделение дела входят в закэшированные записи ВД
+    barcode_cache.clear()
+
+
+# ---------------------------
+# Цепочка хранения ВД
+# ---------------------------
+
+@receiver(pre_save, sender=MaterialEvidenceEvent)
+def evidence_event_fill_case(sender, instance, **kwargs):
+    if instance.case_id is None and instance.material_evidence_id is not None:
+        instance.case_id = instance.material_evidence.case_id
+
+
+@receiver(post_save, sender=MaterialEvidenceEvent)
+def evidence_event_appended(sender, instance, created, **kwargs):
+    if not created:
+        return
+    evidence = instance.material_evidence
+    # Более раннее (запоздавшее) событие не перезаписывает состояние от более позднего
+    updated = MaterialEvidence.objects.filter(
+        Q(last_event_at__isnull=True) | Q(last_event_at__lte=instance.created),
+        pk=instance.material_evidence_id,
+    ).update(
+        status=instance.action,
+        last_holder_id=instance.user_id,
+        last_event_at=instance.created,
+        updated=timezone.now(),
+    )
+    if updated and evidence.status != instance.action:
+        # UPDATE не отправляет сигналы — переносим ВД между статусами в счётчиках сами
+        changes = Counter()
+        department_id = stats.evidence_department(evidence)
+        stats.move(changes, stats.EVIDENCE, department_id, department_id, evidence.status, instance.action)
+        stats.apply(changes)
+        evidence.status = instance.action
+        track_state(MaterialEvidence, evidence)
+    barcode_cache.delete(evidence.barcode)
+
+
+# ---------------------------
+# Счётчики дашборда (core/stats.py)
+# ---------------------------
+
+@receiver(post_save, sender=Case)
+def stats_case_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    changes = Counter()
+    if created:
+        changes[(stats.CASES, instance.department_id, '')] += 1
+    elif state_changed(instance):
+        old_department_id = previous_state(instance)['department_id']
+        stats.move(changes, stats.CASES, old_department_id, instance.department_id)
+        for status, count in stats.case_evidence(instance.pk):
+            stats.move(changes, stats.EVIDENCE, old_department_id, instance.department_id, status, status, count)
+    stats.apply(changes)
+
+
+@receiver(pre_delete, sender=Case)
+def stats_case_deleted(sender, instance, **kwargs):
+    # ВД удаляемого дела остаются без дела (SET_NULL) — а значит, и без отделения
+    changes = Counter({(stats.CASES, instance.department_id, ''): -1})
+    for status, count in stats.case_evidence(instance.pk):
+        stats.move(changes, stats.EVIDENCE, instance.department_id, None, status, status, count)
+    stats.apply(changes)
+
+
+@receiver(post_save, sender=MaterialEvidence)
+def stats_evidence_saved(sender, instance, created, raw=False, **kwargs):
+    if raw or not (created or state_changed(instance)):
+        return
+    department_id = stats.evidence_department(instance)
+    changes = Counter({(stats.EVIDENCE, department_id, instance.status): 1})
+    if not created:
+        previous = previous_state(instance)
+        old_department_id = (
+            department_id if previous['case_id'] == instance.case_id else stats.case_department(previous['case_id'])
+        )
+        changes[(stats.EVIDENCE, old_department_id, previous['status'])] -= 1
+    stats.apply(changes)
+
+
+@receiver(post_delete, sender=MaterialEvidence)
+def stats_evidence_deleted(sender, instance, **kwargs):
+    department_id = stats.case_department(instance.case_id)
+    stats.apply({(stats.EVIDENCE, department_id, instance.status): -1})
+
+
+@receiver(post_save, sender=Session)
+def stats_session_saved(sender, instance, created, raw=False, **kwargs):
+    if raw or not (created or state_changed(instance)):
+        return
+    changes = Counter()
+    if instance.active:
+        changes[(stats.ACTIVE_SESSIONS, stats.session_department(instance), '')] += 1
+    previous = previous_state(instance)
+    if not created and previous['active']:
+        changes[(stats.ACTIVE_SESSIONS, stats.user_department(previous['user_id']), '')] -= 1
+    stats.apply(changes)
+
+
+@receiver(post_delete, sender=Session)
+def stats_session_deleted(sender, instance, **kwargs):
+    if instance.active:
+        stats.apply({(stats.ACTIVE_SESSIONS, stats.user_department(instance.user_id), ''): -1})
+
+
+@receiver(post_save, sender=User)
+def stats_user_saved(sender, instance, created, raw=False, **kwargs):
+    if raw or created or not state_changed(instance):
+        return
+    count = Session.objects.filter(user=instance, active=True).count()
+    if count:
+        changes = Counter()
+        stats.move(
+            changes, stats.ACTIVE_SESSIONS, previous_state(instance)['department_id'], instance.department_id,
+            count=count,
+        )
+        stats.apply(changes)
+
+
+@receiver(post_save, sender=Department)
+def stats_department_saved(sender, instance, created, **kwargs):
+    if not created:
+        from .models import StatCounter
+
+        StatCounter.objects.filter(department=instance).exclude(region=instance.region).update(region=instance.region)
+
+
+@receiver(post_delete, sender=Department)
+def stats_department_deleted(sender, instance, **kwargs):
+    # Дела и сотрудники отделения уже переведены в SET_NULL без сигналов — пересчитываем всё
+    stats.rebuild()
+
+
+# ---------------------------
+# Надгробия для дельта-синхронизации (core/sync.py)
+# ---------------------------
+
+@receiver(post_save, sender=Case)
+def sync_case_moved(sender, instance, created, raw=False, **kwargs):
+    if raw or created or not state_changed(instance):
+        return
+    # Дело ушло из отделения вместе со своими группами и ВД: надгробия для старой
+    # области видимости, а updated — чтобы новая область получила их при синхронизации
+    old_department_id = previous_state(instance)['department_id']
+    now = timezone.now()
+    for model in (MaterialEvidence, EvidenceGroup):
+        related = model.objects.filter(case_id=instance.pk)
+        sync.bury(model._meta.model_name, ((pk, old_department_id, None) for pk in related.values_list('id', flat=True)))
+        related.update(updated=now)
+    sync.bury('case', [(instance.pk, old_department_id, None)])
+
+
+@receiver(post_save, sender=MaterialEvidence)
+@receiver(post_save, sender=EvidenceGroup)
+def sync_case_changed(sender, instance, created, raw=False, **kwargs):
+    if raw or created or not state_changed(instance):
+        return
+    old_case_id = previous_state(instance)['case_id']
+    if old_case_id == instance.case_id:
+        return
+    old_department_id = stats.case_department(old_case_id)
+    if old_department_id != stats.case_department(instance.case_id):
+        sync.bury(sender._meta.model_name, [(instance.pk, old_department_id, None)])
+
+
+@receiver(pre_delete, sender=Case)
+def sync_case_deleting(sender, instance, **kwargs):
+    # ВД удаляемого дела остаются (SET_NULL), но покидают отделение
+    instance._orphaned_evidence = list(MaterialEvidence.objects.filter(case_id=instance.pk).values_list('id', flat=True))
+    sync.bury('materialevidence', ((pk, instance.department_id, None) for pk in instance._orphaned_evidence))
+
+
+@receiver(post_delete, sender=Case)
+def sync_case_deleted(sender, instance, **kwargs):
+    sync.bury('case', [(instance.pk, instance.department_id, instance.creator_id)])
+    orphaned = getattr(instance, '_orphaned_evidence', None)
+    if orphaned:
+        MaterialEvidence.objects.filter(id__in=orphaned).update(updated=timezone.now())
+
+
+@receiver(post_delete, sender=MaterialEvidence)
+@receiver(post_delete, sender=EvidenceGroup)
+def sync_object_deleted(sender, instance, **kwargs):
+    sync.bury(sender._meta.model_name, [(instance.pk, stats.case_department(instance.case_id), instance.created_by_id)])
+
+
+@receiver(post_delete, sender=Camera)
+def sync_camera_deleted(sender, instance, **kwargs):
+    sync.bury('camera', [(instance.pk, None, None)])
+
+
+# ---------------------------
+# Поток изменений для подписчиков (core/push.py)
+# ---------------------------
+
+def _action(created):
+    return 'create' if created else 'update'
+
+
+@receiver(post_save, sender=Case)
+def push_case_saved(sender, instance, created, raw=False, **kwargs):
+    if raw or not push.enabled():
+        return
+    if state_changed(instance):
+        # Для старого отделения дело исчезло
+        push.publish('case', 'delete', instance.pk, previous_state(instance)['department_id'])
+    push.publish('case', _action(created), instance.pk, instance.department_id, instance.creator_id)
+
+
+@receiver(post_delete, sender=Case)
+def push_case_deleted(sender, instance, **kwargs):
+    push.publish('case', 'delete', instance.pk, instance.department_id, instance.creator_id)
+
+
+@receiver(post_save, sender=MaterialEvidence)
+def push_evidence_saved(sender, instance, created, raw=False, **kwargs):
+    if raw or not push.enabled():
+        return
+    department_id = stats.evidence_department(instance)
+    previous = previous_state(instance)
+    if not created and previous is not None and previous['case_id'] != instance.case_id:
+        old_department_id = stats.case_department(previous['case_id'])
+        if old_department_id != department_id:
+            push.publish('materialevidence', 'delete', instance.pk, old_department_id)
+    push.publish(
+        'materialevidence', _action(created), instance.pk, department_id, instance.created_by_id,
+        case_id=instance.case_id,
+    )
+
+
+@receiver(post_delete, sender=MaterialEvidence)
+def push_evidence_deleted(sender, instance, **kwargs):
+    if push.enabled():
+        push.publish(
+            'materialevidence', 'delete', instance.pk, stats.case_department(instance.case_id),
+            instance.created_by_id, case_id=instance.case_id,
+        )
+
+
+@receiver(post_save, sender=MaterialEvidenceEvent)
+def push_evidence_event_saved(sender, instance, created, raw=False, **kwargs):
+    if raw or not created or not push.enabled():
+        return
+    evidence = instance.material_evidence
+    department_id = stats.case_department(instance.case_id)
+    push.publish(
+        'materialevidenceevent', 'create', instance.pk, department_id, evidence.created_by_id,
+        case_id=instance.case_id, material_evidence_id=evidence.pk,
+    )
+    # Событие меняет статус и ответственного ВД (evidence_event_appended)
+    push.publish(
+        'materialevidence', 'update', evidence.pk, department_id, evidence.created_by_id, case_id=instance.case_id,
+    )
+
+
+@receiver(post_save, sender=Session)
+def push_session_saved(sender, instance, created, raw=False, **kwargs):
+    if raw or not push.enabled():
+        return
+    push.publish('session', _action(created), instance.pk, stats.session_department(instance), instance.user_id)
+
+
+@receiver(post_delete, sender=Session)
+def push_session_deleted(sender, instance, **kwargs):
+    if push.enabled():
+        push.publish('session', 'delete', instance.pk, stats.user_department(instance.user_id), instance.user_id)
+
+
+# Последним среди обработчиков post_save: сохранённые значения становятся "предыдущими"
+@receiver(post_save, sender=Case)
+@receiver(post_save, sender=MaterialEvidence)
+@receiver(post_save, sender=EvidenceGroup)
+@receiver(post_save, sender=Session)
+@receiver(post_save, sender=User)
+def reset_state(sender, instance, **kwargs):
+    track_state(sender, instance)
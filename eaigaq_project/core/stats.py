@@ -0,0 +1,163 @@
+# core/stats.py
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum
+
+from .scopes import DEPARTMENT, REGION
+
+CASES = 'cases'
+EVIDENCE = 'evidence'
+ACTIVE_SESSIONS = 'active_sessions'
+
+
+def apply(changes):
+    """
+    Применяет приращения {(вид, department_id, статус): delta} к счётчикам.
+    Существующая строка обновляется через F(); если её нет — создаётся. Ячейка
+    уникальна (ограничения StatCounter), поэтому при одновременном создании
+    вторая транзакция получает IntegrityError и повторяет обновление.
+    """
+    from .models import Department, StatCounter
+
+    changes = {key: delta for key, delta in changes.items() if delta}
+    if not changes:
+        return
+    regions = None
+    with transaction.atomic():
+        # Постоянный порядок обновления строк — чтобы параллельные транзакции не взаимоблокировались
+        ordered = sorted(changes.items(), key=lambda item: (item[0][0], item[0][1] or 0, item[0][2]))
+        for (kind, department_id, status), delta in ordered:
+            counter = StatCounter.objects.filter(kind=kind, department_id=department_id, status=status)
+            if counter.update(value=F('value') + delta):
+                continue
+            if regions is None:
+                regions = dict(
+                    Department.objects.filter(pk__in=[key[1] for key in changes if key[1]]).values_list('id', 'region')
+                )
+            try:
+                with transaction.atomic():
+                    StatCounter.objects.create(
+                        kind=kind, department_id=department_id, status=status,
+                        region=regions.get(department_id), value=delta,
+                    )
+            except IntegrityError:
+                # Строку только что создала параллельная транзакция
+                counter.update(value=F('value') + delta)
+
+
+def move(changes, kind, old_department_id, new_department_id, old_status='', new_status='', count=1):
+    """
+    Добавляет в changes перенос count единиц из одной ячейки счётчика в другую.
+    """
+    changes[(kind, old_department_id, old_status)] -= count
+    changes[(kind, new_department_id, new_status)] += count
+
+
+def case_department(case_id):
+    from .models import Case
+
+    if case_id is None:
+        return None
+    return Case.objects.filter(pk=case_id).values_list('department_id', flat=True).first()
+
+
+def user_department(user_id):
+    from .models import User
+
+    return User.objects.filter(pk=user_id).values_list('department_id', flat=True).first()
+
+
+def evidence_department(evidence):
+    # Уже загруженное дело не запрашиваем повторно
+    if type(evidence).case.is_cached(evidence):
+        return evidence.case.department_id if evidence.case is not None else None
+    return case_department(evidence.case_id)
+
+
+def session_department(session):
+    if type(session).user.is_cached(session):
+        return session.user.department_id
+    return user_department(session.user_id)
+
+
+def case_evidence(case_id):
+    """
+    [(статус, количество)] ВД дела — для переноса при смене отделения дела.
+    """
+    from .models import MaterialEvidence
+
+    return list(
+        MaterialEvidence.objects.filter(case_id=case_id).values_list('status').annotate(count=Count('id')).order_by()
+    )
+
+
+def rebuild():
+    """
+    Полный пересчёт счётчиков по данным. Возвращает число строк счётчиков.
+    """
+    from .models import Case, Department, MaterialEvidence, Session, StatCounter
+
+    regions = dict(Department.objects.values_list('id', 'region'))
+    counters = []
+    for department_id, value in Case.objects.values_list('department_id').annotate(count=Count('id')).order_by():
+        counters.append(StatCounter(kind=CASES, department_id=department_id, value=value))
+    for department_id, status, value in (
+        MaterialEvidence.objects.values_list('case__department_id', 'status').annotate(count=Count('id')).order_by()
+    ):
+        counters.append(StatCounter(kind=EVIDENCE, department_id=department_id, status=status, value=value))
+    for department_id, value in (
+        Session.objects.filter(active=True).values_list('user__department_id').annotate(count=Count('id')).order_by()
+    ):
+        counters.append(StatCounter(kind=ACTIVE_SESSIONS, department_id=department_id, value=value))
+    for counter in counters:
+        counter.region = regions.get(counter.department_id)
+
+    with transaction.atomic():
+        StatCounter.objects.all().delete()
+        StatCounter.objects.bulk_create(counters)
+    return len(counters)
+
+
+def summary(scope):
+    """
+    Сводка для дашборда в пределах области видимости руководителя.
+    Читает только строки счётчиков, поэтому не зависит от объёма данных.
+    """
+    from .models import MaterialEvidenceStatus, StatCounter
+
+    queryset = StatCounter.objects.all()
+    if scope.role == REGION:
+        queryset = queryset.filter(region=scope.region)
+    elif scope.role == DEPARTMENT:
+        queryset = queryset.filter(department_id=scope.department_id)
+    else:
+        queryset = queryset.none()
+    rows = (
+        queryset.values('kind', 'department_id', 'department__name', 'status')
+        .annotate(total=Sum('value'))
+        .order_by('kind', 'department__name', 'department_id', 'status')
+    )
+
+    result = {
+        CASES: {'total': 0, 'by_department': []},
+        EVIDENCE: {'total': 0, 'by_status': dict.fromkeys(MaterialEvidenceStatus.values, 0), 'by_department': []},
+        ACTIVE_SESSIONS: {'total': 0, 'by_department': []},
+    }
+    departments = {kind: {} for kind in result}
+    for row in rows:
+        section = result.get(row['kind'])
+        if section is None or not row['total']:
+            continue
+        section['total'] += row['total']
+        if row['kind'] == EVIDENCE:
+            section['by_status'][row['status']] = section['by_status'].get(row['status'], 0) + row['total']
+        entry = departments[row['kind']].get(row['department_id'])
+        if entry is None:
+            entry = departments[row['kind']][row['department_id']] = {
+                'department_id': row['department_id'],
+                'department_name': row['department__name'],
+                'count': 0,
+            }
+            section['by_department'].append(entry)
+        entry['count'] += row['total']
+    return result
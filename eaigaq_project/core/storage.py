@@ -0,0 +1,62 @@
+# core/storage.py
+
+import hashlib
+import re
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
+from django.utils.functional import cached_property
+
+DIGEST_RE = re.compile(r'^[0-9a-f]{64}$')
+
+
+class ContentAddressedStore:
+    """
+    Файловое хранилище, адресуемое по содержимому (SHA-256).
+
+    Файл с одинаковым содержимым хранится один раз; путь строится как
+    ``ab/cd/abcdef...`` по хэшу, чтобы не держать миллионы файлов в одном каталоге.
+    """
+
+    def __init__(self, location=None, setting_name=None):
+        self._location = location
+        self._setting_name = setting_name
+
+    @cached_property
+    def storage(self):
+        location = self._location or getattr(settings, self._setting_name)
+        return FileSystemStorage(location=location)
+
+    @staticmethod
+    def path_for(digest):
+        if not DIGEST_RE.match(digest or ''):
+            raise ValueError('Некорректный хэш содержимого.')
+        return f'{digest[:2]}/{digest[2:4]}/{digest}'
+
+    def put(self, content, digest=None):
+        """
+        Сохраняет байты и возвращает их SHA-256 хэш. digest — готовый ключ,
+        если содержимое адресуется хэшем входных данных, из которых оно получено.
+        """
+        digest = digest or hashlib.sha256(content).hexdigest()
+        name = self.path_for(digest)
+        if not self.storage.exists(name):
+            self.storage.save(name, ContentFile(content))
+        return digest
+
+    def open(self, digest):
+        return self.storage.open(self.path_for(digest), 'rb')
+
+    def exists(self, digest):
+        return self.storage.exists(self.path_for(digest))
+
+    def size(self, digest):
+        return self.storage.size(self.path_for(digest))
+
+    def delete(self, digest):
+        self.storage.delete(self.path_for(digest))
+
+
+face_store = ContentAddressedStore(setting_name='FACE_DATA_ROOT')
+label_store = ContentAddressedStore(setting_name='LABEL_CACHE_ROOT')
@@ -0,0 +1,137 @@
+# core/sync.py
+
+import base64
+import json
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+
+class Watermark:
+    """
+    Отметка синхронизации клиента: позиция (время, id) в потоке изменённых
+    строк и в потоке надгробий (tombstones). Передаётся клиенту непрозрачной строкой.
+    """
+
+    __slots__ = ('rows', 'tombstones')
+
+    def __init__(self, rows=None, tombstones=None):
+        self.rows = rows
+        self.tombstones = tombstones
+
+    def encode(self):
+        data = {
+            'r': [self.rows[0].isoformat(), self.rows[1]] if self.rows else None,
+            't': [self.tombstones[0].isoformat(), self.tombstones[1]],
+        }
+        return base64.urlsafe_b64encode(json.dumps(data, separators=(',', ':')).encode()).decode('ascii')
+
+    @classmethod
+    def decode(cls, value):
+        """
+        Пустое значение — первая (полная) синхронизация: все строки, без надгробий.
+        """
+        if not value:
+            return cls(None, (safe_now(), 0))
+        try:
+            data = json.loads(base64.urlsafe_b64decode(value.encode('ascii')))
+            rows = _position(data['r']) if data['r'] is not None else None
+            return cls(rows, _position(data['t']))
+        except (TypeError, KeyError, IndexError, ValueError):
+            raise ValueError('Некорректная отметка синхронизации.')
+
+
+def _position(value):
+    moment = parse_datetime(value[0])
+    if moment is None:
+        raise ValueError(value)
+    return moment, int(value[1])
+
+
+def safe_now():
+    """
+    Текущее время минус запас на ещё не зафиксированные транзакции: строка
+    получает updated при сохранении, а видна другим — только после COMMIT.
+    """
+    return timezone.now() - timedelta(seconds=getattr(settings, 'SYNC_WATERMARK_LAG', 5))
+
+
+def expired(watermark):
+    retention = timedelta(days=getattr(settings, 'SYNC_TOMBSTONE_RETENTION_DAYS', 30))
+    return watermark.tombstones[0] < timezone.now() - retention
+
+
+def _after(field, position):
+    if position is None:
+        return Q()
+    moment, pk = position
+    return Q(**{f'{field}__gt': moment}) | Q(**{field: moment, 'id__gt': pk})
+
+
+def changes(queryset, tombstones, watermark, limit):
+    """
+    Возвращает (строки, id удалённых, новая отметка, есть ли ещё).
+    Оба потока читаются диапазоном по индексу (updated, id) / (created, id).
+    Из удалённых исключаются объекты, которые всё ещё есть в queryset читателя.
+    """
+    rows = list(queryset.filter(_after('updated', watermark.rows)).order_by('updated', 'id')[:limit + 1])
+    deleted = list(
+        tombstones.filter(_after('created', watermark.tombstones))
+        .order_by('created', 'id')
+        .values_list('created', 'id', 'object_id')[:limit + 1]
+    )
+    has_more = len(rows) > limit or len(deleted) > limit
+    rows, deleted = rows[:limit], deleted[:limit]
+
+    now = safe_now()
+    if len(rows) == limit:
+        next_rows = (rows[-1].updated, rows[-1].id)
+    else:
+        # Поток исчерпан: откатываемся на запас, строки из него клиент получит ещё раз
+        next_rows = min((rows[-1].updated, rows[-1].id), (now, 0)) if rows else _rewind(watermark.rows, now)
+    if len(deleted) == limit:
+        next_tombstones = deleted[-1][:2]
+    else:
+        next_tombstones = min(deleted[-1][:2], (now, 0)) if deleted else _rewind(watermark.tombstones, now)
+    deleted = [object_id for _, _, object_id in deleted]
+    if deleted:
+        # Надгробие пишется для старой области видимости; если читателю виден и новый
+        # владелец (перенос внутри региона), объект по-прежнему в его queryset — не удаляем
+        visible = set(queryset.filter(pk__in=deleted).values_list('pk', flat=True))
+        deleted = [object_id for object_id in deleted if object_id not in visible]
+    return rows, deleted, Watermark(next_rows, next_tombstones), has_more
+
+
+def _rewind(position, now):
+    if position is None:
+        return None
+    return min(position, (now, 0))
+
+
+def bury(kind, rows):
+    """
+    Записывает надгробия: rows — [(object_id, department_id, owner_id)] — последние
+    значения области видимости, из которой объект пропал (удалён или перенесён).
+    """
+    from .models import Tombstone
+
+    now = timezone.now()
+    Tombstone.objects.bulk_create([
+        Tombstone(kind=kind, object_id=object_id, department_id=department_id, owner_id=owner_id, created=now)
+        for object_id, department_id, owner_id in rows
+    ])
+
+
+def prune(batch_size=5000):
+    from .models import Tombstone
+
+    before = timezone.now() - timedelta(days=getattr(settings, 'SYNC_TOMBSTONE_RETENTION_DAYS', 30))
+    deleted = 0
+    while True:
+        ids = list(Tombstone.objects.filter(created__lt=before).values_list('id', flat=True)[:batch_size])
+        if not ids:
+            return deleted
+        deleted += Tombstone.objects.filter(id__in=ids).delete()[0]
@@ -1,3 +1,1160 @@
-from django.test import TestCase
+import asyncio
+import csv
+import datetime
+import decimal
+import io
+import re
+import tempfile
+import time
+import uuid
+import zipfile
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import CommandError, call_command
+from django.db import connection, transaction
+from django.test import AsyncClient, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+from PIL import Image
+
+from core import export as exports, labels, profiles, push, recording, scopes
+from core.biometrics import face_index, get_encoder, to_bytes
+from core.cache import barcode_cache
+from core.cameras import FakeSource, MJPEGFileSource
+from core.parsers import FastJSONParser
+from core.recognition import RecognitionPipeline
+from core.renderers import FastJSONRenderer
+from core.models import (
+    AuditEntry, AuditOutbox, Camera, CameraType, Case, Department, EvidenceGroup, FaceEmbedding, MaterialEvidence,
+    MaterialEvidenceEvent, MaterialEvidenceStatus, RecordingSegment, Session, StatCounter, User,
+)
+
+# Списки, которые должны обслуживаться индексами для каждой роли
+LIST_URLS = [
+    '/api/users/',
+    '/api/departments/',
+    '/api/cases/',
+    '/api/material-evidences/',
+    '/api/material-evidence-events/',
+    '/api/evidence-groups/',
+    '/api/sessions/',
+    '/api/audit-entries/',
+]
+
+
+class IndexPlanTests(TestCase):
+    """
+    Выполняет EXPLAIN для каждого SELECT, который делает список ViewSet'а,
+    и падает, если планировщик выбирает полное сканирование таблицы.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = {}
+        for region in ('ASTANA', 'ALMATY_CITY', 'SHYMKENT'):
+            for d in range(3):
+                department = Department.objects.create(name=f'{region}-{d}', region=region)
+                staff = [
+                    User.objects.create_user(f'{region}-{d}-{i}', password='x', department=department, region=region)
+                    for i in range(3)
+                ]
+                for n, user in enumerate(staff):
+                    case = Case.objects.create(
+                        name=f'Дело {n}', description='-', investigator=user, creator=user, department=department
+                    )
+                    group = EvidenceGroup.objects.create(name='Группа', case=case, created_by=user)
+                    for e in range(3):
+                        evidence = MaterialEvidence.objects.create(
+                            name=f'ВД {e}', description='-', case=case, group=group, created_by=user,
+                            barcode=f'{department.pk}-{user.pk}-{e}',
+                        )
+                        MaterialEvidenceEvent.objects.create(user=user, material_evidence=evidence, action='IN_STORAGE')
+                    Session.objects.create(user=user)
+                    AuditEntry.objects.create(
+                        object_id=case.pk, table_name='core_case', class_name='Case', action='create',
+                        user=user, region=region, department=department,
+                    )
+        department = Department.objects.filter(region='ASTANA').first()
+        cls.users['REGION_HEAD'] = User.objects.create_user(
+            'region-head', password='x', role='REGION_HEAD', region='ASTANA', department=department
+        )
+        cls.users['DEPARTMENT_HEAD'] = User.objects.create_user(
+            'department-head', password='x', role='DEPARTMENT_HEAD', region='ASTANA', department=department
+        )
+        cls.users['USER'] = User.objects.filter(role='USER', department=department).first()
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+    def full_scans(self, sql):
+        with connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                # На маленьких таблицах последовательное чтение дешевле любого индекса —
+                # запрещаем его, чтобы увидеть, есть ли вообще подходящий индекс
+                cursor.execute('SET LOCAL enable_seqscan = off')
+                cursor.execute(f'EXPLAIN {sql}')
+                plan = '\n'.join(row[0] for row in cursor.fetchall())
+                return re.findall(r'Seq Scan on (\w+)', plan)
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+            return [
+                match.group(1)
+                for row in cursor.fetchall()
+                for match in [re.match(r'SCAN (\w+)$', row[-1])] if match
+            ]
+
+    def test_list_queries_use_indexes(self):
+        for role, user in self.users.items():
+            client = APIClient()
+            client.force_authenticate(user)
+            for url in LIST_URLS:
+                with CaptureQueriesContext(connection) as queries:
+                    response = client.get(url)
+                if response.status_code == 403:
+                    continue
+                self.assertEqual(response.status_code, 200, (role, url, response.content))
+                for query in queries:
+                    if not query['sql'].startswith('SELECT'):
+                        continue
+                    with self.subTest(role=role, url=url, sql=query['sql']):
+                        self.assertEqual(self.full_scans(query['sql']), [])
+
+
+class KeysetPaginationTests(TestCase):
+    """
+    Обход списка по ссылкам next и previous: каждая строка попадает ровно на одну
+    страницу, в том числе когда у соседних строк совпадает время создания.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        department = Department.objects.create(name='Отделение', region='ASTANA')
+        cls.user = User.objects.create_user('pager', password='x', department=department, region='ASTANA')
+        moment = timezone.now()
+        for n in range(23):
+            Case.objects.create(
+                name=f'Дело {n}', description='-', investigator=cls.user, creator=cls.user, department=department,
+                # Первые десять дел — с одинаковым временем: граница страницы проходит внутри группы равных ключей
+                created=moment if n < 10 else moment + datetime.timedelta(seconds=n),
+            )
+        cls.expected = list(Case.objects.order_by('-created', '-id').values_list('id', flat=True))
+
+    def walk(self, url, link):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        pages = []
+        while url:
+            data = client.get(url).json()
+            pages.append([item['id'] for item in data['results']])
+            url = data[link]
+        return pages
+
+    def test_pages_neither_skip_nor_repeat(self):
+        pages = self.walk('/api/cases/?page_size=4', 'next')
+        self.assertEqual([len(page) for page in pages], [4, 4, 4, 4, 4, 3])
+        self.assertEqual([pk for page in pages for pk in page], self.expected)
+
+        # Обратно от последней страницы по previous — те же страницы в обратном порядке
+        client = APIClient()
+        client.force_authenticate(self.user)
+        url = '/api/cases/?page_size=4'
+        for _ in pages[1:]:
+            url = client.get(url).json()['next']
+        backward = self.walk(url, 'previous')
+        self.assertEqual(backward, pages[::-1])
+
+
+class SearchTests(TestCase):
+    """
+    Поиск по делам: ранжированные совпадения страницами по ссылке next, отказ на
+    пустой или короткий запрос и только в пределах области видимости.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        department = Department.objects.create(name='Отделение', region='ASTANA')
+        other = Department.objects.create(name='Другое отделение', region='ASTANA')
+        cls.head = User.objects.create_user(
+            'search-head', password='x', role='DEPARTMENT_HEAD', department=department, region='ASTANA'
+        )
+        stranger = User.objects.create_user('search-stranger', password='x', department=other, region='ASTANA')
+        cls.matches = {
+            Case.objects.create(
+                name=f'Кража велосипеда {n}', description='-', investigator=cls.head, creator=cls.head,
+                department=department,
+            ).pk
+            for n in range(5)
+        }
+        Case.objects.create(
+            name='Мошенничество', description='-', investigator=cls.head, creator=cls.head, department=department
+        )
+        cls.foreign = Case.objects.create(
+            name='Кража велосипеда чужая', description='-', investigator=stranger, creator=stranger, department=other
+        )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.head)
+
+    def test_pages_of_matches_in_scope(self):
+        response = self.client.get('/api/cases/search/', {'q': 'велосипед', 'page_size': 2})
+        found = []
+        while True:
+            self.assertEqual(response.status_code, 200)
+            data = response.json()
+            self.assertLessEqual(len(data['results']), 2)
+            found.extend(item['id'] for item in data['results'])
+            if not data['next']:
+                break
+            response = self.client.get(data['next'])
+        self.assertEqual(sorted(found), sorted(self.matches))
+        self.assertNotIn(self.foreign.pk, found)
+
+    def test_short_query_rejected(self):
+        for query in ('', ' ', 'к'):
+            self.assertEqual(self.client.get('/api/cases/search/', {'q': query}).status_code, 400)
+        self.assertEqual(self.client.get('/api/cases/search/').status_code, 400)
+
+
+class EvidenceGroupListTests(TestCase):
+    """
+    Список групп дела: число запросов не зависит от числа групп и ВД,
+    сводка по статусам совпадает с вложенными ВД.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        department = Department.objects.create(name='Отделение', region='ASTANA')
+        cls.user = User.objects.create_user('investigator', password='x', department=department, region='ASTANA')
+        cls.case = Case.objects.create(
+            name='Дело', description='-', investigator=cls.user, creator=cls.user, department=department
+        )
+        statuses = MaterialEvidenceStatus.values
+        for g in range(12):
+            group = EvidenceGroup.objects.create(name=f'Группа {g}', case=cls.case, created_by=cls.user)
+            MaterialEvidence.objects.bulk_create(
+                MaterialEvidence(
+                    name=f'ВД {e}', description='-', case=cls.case, group=group, created_by=cls.user,
+                    last_holder=cls.user, status=statuses[e % len(statuses)], barcode=f'{g}-{e}',
+                )
+                for e in range(g)
+            )
+
+    def list_groups(self, page_size):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get('/api/evidence-groups/', {'case': self.case.pk, 'page_size': page_size})
+        self.assertEqual(response.status_code, 200)
+        return response.json()['results'], len(queries)
+
+    def test_queries_do_not_grow_with_groups(self):
+        _, few = self.list_groups(2)
+        groups, many = self.list_groups(12)
+        self.assertEqual(len(groups), 12)
+        self.assertEqual(few, many)
+
+    def test_status_counts(self):
+        groups, _ = self.list_groups(12)
+        for group in groups:
+            items = group['material_evidences']
+            self.assertEqual(group['evidence_count'], len(items))
+            for value, count in group['status_counts'].items():
+                self.assertEqual(count, sum(item['status'] == value for item in items), (group['name'], value))
+            self.assertNotIn('case', items[0] if items else {})
+
+
+class BarcodeLookupTests(TestCase):
+    """
+    Поиск ВД по штрихкоду: повторное сканирование — из кэша без запросов, кэш
+    сбрасывается при изменении и удалении ВД, пакетный поиск возвращает
+    ненайденные коды, ВД другого отделения не отдаётся.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        department = Department.objects.create(name='Отделение', region='ASTANA')
+        other = Department.objects.create(name='Другое отделение', region='ASTANA')
+        cls.user = User.objects.create_user('scanner', password='x', department=department, region='ASTANA')
+        cls.head = User.objects.create_user(
+            'scanner-head', password='x', role='DEPARTMENT_HEAD', department=other, region='ASTANA'
+        )
+        case = Case.objects.create(
+            name='Дело', description='-', investigator=cls.user, creator=cls.user, department=department
+        )
+        cls.evidences = [
+            MaterialEvidence.objects.create(
+                name=f'ВД {n}', description='-', case=case, created_by=cls.user, barcode=f'scan-{n}'
+            )
+            for n in range(3)
+        ]
+
+    def setUp(self):
+        barcode_cache.clear()
+        self.addCleanup(barcode_cache.clear)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def scan(self, barcode):
+        return self.client.get(f'/api/material-evidences/by-barcode/{barcode}/')
+
+    def test_cache_hit_and_invalidation(self):
+        self.assertEqual(self.scan('scan-0').json()['name'], 'ВД 0')
+        with self.assertNumQueries(0):
+            self.assertEqual(self.scan('scan-0').status_code, 200)
+
+        evidence = MaterialEvidence.objects.get(pk=self.evidences[0].pk)
+        evidence.name = 'Переименованное ВД'
+        evidence.save()
+        self.assertEqual(self.scan('scan-0').json()['name'], 'Переименованное ВД')
+
+        evidence.delete()
+        self.assertEqual(self.scan('scan-0').status_code, 404)
+
+    def test_batch_reports_missing(self):
+        response = self.client.post(
+            '/api/material-evidences/by-barcode/', {'barcodes': ['scan-2', 'unknown', 'scan-1', 'scan-2']},
+            format='json',
+        )
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual([item['barcode'] for item in data['results']], ['scan-2', 'scan-1'])
+        self.assertEqual(data['missing'], ['unknown'])
+
+    def test_foreign_department_denied(self):
+        # ВД уже в кэше после сканирования владельцем — кэш не обходит область видимости
+        self.assertEqual(self.scan('scan-1').status_code, 200)
+        self.client.force_authenticate(self.head)
+        self.assertEqual(self.scan('scan-1').status_code, 404)
+        data = self.client.post('/api/material-evidences/by-barcode/', {'barcodes': ['scan-1']}, format='json').json()
+        self.assertEqual((data['results'], data['missing']), ([], ['scan-1']))
+
+
+class BulkIntakeTests(TestCase):
+    """
+    Пакетная регистрация ВД: пакет создаётся целиком вместе с событиями или
+    отклоняется целиком, если хоть одно дело чужое.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        department = Department.objects.create(name='Отделение', region='ASTANA')
+        other = Department.objects.create(name='Другое отделение', region='ASTANA')
+        cls.user = User.objects.create_user('intake', password='x', department=department, region='ASTANA')
+        stranger = User.objects.create_user('stranger', password='x', department=other, region='ASTANA')
+        cls.case = Case.objects.create(
+            name='Дело', description='-', investigator=cls.user, creator=cls.user, department=department
+        )
+        cls.foreign_case = Case.objects.create(
+            name='Чужое дело', description='-', investigator=stranger, creator=stranger, department=other
+        )
+
+    def post(self, data):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        return client.post('/api/material-evidences/bulk/', data, format='json')
+
+    def test_intake(self):
+        response = self.post({
+            'case_id': self.case.pk,
+            'items': [{'name': f'ВД {n}', 'description': '-'} for n in range(3)],
+        })
+        self.assertEqual(response.status_code, 201)
+        created = MaterialEvidence.objects.filter(case=self.case)
+        self.assertEqual(created.count(), 3)
+        self.assertEqual(len({item['barcode'] for item in response.json()['results']}), 3)
+        self.assertEqual(
+            MaterialEvidenceEvent.objects.filter(material_evidence__in=created, action='IN_STORAGE').count(), 3
+        )
+
+    def test_foreign_case_rejected(self):
+        response = self.post({'items': [
+            {'name': 'Своё', 'description': '-', 'case_id': self.case.pk},
+            {'name': 'Чужое', 'description': '-', 'case_id': self.foreign_case.pk},
+        ]})
+        self.assertEqual(response.status_code, 400)
+        errors = response.json()['items']
+        self.assertEqual(errors[0], {})
+        self.assertIn('case_id', errors[1])
+        self.assertFalse(MaterialEvidence.objects.exists())
+        self.assertFalse(MaterialEvidenceEvent.objects.exists())
+
+
+class BulkStatusTests(TestCase):
+    """
+    Пакетная смена статуса: меняются только ВД из области видимости и не в
+    целевом статусе, на каждое — одно событие.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        department = Department.objects.create(name='Отделение', region='ASTANA')
+        cls.user = User.objects.create_user('mover', password='x', department=department, region='ASTANA')
+        colleague = User.objects.create_user('colleague', password='x', department=department, region='ASTANA')
+        cls.case = Case.objects.create(
+            name='Дело', description='-', investigator=cls.user, creator=cls.user, department=department
+        )
+        cls.mine = [
+            MaterialEvidence.objects.create(
+                name=f'ВД {n}', description='-', case=cls.case, created_by=cls.user, barcode=f'status-{n}',
+                status=MaterialEvidenceStatus.TAKEN if n == 0 else MaterialEvidenceStatus.IN_STORAGE,
+            )
+            for n in range(4)
+        ]
+        # ВД того же дела, но зарегистрированное коллегой — вне области видимости пользователя
+        cls.foreign = MaterialEvidence.objects.create(
+            name='Чужое ВД', description='-', case=cls.case, created_by=colleague, barcode='status-foreign'
+        )
+
+    def test_bulk_status(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        response = client.post(
+            '/api/material-evidences/bulk-status/', {'case_id': self.case.pk, 'status': 'TAKEN'}, format='json'
+        )
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data['updated'], 3)
+        self.assertEqual(sorted(data['ids']), [evidence.pk for evidence in self.mine[1:]])
+
+        statuses = dict(MaterialEvidence.objects.values_list('pk', 'status'))
+        self.assertTrue(all(statuses[evidence.pk] == 'TAKEN' for evidence in self.mine))
+        self.assertEqual(statuses[self.foreign.pk], 'IN_STORAGE')
+        events = MaterialEvidenceEvent.objects.filter(action='TAKEN')
+        self.assertEqual(sorted(events.values_list('material_evidence_id', flat=True)), sorted(data['ids']))
+        self.assertTrue(all(event.case_id == self.case.pk and event.user_id == self.user.pk for event in events))
+
+
+class ScopeTests(TestCase):
+    """
+    Руководитель отделения видит своё отделение, руководитель региона — все
+    отделения региона (включая созданные после первого запроса), сотрудник — свои дела.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.cases = {}
+        cls.users = {}
+        for region, name in (('ASTANA', 'A1'), ('ASTANA', 'A2'), ('ALMATY_CITY', 'B1')):
+            department = Department.objects.create(name=name, region=region)
+            investigator = User.objects.create_user(f'user-{name}', password='x', department=department, region=region)
+            cls.users[name] = investigator
+            cls.cases[name] = Case.objects.create(
+                name=f'Дело {name}', description='-', investigator=investigator, creator=investigator,
+                department=department,
+            )
+        a1 = cls.users['A1'].department
+        cls.users['colleague'] = User.objects.create_user('colleague', password='x', department=a1, region='ASTANA')
+        cls.users['DEPARTMENT_HEAD'] = User.objects.create_user(
+            'department-head', password='x', role='DEPARTMENT_HEAD', department=a1, region='ASTANA'
+        )
+        cls.users['REGION_HEAD'] = User.objects.create_user(
+            'region-head', password='x', role='REGION_HEAD', department=a1, region='ASTANA'
+        )
+
+    def setUp(self):
+        # id отделений после отката предыдущего теста повторяются — закэшированные области не переносим
+        scopes.scope_cache.clear()
+
+    def visible(self, user):
+        client = APIClient()
+        client.force_authenticate(self.users[user])
+        return {item['name'] for item in client.get('/api/cases/').json()['results']}
+
+    def test_head_sees_only_own_scope(self):
+        self.assertEqual(self.visible('DEPARTMENT_HEAD'), {'Дело A1'})
+        self.assertEqual(self.visible('REGION_HEAD'), {'Дело A1', 'Дело A2'})
+        self.assertEqual(self.visible('A1'), {'Дело A1'})
+        self.assertEqual(self.visible('colleague'), set())
+
+        client = APIClient()
+        client.force_authenticate(self.users['DEPARTMENT_HEAD'])
+        self.assertEqual(client.get(f"/api/cases/{self.cases['A2'].pk}/").status_code, 404)
+        client.force_authenticate(self.users['REGION_HEAD'])
+        self.assertEqual(client.get(f"/api/cases/{self.cases['B1'].pk}/").status_code, 404)
+
+    def test_new_department_reaches_cached_scope(self):
+        self.visible('REGION_HEAD')
+        department = Department.objects.create(name='A3', region='ASTANA')
+        investigator = User.objects.create_user('user-A3', password='x', department=department, region='ASTANA')
+        Case.objects.create(
+            name='Дело A3', description='-', investigator=investigator, creator=investigator, department=department
+        )
+        self.assertEqual(self.visible('REGION_HEAD'), {'Дело A1', 'Дело A2', 'Дело A3'})
+
+    def test_version_shared_between_processes(self):
+        self.visible('REGION_HEAD')
+        # Отделение создано в другом процессе: здесь сигналов не было, только версия в общем кэше
+        department = Department.objects.bulk_create([Department(name='A4', region='ASTANA')])[0]
+        Case.objects.bulk_create([Case(
+            name='Дело A4', description='-', investigator=self.users['A1'], creator=self.users['A1'],
+            department=department,
+        )])
+        self.assertEqual(self.visible('REGION_HEAD'), {'Дело A1', 'Дело A2'})
+        cache.incr(scopes.DEPARTMENT_VERSION_KEY)
+        self.assertEqual(self.visible('REGION_HEAD'), {'Дело A1', 'Дело A2', 'Дело A4'})
+
+
+class DeltaSyncTests(TestCase):
+    """
+    Дельта-синхронизация дел: изменённые строки после отметки и надгробия для
+    удалённых и перенесённых в другое отделение дел — только в своей области видимости.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        department = Department.objects.create(name='Отделение', region='ASTANA')
+        cls.other = Department.objects.create(name='Другое отделение', region='ASTANA')
+        cls.head = User.objects.create_user(
+            'sync-head', password='x', role='DEPARTMENT_HEAD', department=department, region='ASTANA'
+        )
+        cls.other_head = User.objects.create_user(
+            'other-head', password='x', role='DEPARTMENT_HEAD', department=cls.other, region='ASTANA'
+        )
+        cls.region_head = User.objects.create_user(
+            'sync-region-head', password='x', role='REGION_HEAD', department=department, region='ASTANA'
+        )
+        cls.cases = [
+            Case.objects.create(
+                name=f'Дело {n}', description='-', investigator=cls.head, creator=cls.head, department=department
+            )
+            for n in range(3)
+        ]
+
+    def sync(self, user, since=None):
+        client = APIClient()
+        client.force_authenticate(user)
+        response = client.get('/api/cases/sync/', {'since': since} if since else {})
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_tombstones_for_deleted_and_moved(self):
+        initial = self.sync(self.head)
+        self.assertEqual({item['id'] for item in initial['results']}, {case.pk for case in self.cases})
+        other_initial = self.sync(self.other_head)
+        region_initial = self.sync(self.region_head)
+
+        deleted, moved, edited = self.cases
+        deleted_pk = deleted.pk
+        deleted.delete()
+        moved.department = self.other
+        moved.save()
+        edited.name = 'Новое название'
+        edited.save()
+
+        delta = self.sync(self.head, initial['watermark'])
+        self.assertEqual(sorted(delta['deleted']), sorted([deleted_pk, moved.pk]))
+        self.assertIn('Новое название', {item['name'] for item in delta['results']})
+        self.assertNotIn(moved.pk, {item['id'] for item in delta['results']})
+
+        # Руководитель другого отделения получает перенесённое дело, но не чужие надгробия
+        other_delta = self.sync(self.other_head, other_initial['watermark'])
+        self.assertEqual([item['id'] for item in other_delta['results']], [moved.pk])
+        self.assertEqual(other_delta['deleted'], [])
+
+        # Руководитель региона видит оба отделения: перенесённое дело — изменение, а не удаление
+        region_delta = self.sync(self.region_head, region_initial['watermark'])
+        self.assertEqual(region_delta['deleted'], [deleted_pk])
+        self.assertIn(moved.pk, {item['id'] for item in region_delta['results']})
+
+
+class ConditionalGetTests(TestCase):
+    """
+    ETag списка совпадает до изменений (304) и меняется, когда меняется вложенный
+    в представление объект: создатель дела, отделение дела, автор события.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.department = Department.objects.create(name='Отделение', region='ASTANA')
+        cls.user = User.objects.create_user('etag-user', password='x', department=cls.department, region='ASTANA')
+        case = Case.objects.create(
+            name='Дело', description='-', investigator=cls.user, creator=cls.user, department=cls.department
+        )
+        evidence = MaterialEvidence.objects.create(
+            name='ВД', description='-', case=case, created_by=cls.user, barcode='etag-1'
+        )
+        MaterialEvidenceEvent.objects.create(user=cls.user, material_evidence=evidence, action='TAKEN')
+
+    def test_nested_change_invalidates(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        urls = ('/api/cases/', '/api/material-evidences/', '/api/material-evidence-events/')
+        etags = {}
+        for url in urls:
+            response = client.get(url)
+            self.assertEqual(response.status_code, 200)
+            etags[url] = response['ETag']
+            self.assertEqual(client.get(url, HTTP_IF_NONE_MATCH=etags[url]).status_code, 304)
+
+        creator = User.objects.get(pk=self.user.pk)
+        creator.first_name = 'Новое имя'
+        creator.save()
+        for url in urls:
+            response = client.get(url, HTTP_IF_NONE_MATCH=etags[url])
+            self.assertEqual(response.status_code, 200)
+            self.assertNotEqual(response['ETag'], etags[url])
+            etags[url] = response['ETag']
+
+        department = Department.objects.get(pk=self.department.pk)
+        department.name = 'Переименованное отделение'
+        department.save()
+        for url in urls:
+            self.assertEqual(client.get(url, HTTP_IF_NONE_MATCH=etags[url]).status_code, 200)
+
+
+@override_settings(PUSH_ENABLED=True, PUSH_BROKER='core.push.LocalBroker', PUSH_HEARTBEAT=5)
+class EventStreamTests(TestCase):
+    """
+    Поток SSE отдаёт только изменения из области видимости подписчика и только
+    запрошенных типов, без служебных полей области видимости, и закрывается,
+    когда область видимости меняется.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        department = Department.objects.create(name='Отделение', region='ASTANA')
+        cls.other = Department.objects.create(name='Другое отделение', region='ASTANA')
+        cls.department = department
+        cls.head = User.objects.create_user(
+            'stream-head', password='x', role='DEPARTMENT_HEAD', department=department, region='ASTANA'
+        )
+
+    def setUp(self):
+        push._broker = None
+        self.addCleanup(setattr, push, '_broker', None)
+
+    async def test_filtering(self):
+        client = AsyncClient()
+        await client.aforce_login(self.head)
+        response = await client.get('/api/stream/', {'kinds': 'case'})
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        stream = aiter(response.streaming_content)
+        self.assertEqual(await anext(stream), b'retry: 5000\n\n')
+
+        broker = push.get_broker()
+        for message in (
+            # Чужое отделение, не тот тип, затем подходящее сообщение
+            {'kind': 'case', 'action': 'update', 'id': 1, 'department_id': self.other.pk, 'owner_id': None},
+            {'kind': 'materialevidence', 'action': 'update', 'id': 2, 'department_id': self.department.pk},
+            {'kind': 'case', 'action': 'create', 'id': 3, 'department_id': self.department.pk, 'owner_id': 7},
+        ):
+            broker.publish(message)
+        chunk = await asyncio.wait_for(anext(stream), timeout=2)
+        self.assertEqual(chunk, b'event: case\ndata: {"kind": "case", "action": "create", "id": 3}\n\n')
+        await stream.aclose()
+
+    @override_settings(PUSH_SCOPE_REFRESH=0)
+    async def test_closed_when_scope_changes(self):
+        client = AsyncClient()
+        await client.aforce_login(self.head)
+        response = await client.get('/api/stream/')
+        stream = aiter(response.streaming_content)
+        self.assertEqual(await anext(stream), b'retry: 5000\n\n')
+
+        await User.objects.filter(pk=self.head.pk).aupdate(department=self.other)
+        chunk = await asyncio.wait_for(anext(stream), timeout=2)
+        self.assertEqual(chunk, b'event: resync\ndata: {"kind": "resync"}\n\n')
+        with self.assertRaises(StopAsyncIteration):
+            await asyncio.wait_for(anext(stream), timeout=2)
+
+
+class StatCounterTests(TestCase):
+    """
+    Счётчики дашборда следуют за созданием, сменой статуса и удалением ВД и
+    дел, закрытием сессий; rebuild_stats восстанавливает их по данным.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.department = Department.objects.create(name='Отделение', region='ASTANA')
+        cls.user = User.objects.create_user('counter', password='x', department=cls.department, region='ASTANA')
+
+    def counters(self):
+        return {
+            (counter.kind, counter.status): counter.value
+            for counter in StatCounter.objects.filter(department=self.department).exclude(value=0)
+        }
+
+    def test_signals_and_rebuild(self):
+        case = Case.objects.create(
+            name='Дело', description='-', investigator=self.user, creator=self.user, department=self.department
+        )
+        evidences = [
+            MaterialEvidence.objects.create(
+                name=f'ВД {n}', description='-', case=case, created_by=self.user, barcode=f'counter-{n}'
+            )
+            for n in range(2)
+        ]
+        session = Session.objects.create(user=self.user)
+        self.assertEqual(self.counters(), {('cases', ''): 1, ('evidence', 'IN_STORAGE'): 2, ('active_sessions', ''): 1})
+
+        evidence = MaterialEvidence.objects.get(pk=evidences[0].pk)
+        evidence.status = MaterialEvidenceStatus.TAKEN
+        evidence.save()
+        MaterialEvidence.objects.get(pk=evidences[1].pk).delete()
+        session = Session.objects.get(pk=session.pk)
+        session.active = False
+        session.save()
+        self.assertEqual(self.counters(), {('cases', ''): 1, ('evidence', 'TAKEN'): 1})
+        # Одна строка на ячейку, сколько бы раз она ни менялась
+        self.assertEqual(
+            StatCounter.objects.filter(department=self.department, kind='evidence', status='IN_STORAGE').count(), 1
+        )
+
+        Case.objects.get(pk=case.pk).delete()
+        self.assertEqual(self.counters(), {})
+
+        # Пересчёт по данным исправляет расхождение
+        Case.objects.create(
+            name='Дело', description='-', investigator=self.user, creator=self.user, department=self.department
+        )
+        StatCounter.objects.all().update(value=42)
+        call_command('rebuild_stats', stdout=io.StringIO())
+        self.assertEqual(self.counters(), {('cases', ''): 1})
+        self.assertEqual(StatCounter.objects.get(department=None, kind='evidence', status='TAKEN').value, 1)
+
+
+class EvidenceEventTests(TestCase):
+    """
+    Событие цепочки хранения добавляется только к ВД в области видимости
+    пользователя и переносит статус ВД.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        department = Department.objects.create(name='Отделение', region='ASTANA')
+        other = Department.objects.create(name='Другое отделение', region='ASTANA')
+        cls.owner = User.objects.create_user('owner', password='x', department=department, region='ASTANA')
+        cls.colleague = User.objects.create_user('colleague', password='x', department=department, region='ASTANA')
+        cls.stranger_head = User.objects.create_user(
+            'other-head', password='x', role='DEPARTMENT_HEAD', department=other, region='ASTANA'
+        )
+        case = Case.objects.create(
+            name='Дело', description='-', investigator=cls.owner, creator=cls.owner, department=department
+        )
+        cls.evidence = MaterialEvidence.objects.create(
+            name='ВД', description='-', case=case, created_by=cls.owner, barcode='event-1'
+        )
+
+    def post_event(self, user, action):
+        client = APIClient()
+        client.force_authenticate(user)
+        return client.post(
+            '/api/material-evidence-events/', {'material_evidence_id': self.evidence.pk, 'action': action},
+            format='json',
+        )
+
+    def test_foreign_evidence_rejected(self):
+        for user in (self.colleague, self.stranger_head):
+            self.assertEqual(self.post_event(user, MaterialEvidenceStatus.DESTROYED).status_code, 404)
+        self.evidence.refresh_from_db()
+        self.assertEqual(self.evidence.status, MaterialEvidenceStatus.IN_STORAGE)
+        self.assertFalse(MaterialEvidenceEvent.objects.filter(action=MaterialEvidenceStatus.DESTROYED).exists())
+
+    def test_owner_event_moves_status(self):
+        self.assertEqual(self.post_event(self.owner, MaterialEvidenceStatus.TAKEN).status_code, 201)
+        self.evidence.refresh_from_db()
+        self.assertEqual((self.evidence.status, self.evidence.last_holder_id), (MaterialEvidenceStatus.TAKEN, self.owner.pk))
+
+    def test_flat_profile_from_accept(self):
+        MaterialEvidenceEvent.objects.create(user=self.owner, material_evidence=self.evidence, action='TAKEN')
+        client = APIClient()
+        client.force_authenticate(self.owner)
+        full = client.get('/api/material-evidence-events/').json()['results'][0]
+        flat = client.get(
+            '/api/material-evidence-events/', HTTP_ACCEPT='application/json; profile="flat"'
+        ).json()['results'][0]
+        self.assertIsInstance(full['material_evidence'], dict)
+        self.assertEqual(flat['material_evidence_barcode'], self.evidence.barcode)
+        self.assertNotIn('material_evidence', flat)
+
+    def test_backfill_case(self):
+        event = MaterialEvidenceEvent.objects.create(
+            user=self.owner, material_evidence=self.evidence, action=MaterialEvidenceStatus.TAKEN
+        )
+        # События, записанные до появления поля case
+        MaterialEvidenceEvent.objects.filter(pk=event.pk).update(case=None)
+        call_command('backfill_event_cases', batch_size=1, stdout=io.StringIO())
+        event.refresh_from_db()
+        self.assertEqual(event.case_id, self.evidence.case_id)
+
+
+class AuditTests(TestCase):
+    """
+    Запись аудита попадает в исходящую очередь в транзакции изменения и переносится
+    в журнал командой drain_audit; в неё попадают только изменившиеся поля.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.department = Department.objects.create(name='Отделение', region='ASTANA')
+        cls.user = User.objects.create_user('auditor', password='x', department=cls.department, region='ASTANA')
+
+    def entries(self, case):
+        call_command('drain_audit', stdout=io.StringIO())
+        return AuditEntry.objects.filter(table_name=Case._meta.db_table, object_id=case.pk).order_by('id')
+
+    def test_update_changes(self):
+        case = Case.objects.create(
+            name='Дело', description='-', investigator=self.user, creator=self.user, department=self.department
+        )
+        case = Case.objects.get(pk=case.pk)
+        case.name = 'Новое название'
+        case.save()
+        self.assertFalse(AuditEntry.objects.exists())
+        self.assertEqual(AuditOutbox.objects.filter(object_id=case.pk, class_name='Case').count(), 2)
+        create, update = self.entries(case)
+        self.assertFalse(AuditOutbox.objects.exists())
+        self.assertEqual(create.action, 'create')
+        self.assertEqual(update.action, 'update')
+        self.assertEqual(set(update.data), {'name', 'updated'})
+        self.assertEqual(update.data['name'], ['Дело', 'Новое название'])
+
+    def test_rolled_back_with_change(self):
+        case = Case.objects.create(
+            name='Дело', description='-', investigator=self.user, creator=self.user, department=self.department
+        )
+        try:
+            with transaction.atomic():
+                Case.objects.filter(pk=case.pk).get().delete()
+                raise RuntimeError
+        except RuntimeError:
+            pass
+        self.assertEqual(list(self.entries(case).values_list('action', flat=True)), ['create'])
+
+    def test_api_read_only(self):
+        entry = AuditEntry.objects.create(
+            object_id=1, table_name='core_case', class_name='Case', action='create', user=self.user,
+            region='ASTANA', department=self.department,
+        )
+        client = APIClient()
+        client.force_authenticate(self.user)
+        self.assertEqual(client.get(f'/api/audit-entries/{entry.pk}/').status_code, 200)
+        self.assertEqual(client.get('/api/audit-entries/export/', {'as': 'csv'}).status_code, 200)
+        self.assertEqual(client.post('/api/audit-entries/', {'action': 'delete'}, format='json').status_code, 405)
+        self.assertEqual(client.patch(f'/api/audit-entries/{entry.pk}/', {'action': 'x'}, format='json').status_code, 405)
+        self.assertEqual(client.delete(f'/api/audit-entries/{entry.pk}/').status_code, 405)
+        self.assertTrue(AuditEntry.objects.filter(pk=entry.pk, action='create').exists())
+
+
+class FaceLoginTests(TestCase):
+    """
+    Вход по лицу выключен по умолчанию и с PixelProjectionEncoder, попытки
+    ограничены по частоте; данные лица не отдаются и доступны только самому
+    сотруднику или главному по региону.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        department = Department.objects.create(name='Отделение', region='ASTANA')
+        cls.user = User.objects.create_user('officer', password='x', department=department, region='ASTANA')
+        cls.head = User.objects.create_user(
+            'head', password='x', role='DEPARTMENT_HEAD', department=department, region='ASTANA'
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+
+    def attempt(self):
+        image = io.BytesIO()
+        Image.new('RGB', (64, 64)).save(image, 'PNG')
+        image.name = 'face.png'
+        return APIClient().post('/api/biometric-auth/', {'image': image}, format='multipart')
+
+    def test_login_disabled(self):
+        self.assertEqual(self.attempt().status_code, 404)
+        with override_settings(FACE_LOGIN_ENABLED=True):
+            self.assertEqual(self.attempt().status_code, 404)
+
+    def test_login_throttled(self):
+        statuses = [self.attempt().status_code for _ in range(6)]
+        self.assertEqual(statuses[-1], 429)
+
+    def test_face_data_access(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        response = client.get(f'/api/users/{self.user.pk}/face-data/')
+        self.assertEqual((response.status_code, response.json()), (200, {'has_face_data': False}))
+        client.force_authenticate(self.head)
+        self.assertEqual(client.get(f'/api/users/{self.user.pk}/face-data/').status_code, 403)
+        self.assertEqual(client.delete(f'/api/users/{self.user.pk}/face-data/').status_code, 403)
+
+
+class ProfileCacheTests(TestCase):
+    """
+    С кэшем в памяти процесса профиль не кэшируется: сброс не дошёл бы до других воркеров.
+    """
+
+    def test_not_cached_in_locmem(self):
+        user = User.objects.create_user('profile', password='x', rank='Лейтенант')
+        client = APIClient()
+        client.force_login(user)
+        self.assertEqual(client.get('/api/current-user/').json()['rank'], 'Лейтенант')
+        self.assertIsNone(profiles.get_cache().get(profiles.KEY.format(user.pk)))
+        User.objects.filter(pk=user.pk).update(rank='Капитан')
+        self.assertEqual(client.get('/api/current-user/').json()['rank'], 'Капитан')
+
+
+class LabelTests(TestCase):
+    """
+    Штрихкод Code 128B с контрольным символом и листы этикеток: второй запрос
+    тех же этикеток собирается из дискового кэша без рендеринга.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        department = Department.objects.create(name='Отделение', region='ASTANA')
+        cls.user = User.objects.create_user('labels', password='x', department=department, region='ASTANA')
+        cls.case = Case.objects.create(
+            name='Дело', description='-', investigator=cls.user, creator=cls.user, department=department
+        )
+        for e in range(3):
+            MaterialEvidence.objects.create(
+                name=f'ВД {e}', description='-', case=cls.case, created_by=cls.user, barcode=f'label-{e}'
+            )
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        settings_override = override_settings(LABEL_CACHE_ROOT=directory.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        # Хранилище кэша создаётся один раз — переоткрываем его в новом каталоге
+        labels.label_store.__dict__.pop('storage', None)
+        self.addCleanup(labels.label_store.__dict__.pop, 'storage', None)
+
+    def test_code128_checksum(self):
+        # Пример из спецификации: (104 + 48·1 + 42·2 + 42·3 + 17·4 + 18·5 + 19·6 + 35·7) mod 103 = 55
+        widths = labels.code128_widths('PJJ123C')
+        symbols = [''.join(map(str, widths[i:i + 6])) for i in range(0, len(widths) - 7, 6)]
+        values = [labels._CODE128_PATTERNS.index(symbol) for symbol in symbols]
+        self.assertEqual(values, [104, 48, 42, 42, 17, 18, 19, 35, 55])
+        self.assertEqual(''.join(map(str, widths[-7:])), labels._CODE128_PATTERNS[106])
+        self.assertEqual(sum(widths), 11 * len(values) + 13)
+        with self.assertRaises(ValueError):
+            labels.code128_widths('штрихкод')
+
+    def test_render_and_cache(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        first = client.get('/api/material-evidences/labels/', {'case': self.case.pk, 'as': 'png'})
+        self.assertEqual((first.status_code, first['Content-Type'], first['X-Page-Count']), (200, 'image/png', '1'))
+        self.assertTrue(first.content.startswith(b'\x89PNG'))
+        with mock.patch.object(labels, 'render_label', side_effect=AssertionError('рендеринг вместо кэша')):
+            second = client.get('/api/material-evidences/labels/', {'case': self.case.pk, 'as': 'png'})
+            pdf = client.get('/api/material-evidences/labels/', {'case': self.case.pk})
+        self.assertEqual(second.content, first.content)
+        self.assertEqual(pdf.status_code, 200)
+        self.assertTrue(pdf.content.startswith(b'%PDF'))
+
+
+class ExportTests(TestCase):
+    """
+    Выгрузка описи ВД: текст, похожий на формулу, экранируется в CSV, а в XLSX
+    пишется как есть строкой; XLSX переходит на новый лист после XLSX_SHEET_ROWS строк.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        department = Department.objects.create(name='Отделение', region='ASTANA')
+        cls.user = User.objects.create_user('exporter', password='x', department=department, region='ASTANA')
+        case = Case.objects.create(
+            name='Дело', description='-', investigator=cls.user, creator=cls.user, department=department
+        )
+        cls.names = ['=HYPERLINK("http://x","y")', '+1', '-1', '@SUM(A1)', 'Нож']
+        for n, name in enumerate(cls.names):
+            MaterialEvidence.objects.create(
+                name=name, description='-', case=case, created_by=cls.user, barcode=f'export-{n}'
+            )
+
+    def export(self, file_format):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        response = client.get('/api/material-evidences/export/', {'as': file_format})
+        self.assertEqual(response.status_code, 200)
+        return b''.join(response.streaming_content)
+
+    def test_csv_formulas_escaped(self):
+        rows = list(csv.reader(io.StringIO(self.export('csv').decode('utf-8-sig'))))
+        column = rows[0].index('Название ВД')
+        self.assertEqual(
+            [row[column] for row in rows[1:]],
+            ['\'=HYPERLINK("http://x","y")', "'+1", "'-1", "'@SUM(A1)", 'Нож'],
+        )
+        # Числа остаются числами, даже отрицательные
+        self.assertEqual(list(exports.csv_stream([exports.Column('N', 'n')], [[-5]]))[-1], '-5\r\n')
+
+    def test_xlsx_sheet_rollover_and_raw_text(self):
+        with mock.patch.object(exports, 'XLSX_SHEET_ROWS', 2):
+            content = self.export('xlsx')
+        with zipfile.ZipFile(io.BytesIO(content)) as book:
+            sheets = sorted(name for name in book.namelist() if name.startswith('xl/worksheets/'))
+            self.assertEqual(len(sheets), 3)
+            self.assertEqual(book.read('xl/workbook.xml').count(b'<sheet '), 3)
+            texts = []
+            for name in sheets:
+                sheet = book.read(name).decode('utf-8')
+                rows = re.findall(r'<row>(.*?)</row>', sheet)
+                self.assertIn('Название ВД', rows[0])
+                self.assertLessEqual(len(rows), 3)
+                self.assertNotIn('<f>', sheet)
+                texts += re.findall(r'<t xml:space="preserve">([^<]*)</t>', sheet)
+        # Текст — строка inlineStr, без апострофа: формулой он не станет, а значение не искажается
+        self.assertEqual(texts.count('Название ВД'), 3)
+        for name in self.names:
+            self.assertIn(name, texts)
+        self.assertFalse([text for text in texts if text.startswith("'")])
+
+
+class FastJSONTests(SimpleTestCase):
+    """
+    FastJSONRenderer/FastJSONParser должны давать тот же результат, что и
+    стандартные классы DRF. Выигрыш по времени — manage.py bench_json.
+    """
+
+    data = {
+        'id': 1,
+        'name': 'Вещественное доказательство',
+        'status': _('Хранение'),
+        'uuid': uuid.UUID('12345678-1234-5678-1234-567812345678'),
+        'created': datetime.datetime(2024, 5, 1, 10, 30, 15, 123456, tzinfo=datetime.timezone.utc),
+        'naive': datetime.datetime(2024, 5, 1, 10, 30),
+        'day': datetime.date(2024, 5, 1),
+        'at': datetime.time(10, 30, 15, 500000),
+        'amount': decimal.Decimal('1234.50'),
+        'duration': datetime.timedelta(minutes=5),
+        'separator': 'a\u2028b\u2029c',
+        1: [None, True, 1.5, []],
+    }
+
+    def test_render_matches_drf(self):
+        self.assertEqual(FastJSONRenderer().render(self.data), JSONRenderer().render(self.data))
+        self.assertEqual(FastJSONRenderer().render(None), b'')
+        local = {'created': timezone.localtime(self.data['created'], datetime.timezone(datetime.timedelta(hours=5)))}
+        self.assertEqual(FastJSONRenderer().render(local), JSONRenderer().render(local))
+
+    def test_render_indent_falls_back(self):
+        media_type = 'application/json; indent=4'
+        self.assertEqual(
+            FastJSONRenderer().render(self.data, media_type), JSONRenderer().render(self.data, media_type)
+        )
+
+    def test_parse_matches_drf(self):
+        body = JSONRenderer().render(self.data)
+        self.assertEqual(FastJSONParser().parse(io.BytesIO(body)), JSONParser().parse(io.BytesIO(body)))
+        with self.assertRaises(ParseError):
+            FastJSONParser().parse(io.BytesIO(b'{"a": '))
+
+
+class RecordingTests(TransactionTestCase):
+    """
+    Запись с синтетического источника: сегменты режутся по времени, кадры
+    интервала находятся по индексу и отдаются через API потоком MJPEG.
+    """
+
+    def setUp(self):
+        root = tempfile.TemporaryDirectory()
+        self.addCleanup(root.cleanup)
+        settings = override_settings(RECORDING_ROOT=root.name, RECORDING_SEGMENT_SECONDS=1, RECORDING_QUEUE_SIZE=4)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.camera = Camera.objects.create(device_id=7, name='Комната хранения', type=CameraType.REC)
+        self.start = datetime.datetime(2024, 5, 1, 10, 0, tzinfo=datetime.timezone.utc)
+        source = FakeSource(fps=25, width=64, height=48, frames=100, realtime=False, start=self.start.timestamp())
+        recorder = recording.Recorder(self.camera, source).start()
+        recorder.join()
+        self.assertEqual(recorder.stats(), {'captured': 100, 'written': 100, 'dropped': 0})
+
+    def test_interval(self):
+        segments = RecordingSegment.objects.filter(camera=self.camera).order_by('start')
+        self.assertEqual([segment.frames for segment in segments], [25, 25, 25, 25])
+        start = self.start + datetime.timedelta(seconds=1.6)
+        end = start + datetime.timedelta(seconds=1)
+        found = recording.segments_between(self.camera.pk, start, end)
+        self.assertEqual([segment.pk for segment in found], [segments[1].pk, segments[2].pk])
+        frames = list(recording.frames_between(found, start, end))
+        self.assertEqual(len(frames), 25)
+        self.assertEqual(frames[0][0], recording.to_micros(start))
+        self.assertTrue(all(data[:2] == b'\xff\xd8' for _, data in frames))
+
+    def test_footage(self):
+        user = User.objects.create_user('head', password='x', role='REGION_HEAD', region='ASTANA')
+        client = APIClient()
+        client.force_authenticate(user)
+        url = f'/api/cameras/{self.camera.pk}/footage/'
+        response = client.get(url, {'start': '2024-05-01T10:00:01Z', 'end': '2024-05-01T10:00:03Z'})
+        self.assertEqual(response.status_code, 200)
+        body = b''.join(response.streaming_content)
+        self.assertEqual(body.count(b'--frame\r\n'), 50)
+        self.assertEqual(client.get(url, {'start': '2024-05-02'}).status_code, 400)
+        response = client.get(url, {'start': '2024-05-02', 'end': '2024-05-02'})
+        self.assertEqual(response.status_code, 404, response.content)
+        self.assertEqual(client.delete(f'/api/cameras/{self.camera.pk}/').status_code, 400)
+
+
+@override_settings(FACE_PIPELINE_WORKERS=1, FACE_SESSION_TIMEOUT=60)
+@override_settings(FACE_ALLOW_PIXEL_ENCODER=True)
+class RecognitionTests(TransactionTestCase):
+    """
+    Конвейер FACE_ID: кадры двух камер идут общими пачками, сотрудник
+    распознаётся и получает одну сессию присутствия, чужое лицо — нет.
+    С PixelProjectionEncoder без явного разрешения распознавание не запускается.
+    """
+
+    def setUp(self):
+        face_index.clear()
+        self.addCleanup(face_index.clear)
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def stream(self, seed, copies=20):
+        pixels = np.random.default_rng(seed).integers(0, 255, (96, 96, 3), dtype=np.uint8)
+        buffer = io.BytesIO()
+        Image.fromarray(pixels).save(buffer, 'JPEG', quality=95)
+        path = f'{self.directory.name}/{seed}.mjpeg'
+        with open(path, 'wb') as file:
+            file.write(buffer.getvalue() * copies)
+        return path, buffer.getvalue()
+
+    def test_presence_session(self):
+        department = Department.objects.create(name='Отделение', region='ASTANA')
+        user = User.objects.create_user('officer', password='x', department=department, region='ASTANA')
+        known, image = self.stream(1)
+        stranger, _ = self.stream(2)
+        FaceEmbedding.objects.create(user=user, vector=to_bytes(get_encoder().encode(image)))
+        door = Camera.objects.create(device_id=1, name='Вход', type=CameraType.FACE_ID)
+        hall = Camera.objects.create(device_id=2, name='Коридор', type=CameraType.FACE_ID)
+
+        pipeline = RecognitionPipeline().start()
+        pipeline.add_camera(door, MJPEGFileSource(known, fps=50))
+        pipeline.add_camera(hall, MJPEGFileSource(stranger, fps=50))
+        deadline = time.monotonic() + 5
+        while any(pipeline.cameras().values()) and time.monotonic() < deadline:
+            time.sleep(0.05)
+        time.sleep(0.2)
+        pipeline.stop()
+
+        stats = pipeline.stats()
+        self.assertEqual(stats['frames'], 40)
+        self.assertGreater(stats['matched'], 0)
+        self.assertGreater(stats['unknown'], 0)
+        self.assertEqual(stats['sessions'], 1)
+        self.assertEqual(stats['latency']['embed']['count'], stats['frames'] - stats['dropped'] - stats['stale'])
+        session = Session.objects.get()
+        self.assertEqual((session.user_id, session.camera_id, session.active), (user.pk, door.pk, False))
+        self.assertGreaterEqual(session.logout, session.login)
+
+    @override_settings(FACE_ALLOW_PIXEL_ENCODER=False)
+    def test_pixel_encoder_refused(self):
+        with self.assertRaises(ImproperlyConfigured):
+            RecognitionPipeline().start()
+        with self.assertRaises(CommandError):
+            call_command('recognize_faces', duration=0.1, stdout=io.StringIO())
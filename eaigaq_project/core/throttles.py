@@ -0,0 +1,15 @@
+# core/throttles.py
+
+from rest_framework.throttling import SimpleRateThrottle
+
+
+class BiometricAuthThrottle(SimpleRateThrottle):
+    """
+    Ограничивает попытки входа по лицу с одного адреса (rate — в
+    REST_FRAMEWORK['DEFAULT_THROTTLE_RATES']['biometric_auth']), в том числе
+    для уже вошедших пользователей.
+    """
+    scope = 'biometric_auth'
+
+    def get_cache_key(self, request, view):
+        return self.cache_format % {'scope': self.scope, 'ident': self.get_ident(request)}
@@ -6,6 +6,7 @@ from .views import (
     UserViewSet, DepartmentViewSet, CaseViewSet, MaterialEvidenceViewSet,
     MaterialEvidenceEventViewSet, SessionViewSet, CameraViewSet, AuditEntryViewSet,
     biometric_auth, get_csrf_token, login_view, logout_view, check_auth, current_user, EvidenceGroupViewSet,
+    dashboard_stats, event_stream,
 )
 from rest_framework.routers import DefaultRouter
 from .views import UserViewSet
@@ -30,6 +31,8 @@ urlpatterns = [
     path('logout/', logout_view, name='logout'),
     path('check_auth/', check_auth, name='check_auth'),
     path('current-user/', current_user, name='current_user'),
+    path('stats/', dashboard_stats, name='dashboard_stats'),
+    path('stream/', event_stream, name='event_stream'),
 ]
 
 # # core/urls.py
@@ -1,49 +1,324 @@
 # core/views.py
 
-from django.contrib.auth import authenticate, login, logout
-from django.http import JsonResponse
-from django.views.decorators.csrf import ensure_csrf_cookie
-
-from .permissions import IsCreator, IsRegionHead, IsDepartmentHead
-
-from rest_framework.exceptions import PermissionDenied
+import asyncio
+import datetime
+import hashlib
+import json
+import logging
+from collections import Counter
 
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import (
+    BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY, aauthenticate, alogin, login, logout,
+)
+from django.core.handlers.asgi import ASGIRequest
+from django.db import transaction
+from django.db.models import Count, Max, Prefetch, Q
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.utils import timezone
+from django.utils.crypto import constant_time_compare
+from django.utils.dateparse import parse_date, parse_datetime
+from django.utils.http import parse_etags, quote_etag
+from django.views.decorators.csrf import csrf_exempt, ensure_csrf_cookie
+from django.views.decorators.http import require_GET, require_POST
 from rest_framework import viewsets, permissions, status
-from rest_framework.decorators import api_view, permission_classes, action
-from rest_framework.permissions import AllowAny, IsAuthenticated
+from rest_framework.decorators import api_view, permission_classes, parser_classes, throttle_classes, action
+from rest_framework.exceptions import NotAuthenticated, NotFound, PermissionDenied, ValidationError
+from rest_framework.negotiation import DefaultContentNegotiation
+from rest_framework.parsers import MultiPartParser
+from rest_framework.permissions import AllowAny, IsAuthenticated, SAFE_METHODS
 from rest_framework.response import Response
 
+from . import (
+    audit, export as exports, labels, profiles, push, recording, scopes, search as search_index, stats, sync,
+)
+from .biometrics import face_index, get_encoder, login_enabled
+from .cache import barcode_cache
+from .permissions import IsCreator, IsRegionHead, IsDepartmentHead
+from .scopes import DEPARTMENT, REGION, ScopedQuerysetMixin, get_scope
 from .models import (
     User, Department, Case, MaterialEvidence, MaterialEvidenceEvent,
-    Session, Camera, AuditEntry, EvidenceGroup
+    Session, Camera, AuditEntry, EvidenceGroup, MaterialEvidenceStatus, Tombstone
 )
 from .serializers import (
     UserSerializer, DepartmentSerializer, CaseSerializer,
     MaterialEvidenceSerializer, MaterialEvidenceEventSerializer,
-    SessionSerializer, CameraSerializer, AuditEntrySerializer, EvidenceGroupSerializer
+    SessionSerializer, CameraSerializer, AuditEntrySerializer, EvidenceGroupSerializer, RecordingSegmentSerializer,
+    MaterialEvidenceFlatSerializer, MaterialEvidenceEventFlatSerializer,
+    MaterialEvidenceBulkItemSerializer, MaterialEvidenceBulkStatusSerializer, generate_barcodes,
 )
+from .throttles import BiometricAuthThrottle
+
+# ---------------------------
+# Query plans
+# ---------------------------
+
+# select_related, покрывающие все вложенные сериализаторы полного представления,
+# чтобы список выполнялся за постоянное число запросов
+CASE_RELATED = ('creator', 'investigator__department', 'department')
+MATERIAL_EVIDENCE_RELATED = (
+    'case__creator', 'case__investigator__department', 'case__department',
+    'created_by__department', 'group', 'last_holder',
+)
+MATERIAL_EVIDENCE_FLAT_RELATED = ('case', 'created_by', 'group', 'last_holder')
+MATERIAL_EVIDENCE_EVENT_RELATED = ('user__department',) + tuple(
+    f'material_evidence__{path}' for path in MATERIAL_EVIDENCE_RELATED
+)
+MATERIAL_EVIDENCE_EVENT_FLAT_RELATED = ('user', 'material_evidence')
+EVIDENCE_GROUP_ITEM_RELATED = ('last_holder',)
+
+
+def related_paths(paths):
+    """
+    Все связи, которые проходит select_related: ('case__department',) -> ('case', 'case__department').
+    """
+    result = []
+    for path in paths:
+        parts = path.split('__')
+        for index in range(1, len(parts) + 1):
+            prefix = '__'.join(parts[:index])
+            if prefix not in result:
+                result.append(prefix)
+    return tuple(result)
+
+# Сводка по ВД группы: всего и по каждому статусу (<status>_count)
+EVIDENCE_GROUP_COUNTS = {
+    'evidence_count': Count('id'),
+    **{
+        f'{value.lower()}_count': Count('id', filter=Q(status=value))
+        for value in MaterialEvidenceStatus.values
+    },
+}
+
+
+class SearchMixin:
+    """
+    Добавляет действие search: ранжированный поиск (?q=) по уже ограниченному
+    ролью queryset'у из get_queryset, с курсорной пагинацией по (rank, id).
+    """
+    search_query_param = 'q'
+    search_min_length = 2
+
+    @action(detail=False, methods=['get'])
+    def search(self, request):
+        query = request.query_params.get(self.search_query_param, '').strip()
+        if len(query) < self.search_min_length:
+            raise ValidationError({self.search_query_param: 'Слишком короткий поисковый запрос.'})
+        queryset = search_index.search(self.filter_queryset(self.get_queryset()), query)
+        self.pagination_ordering = ('-rank', '-id')
+        page = self.paginate_queryset(queryset)
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+
+
+def make_etag(*parts):
+    digest = hashlib.sha1(repr(parts).encode('utf-8')).hexdigest()[:32]
+    return f'W/{quote_etag(digest)}'
+
+
+def etag_matches(request, etag):
+    header = request.headers.get('If-None-Match')
+    if not header:
+        return False
+    candidates = parse_etags(header)
+    # Слабое сравнение (RFC 9110): префикс W/ не учитывается
+    return '*' in candidates or etag.removeprefix('W/') in [tag.removeprefix('W/') for tag in candidates]
+
+
+def not_modified(etag):
+    response = HttpResponse(status=status.HTTP_304_NOT_MODIFIED)
+    response['ETag'] = etag
+    return response
+
+
+class ConditionalGetMixin:
+    """
+    ETag для списка и объекта без сериализации: одним агрегатным запросом
+    max(etag_field) и count() по ограниченному ролью queryset'у (для объекта —
+    по строке с этим pk). etag_related — связи, изменения в которых тоже меняют
+    представление (вложенные дело, пользователи, отделение, ВД группы); их версия —
+    max(etag_related_field). Совпадение If-None-Match отвечает 304 до выборки
+    страницы и сериализации.
+    """
+    etag_field = 'updated'
+    etag_related = ()
+    etag_related_field = 'updated'
+
+    def get_etag(self, queryset):
+        aggregates = {'version': Max(self.etag_field), 'rows': Count('pk', distinct=True)}
+        for relation in self.etag_related:
+            aggregates[f'{relation}_version'] = Max(f'{relation}__{self.etag_related_field}')
+            aggregates[f'{relation}_rows'] = Count(relation, distinct=True)
+        state = queryset.order_by().aggregate(**aggregates)
+        if self.detail and not state['rows']:
+            # Объекта нет (или он вне области видимости) — ответ даст обычный 404
+            return None
+        user = self.request.user
+        return make_etag(
+            self.request.get_full_path(), self.request.headers.get('Accept', ''),
+            user.pk, user.role, user.region, user.department_id, sorted(state.items()),
+        )
+
+    def conditional(self, queryset, handler, *args, **kwargs):
+        etag = self.get_etag(queryset)
+        if etag is not None and etag_matches(self.request, etag):
+            return not_modified(etag)
+        response = handler(self.request, *args, **kwargs)
+        if etag is not None and response.status_code == status.HTTP_200_OK:
+            response['ETag'] = etag
+            response['Cache-Control'] = 'private, no-cache'
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional(self.filter_queryset(self.get_queryset()), super().list, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        queryset = self.filter_queryset(self.get_queryset()).filter(
+            **{self.lookup_field: self.kwargs[lookup_url_kwarg]}
+        )
+        return self.conditional(queryset, super().retrieve, *args, **kwargs)
+
+
+class DeltaSyncMixin:
+    """
+    Добавляет действие sync: изменения с отметки клиента (?since=).
+    Возвращает изменённые строки из get_queryset, id удалённых или ушедших из
+    области видимости объектов и новую отметку. Пока has_more — клиент
+    повторяет запрос с новой отметкой. Без since — полная выгрузка.
+    """
+    sync_query_param = 'since'
+
+    def get_tombstones(self):
+        tombstones = Tombstone.objects.filter(kind=self.queryset.model._meta.model_name)
+        if isinstance(self, ScopedQuerysetMixin):
+            tombstones = tombstones.filter(self.scope.q(department='department', owner='owner'))
+        return tombstones
+
+    @action(detail=False, methods=['get'])
+    def sync(self, request):
+        try:
+            watermark = sync.Watermark.decode(request.query_params.get(self.sync_query_param))
+        except ValueError as exc:
+            raise ValidationError({self.sync_query_param: str(exc)})
+        if sync.expired(watermark):
+            # Надгробия старше срока хранения удалены — дельту построить нельзя
+            return Response(
+                {'detail': 'Отметка синхронизации устарела, требуется полная синхронизация.'},
+                status=status.HTTP_410_GONE,
+            )
+        limit = self.paginator.get_page_size(request, self)
+        rows, deleted, watermark, has_more = sync.changes(
+            self.filter_queryset(self.get_queryset()), self.get_tombstones(), watermark, limit
+        )
+        serializer = self.get_serializer(rows, many=True)
+        return Response({
+            'results': serializer.data,
+            'deleted': deleted,
+            'watermark': watermark.encode(),
+            'has_more': has_more,
+        })
+
+
+def media_type_params(media_type):
+    # Параметры медиатипа: 'application/json; profile="flat"' -> {'profile': 'flat'}
+    params = {}
+    for part in media_type.split(';')[1:]:
+        key, _, value = part.partition('=')
+        params[key.strip().lower()] = value.strip().strip('"')
+    return params
+
+
+class RepresentationProfileMixin:
+    """
+    Позволяет запросить "плоское" представление списка: ?profile=flat
+    или заголовок Accept: application/json; profile=flat.
+
+    В плоском режиме используются flat_serializer_class и flat_select_related,
+    в полном — serializer_class и select_related.
+    """
+    profile_query_param = 'profile'
+    flat_serializer_class = None
+    select_related = ()
+    flat_select_related = ()
+
+    def is_flat_profile(self):
+        if self.flat_serializer_class is None:
+            return False
+        profile = self.request.query_params.get(self.profile_query_param)
+        if profile is None:
+            accepted = getattr(self.request, 'accepted_media_type', None) or ''
+            profile = media_type_params(accepted).get('profile')
+        return profile == 'flat'
+
+    def get_serializer_class(self):
+        if self.request.method in SAFE_METHODS and self.is_flat_profile():
+            return self.flat_serializer_class
+        return super().get_serializer_class()
+
+    def apply_query_plan(self, queryset):
+        if self.request.method in SAFE_METHODS and self.is_flat_profile():
+            return queryset.select_related(*self.flat_select_related)
+        return queryset.select_related(*self.select_related)
+
+class BinaryContentNegotiation(DefaultContentNegotiation):
+    """
+    Для эндпоинтов, отдающих бинарные данные: не отвечаем 406 на Accept: image/*
+    и т. п. — ответ всё равно формируется вручную.
+    """
+    def select_renderer(self, request, renderers, format_suffix=None):
+        return renderers[0], renderers[0].media_type
+
+
+class ExportMixin:
+    """
+    Добавляет действие export: весь список (с фильтрами ViewSet'а и в пределах
+    области видимости) в CSV (?as=csv, по умолчанию) или XLSX (?as=xlsx).
+    Строки читаются пачками по EXPORT_CHUNK_SIZE и сразу отдаются клиенту,
+    поэтому память не зависит от числа строк.
+    """
+    export_format_param = 'as'
+    export_columns = ()
+    export_ordering = ('id',)
+    export_filename = 'export'
+
+    def get_export_queryset(self):
+        return self.filter_queryset(self.get_queryset()).order_by(*self.export_ordering)
+
+    @action(detail=False, methods=['get'], content_negotiation_class=BinaryContentNegotiation)
+    def export(self, request):
+        file_format = request.query_params.get(self.export_format_param, exports.CSV)
+        if file_format not in exports.FORMATS:
+            raise ValidationError({self.export_format_param: f'Допустимые форматы: {", ".join(exports.FORMATS)}.'})
+        rows = exports.rows(
+            self.export_columns, self.get_export_queryset(), getattr(settings, 'EXPORT_CHUNK_SIZE', 2000)
+        )
+        if file_format == exports.XLSX:
+            content = exports.xlsx_stream(self.export_columns, rows, self.export_filename)
+        else:
+            content = exports.csv_stream(self.export_columns, rows)
+        response = StreamingHttpResponse(content, content_type=exports.FORMATS[file_format])
+        filename = f'{self.export_filename}-{timezone.localdate():%Y%m%d}.{file_format}'
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
 
 # ---------------------------
 # ViewSets for models
 # ---------------------------
 
-class UserViewSet(viewsets.ModelViewSet):
+class UserViewSet(ScopedQuerysetMixin, viewsets.ModelViewSet):
     queryset = User.objects.all()
     serializer_class = UserSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_ordering = ('-date_joined', '-id')
+    max_page_size = 200
+    # Главный по региону видит сотрудников региона, по отделению — отделения, остальные — только себя
+    scope_department = 'department'
+    scope_owner = 'id'
 
     def get_queryset(self):
-        user = self.request.user
-
-        if user.role == 'REGION_HEAD':
-            # Главный по региону видит всех сотрудников своего региона
-            return self.queryset.filter(department__region=user.region)
-        elif user.role == 'DEPARTMENT_HEAD':
-            # Главный по отделению видит всех сотрудников своего отделения
-            return self.queryset.filter(department=user.department)
-        else:
-            # Обычные пользователи видят только себя
-            return self.queryset.filter(id=user.id)
+        return self.scope_queryset(self.queryset.select_related('department'))
 
     def update(self, request, *args, **kwargs):
         user = request.user
@@ -51,33 +326,64 @@ class UserViewSet(viewsets.ModelViewSet):
 
         # Проверяем права на изменение is_active
         if 'is_active' in request.data:
-            if user.role == 'REGION_HEAD':
-                # REGION_HEAD может изменять is_active для сотрудников своего региона
-                if instance.department.region != user.region:
-                    raise PermissionDenied('Вы не можете изменять статус этого пользователя.')
-            elif user.role == 'DEPARTMENT_HEAD':
-                # DEPARTMENT_HEAD может изменять is_active для сотрудников своего отделения
-                if instance.department != user.department:
+            if user.role in ('REGION_HEAD', 'DEPARTMENT_HEAD'):
+                # Руководитель может изменять is_active для сотрудников своей области видимости
+                if not self.scope.allows(department_id=instance.department_id):
                     raise PermissionDenied('Вы не можете изменять статус этого пользователя.')
             else:
                 raise PermissionDenied('У вас нет прав для изменения этого пользователя.')
 
         return super().update(request, *args, **kwargs)
 
+    @action(
+        detail=True,
+        methods=['get', 'post', 'delete'],
+        url_path='face-data',
+        parser_classes=[MultiPartParser],
+    )
+    def face_data(self, request, pk=None):
+        # Данные лица не входят в сериализатор и наружу не отдаются: здесь только
+        # регистрация, удаление и признак наличия. Доступ — сам сотрудник или
+        # главный по региону (в пределах своей области видимости)
+        instance = self.get_object()
+        if instance.pk != request.user.pk and request.user.role != 'REGION_HEAD':
+            raise PermissionDenied('Вы не можете управлять данными лица этого пользователя.')
+
+        if request.method == 'POST':
+            image = request.FILES.get('image')
+            if image is None:
+                raise ValidationError({'image': 'Необходимо загрузить изображение.'})
+            try:
+                instance.set_face_data(image)
+            except ValueError as exc:
+                raise ValidationError({'image': str(exc)})
+            instance.save(update_fields=['face_data_digest'])
+            return Response({'has_face_data': True}, status=status.HTTP_201_CREATED)
+
+        if request.method == 'DELETE':
+            instance.clear_face_data()
+            instance.save(update_fields=['face_data_digest'])
+            return Response(status=status.HTTP_204_NO_CONTENT)
+
+        return Response({'has_face_data': instance.has_face_data})
+
     @action(detail=False, methods=['get'])
     def all_departments(self, request):
         # Для REGION_HEAD возвращаем всех сотрудников региона
         user = self.request.user
         if user.role == 'REGION_HEAD':
-            users = self.queryset.filter(department__region=user.region)
-            serializer = self.get_serializer(users, many=True)
-            return Response(serializer.data)
+            users = self.get_queryset()
+            page = self.paginate_queryset(users)
+            serializer = self.get_serializer(page, many=True)
+            return self.get_paginated_response(serializer.data)
         else:
             raise PermissionDenied('У вас нет прав для доступа к этому ресурсу.')
 
 class DepartmentViewSet(viewsets.ModelViewSet):
     queryset = Department.objects.all()
     serializer_class = DepartmentSerializer
+    pagination_ordering = ('name', 'id')
+    max_page_size = 200
 
     def get_permissions(self):
         user = self.request.user
@@ -104,9 +410,16 @@ class DepartmentViewSet(viewsets.ModelViewSet):
         else:
             self.permission_denied(self.request, message='Недостаточно прав для создания отделения')
 
-class CaseViewSet(viewsets.ModelViewSet):
+class CaseViewSet(ScopedQuerysetMixin, ConditionalGetMixin, SearchMixin, DeltaSyncMixin, viewsets.ModelViewSet):
     queryset = Case.objects.all()
     serializer_class = CaseSerializer
+    pagination_ordering = ('-created', '-id')
+    max_page_size = 100
+    # Обычный пользователь видит только свои созданные дела
+    scope_department = 'department'
+    scope_owner = 'creator'
+    # Дело отдаётся со следователем, создателем и отделением
+    etag_related = related_paths(CASE_RELATED)
 
     def get_permissions(self):
         if self.action in ['update', 'partial_update', 'destroy']:
@@ -116,42 +429,319 @@ class CaseViewSet(viewsets.ModelViewSet):
         return [permission() for permission in permission_classes]
 
     def get_queryset(self):
-        user = self.request.user
-        if user.role == 'REGION_HEAD':
-            # Главный по региону видит все дела в своем регионе
-            return Case.objects.filter(department__region=user.region).select_related('creator', 'investigator', 'department')
-        elif user.role == 'DEPARTMENT_HEAD':
-            # Главный по отделению видит все дела своего отделения
-            return Case.objects.filter(department=user.department).select_related('creator', 'investigator', 'department')
-        else:
-            # Обычный пользователь видит только свои созданные дела
-            return Case.objects.filter(creator=user).select_related('creator', 'investigator', 'department')
+        queryset = Case.objects.select_related(*CASE_RELATED)
+
+        # Фильтрация по отделению, если указан параметр 'department'
+        department_id = self.request.query_params.get('department')
+        if department_id:
+            queryset = queryset.filter(department_id=department_id)
+
+        return self.scope_queryset(queryset)
 
     def perform_create(self, serializer):
         user = self.request.user
         serializer.save(creator=user, investigator=user, department=user.department)
 
-class MaterialEvidenceViewSet(viewsets.ModelViewSet):
+    @action(detail=True, methods=['get'], url_path='custody-timeline')
+    def custody_timeline(self, request, pk=None):
+        # Хронология цепочки хранения всех ВД дела: один диапазон по индексу (case, created)
+        case = self.get_object()
+        events = MaterialEvidenceEvent.objects.filter(case=case).select_related(
+            *MATERIAL_EVIDENCE_EVENT_FLAT_RELATED
+        )
+        self.pagination_ordering = ('created', 'id')
+        page = self.paginate_queryset(events)
+        serializer = MaterialEvidenceEventFlatSerializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+
+class MaterialEvidenceViewSet(
+    ScopedQuerysetMixin, ConditionalGetMixin, SearchMixin, DeltaSyncMixin, ExportMixin, RepresentationProfileMixin,
+    viewsets.ModelViewSet,
+):
     queryset = MaterialEvidence.objects.all()
     serializer_class = MaterialEvidenceSerializer
+    flat_serializer_class = MaterialEvidenceFlatSerializer
+    select_related = MATERIAL_EVIDENCE_RELATED
+    flat_select_related = MATERIAL_EVIDENCE_FLAT_RELATED
     permission_classes = [IsAuthenticated]
+    pagination_ordering = ('-created', '-id')
+    max_page_size = 100
+    # На больших регионах COUNT(*) дороже самой страницы — считаем только по запросу (?count=1)
+    pagination_count = False
+    scope_department = 'case__department'
+    scope_owner = 'created_by'
+    etag_related = related_paths(MATERIAL_EVIDENCE_RELATED)
+    # Опись ВД: по делам, внутри дела — в порядке регистрации (индекс evidence_case_idx)
+    export_columns = exports.EVIDENCE_COLUMNS
+    export_ordering = ('case_id', 'created', 'id')
+    export_filename = 'evidence'
 
     def get_queryset(self):
-        user = self.request.user
-        queryset = super().get_queryset()
+        queryset = self.apply_query_plan(super().get_queryset())
 
         # Фильтрация по ID дела, если указан параметр 'case'
         case_id = self.request.query_params.get('case')
         if case_id:
             queryset = queryset.filter(case_id=case_id)
 
-        # Фильтрация на основе роли пользователя
-        if user.role == 'REGION_HEAD':
-            return queryset.filter(case__department__region=user.region).select_related('case', 'created_by')
-        elif user.role == 'DEPARTMENT_HEAD':
-            return queryset.filter(case__department=user.department).select_related('case', 'created_by')
+        # Фильтрация по отделению дела — для руководителя региона
+        department_id = self.request.query_params.get('department')
+        if department_id:
+            queryset = queryset.filter(case__department_id=department_id)
+
+        return self.scope_queryset(queryset)
+
+    @action(detail=False, methods=['get'], content_negotiation_class=BinaryContentNegotiation)
+    def labels(self, request):
+        """
+        Листы этикеток со штрихкодами ВД: ?case=, ?group= или ?ids=1,2,3 (можно
+        вместе), ?as=pdf (по умолчанию) или png (один лист, ?page=), ?symbology=code128|qr.
+        """
+        params = request.query_params
+        queryset = self.filter_queryset(self.get_queryset())
+        group_id = params.get('group')
+        if group_id:
+            queryset = queryset.filter(group_id=group_id)
+        ids = params.get('ids')
+        if ids:
+            try:
+                queryset = queryset.filter(pk__in=[int(pk) for pk in ids.split(',') if pk])
+            except ValueError:
+                raise ValidationError({'ids': 'Ожидается список идентификаторов через запятую.'})
+        if not (params.get('case') or group_id or ids):
+            raise ValidationError({'detail': 'Укажите дело (case), группу (group) или список ВД (ids).'})
+        file_format = params.get('as', labels.PDF)
+        if file_format not in labels.FORMATS:
+            raise ValidationError({'as': f'Допустимые форматы: {", ".join(labels.FORMATS)}.'})
+        symbology = params.get('symbology', labels.CODE128)
+        if symbology not in (labels.CODE128, labels.QR) or (symbology == labels.QR and labels.qrcode is None):
+            raise ValidationError({'symbology': 'Неподдерживаемый тип штрихкода.'})
+
+        limit = getattr(settings, 'LABEL_BATCH_LIMIT', 2000)
+        rows = list(
+            queryset.order_by('case_id', 'created', 'id').values_list('barcode', 'name', 'case__name')[:limit + 1]
+        )
+        if len(rows) > limit:
+            raise ValidationError({'detail': f'Не более {limit} этикеток за один запрос.'})
+        try:
+            page = int(params['page']) if 'page' in params else None
+            content, pages = labels.render_sheets(
+                [(barcode, (name, case_name)) for barcode, name, case_name in rows], file_format, symbology, page
+            )
+        except ValueError as exc:
+            raise ValidationError({'page': str(exc)})
+        response = HttpResponse(content, content_type=labels.FORMATS[file_format])
+        response['Content-Disposition'] = f'inline; filename="labels.{file_format}"'
+        response['X-Page-Count'] = pages
+        return response
+
+    @action(detail=False, methods=['post'], url_path='bulk')
+    def bulk(self, request):
+        """
+        Пакетная регистрация ВД: {"case_id": 1, "group_id": 2, "items": [{...}, ...]}.
+        case_id / group_id верхнего уровня применяются к элементам, где они не указаны.
+        Пакет создаётся целиком в одной транзакции вместе с событиями IN_STORAGE
+        или отклоняется с ошибками по каждому элементу.
+        """
+        user = request.user
+        items = request.data.get('items') if isinstance(request.data, dict) else None
+        if not isinstance(items, list) or not items:
+            raise ValidationError({'items': 'Ожидается непустой список ВД.'})
+        if len(items) > settings.EVIDENCE_BULK_LIMIT:
+            raise ValidationError({'items': f'Не более {settings.EVIDENCE_BULK_LIMIT} ВД за запрос.'})
+
+        defaults = {key: request.data[key] for key in ('case_id', 'group_id') if key in request.data}
+        serializer = MaterialEvidenceBulkItemSerializer(
+            data=[{**defaults, **item} if isinstance(item, dict) else item for item in items], many=True
+        )
+        if not serializer.is_valid():
+            raise ValidationError({'items': serializer.errors})
+        items = serializer.validated_data
+
+        # Все дела и группы пакета — двумя запросами
+        cases = Case.objects.in_bulk({item['case_id'] for item in items})
+        groups = EvidenceGroup.objects.in_bulk({item['group_id'] for item in items if item.get('group_id')})
+
+        errors = []
+        for item in items:
+            item_errors = {}
+            case = cases.get(item['case_id'])
+            group_id = item.get('group_id')
+            if case is None:
+                item_errors['case_id'] = 'Дело не найдено.'
+            elif case.creator_id != user.id:
+                item_errors['case_id'] = 'Вы не являетесь создателем этого дела.'
+            if group_id and (group_id not in groups or groups[group_id].case_id != item['case_id']):
+                item_errors['group_id'] = 'Группа не найдена в этом деле.'
+            errors.append(item_errors)
+        if any(errors):
+            raise ValidationError({'items': errors})
+
+        now = timezone.now()
+        evidences = [
+            MaterialEvidence(
+                name=item['name'],
+                description=item['description'],
+                case=cases[item['case_id']],
+                group=groups.get(item.get('group_id')),
+                created_by=user,
+                barcode=barcode,
+                status=MaterialEvidenceStatus.IN_STORAGE,
+                last_holder=user,
+                last_event_at=now,
+                created=now,
+            )
+            for item, barcode in zip(items, generate_barcodes(len(items)))
+        ]
+        with transaction.atomic():
+            evidences = MaterialEvidence.objects.bulk_create(evidences)
+            events = MaterialEvidenceEvent.objects.bulk_create([
+                MaterialEvidenceEvent(
+                    user=user, material_evidence=evidence, case_id=evidence.case_id,
+                    action=MaterialEvidenceStatus.IN_STORAGE, created=now,
+                )
+                for evidence in evidences
+            ])
+            # bulk_create не отправляет сигналы — обновляем поисковый индекс, счётчики и аудит сами
+            if not search_index.uses_postgres():
+                search_index.index_objects(evidences)
+            stats.apply(Counter(
+                (stats.EVIDENCE, evidence.case.department_id, evidence.status) for evidence in evidences
+            ))
+            audit.record_instances(evidences, audit.CREATE, user)
+            audit.record_instances(events, audit.CREATE, user)
+            push.publish_many(
+                {
+                    'kind': 'materialevidence', 'action': 'create', 'id': evidence.pk,
+                    'department_id': evidence.case.department_id, 'owner_id': user.id, 'case_id': evidence.case_id,
+                }
+                for evidence in evidences
+            )
+
+        serializer = MaterialEvidenceFlatSerializer(evidences, many=True)
+        return Response({'results': serializer.data}, status=status.HTTP_201_CREATED)
+
+    @action(detail=False, methods=['post'], url_path='bulk-status')
+    def bulk_status(self, request):
+        """
+        Пакетная смена статуса ВД группы, дела или списка ids/barcodes.
+        Статус меняется одним UPDATE, события пишутся одним bulk_create,
+        всё в одной транзакции.
+        """
+        serializer = MaterialEvidenceBulkStatusSerializer(
+            data=request.data, context={'limit': settings.EVIDENCE_BULK_LIMIT}
+        )
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        target = data['status']
+
+        queryset = self.get_queryset()
+        if 'group_id' in data:
+            queryset = queryset.filter(group_id=data['group_id'])
+        elif 'case_id' in data:
+            queryset = queryset.filter(case_id=data['case_id'])
+        elif 'ids' in data:
+            queryset = queryset.filter(id__in=data['ids'])
         else:
-            return queryset.filter(created_by=user).select_related('case', 'created_by')
+            queryset = queryset.filter(barcode__in=data['barcodes'])
+
+        with transaction.atomic():
+            rows = list(
+                queryset.exclude(status=target)
+                .select_for_update(of=('self',))
+                .values_list('id', 'barcode', 'case_id', 'status', 'case__department_id', 'created_by_id')
+            )
+            ids = [row[0] for row in rows]
+            if ids:
+                now = timezone.now()
+                MaterialEvidence.objects.filter(id__in=ids).update(
+                    status=target, last_holder=request.user, last_event_at=now, updated=now
+                )
+                events = MaterialEvidenceEvent.objects.bulk_create([
+                    MaterialEvidenceEvent(
+                        user=request.user, material_evidence_id=pk, case_id=case_id, action=target, created=now
+                    )
+                    for pk, _, case_id, _, _, _ in rows
+                ])
+                # UPDATE и bulk_create не отправляют сигналы — счётчики и аудит обновляем сами
+                changes = Counter()
+                for _, _, _, previous_status, department_id, _ in rows:
+                    stats.move(changes, stats.EVIDENCE, department_id, department_id, previous_status, target)
+                stats.apply(changes)
+                audit.record(
+                    audit.build_entry(
+                        MaterialEvidence(pk=pk), audit.UPDATE, request.user, {'status': [previous_status, target]}
+                    )
+                    for pk, _, _, previous_status, _, _ in rows
+                )
+                audit.record_instances(events, audit.CREATE, request.user)
+                push.publish_many(
+                    {
+                        'kind': 'materialevidence', 'action': 'update', 'id': pk,
+                        'department_id': department_id, 'owner_id': owner_id, 'case_id': case_id,
+                    }
+                    for pk, _, case_id, _, department_id, owner_id in rows
+                )
+        # Сбрасываем кэш штрихкодов
+        barcode_cache.delete_many(row[1] for row in rows)
+
+        return Response({'status': target, 'updated': len(ids), 'ids': ids})
+
+    @action(detail=False, methods=['get'], url_path=r'by-barcode/(?P<barcode>[^/]+)')
+    def by_barcode(self, request, barcode=None):
+        # Быстрый поиск по отсканированному штрихкоду
+        data = self.resolve_barcodes([barcode]).get(barcode)
+        if data is None:
+            raise NotFound('Вещественное доказательство с таким штрихкодом не найдено.')
+        return Response(data)
+
+    @action(detail=False, methods=['post'], url_path='by-barcode')
+    def by_barcode_batch(self, request):
+        # Пакетный поиск для инвентаризации: {"barcodes": [...]}
+        barcodes = request.data.get('barcodes')
+        if not isinstance(barcodes, list) or not all(isinstance(code, str) for code in barcodes):
+            raise ValidationError({'barcodes': 'Ожидается список штрихкодов.'})
+        if len(barcodes) > settings.BARCODE_BATCH_LIMIT:
+            raise ValidationError({'barcodes': f'Не более {settings.BARCODE_BATCH_LIMIT} штрихкодов за запрос.'})
+        found = self.resolve_barcodes(barcodes)
+        return Response({
+            'results': [found[code] for code in dict.fromkeys(barcodes) if code in found],
+            'missing': [code for code in dict.fromkeys(barcodes) if code not in found],
+        })
+
+    def resolve_barcodes(self, barcodes):
+        """
+        Возвращает {barcode: компактное представление} для ВД, видимых пользователю.
+        Промахи кэша загружаются одним запросом по уникальному индексу barcode.
+        """
+        entries = {}
+        missing = []
+        for code in dict.fromkeys(barcodes):
+            entry = barcode_cache.get(code)
+            if entry is None:
+                missing.append(code)
+            else:
+                entries[code] = entry
+
+        if missing:
+            queryset = MaterialEvidence.objects.filter(barcode__in=missing).select_related(
+                *MATERIAL_EVIDENCE_FLAT_RELATED
+            )
+            for evidence in queryset:
+                entry = {
+                    'data': dict(MaterialEvidenceFlatSerializer(evidence).data),
+                    'department_id': evidence.case.department_id if evidence.case else None,
+                    'created_by_id': evidence.created_by_id,
+                }
+                barcode_cache.set(evidence.barcode, entry)
+                entries[evidence.barcode] = entry
+
+        # Та же область видимости, что и в get_queryset
+        scope = self.scope
+        return {
+            code: entry['data'] for code, entry in entries.items()
+            if scope.allows(department_id=entry['department_id'], owner_id=entry['created_by_id'])
+        }
 
     def perform_create(self, serializer):
         user = self.request.user
@@ -160,48 +750,102 @@ class MaterialEvidenceViewSet(viewsets.ModelViewSet):
             self.permission_denied(self.request, message='Вы не являетесь создателем этого дела.')
         serializer.save(created_by=user)
 
-class MaterialEvidenceEventViewSet(viewsets.ModelViewSet):
+    def perform_update(self, serializer):
+        # Смена статуса всегда фиксируется событием цепочки хранения
+        previous_status = serializer.instance.status
+        instance = serializer.save()
+        if instance.status != previous_status:
+            MaterialEvidenceEvent.objects.create(
+                user=self.request.user, material_evidence=instance, case_id=instance.case_id, action=instance.status
+            )
+            instance.refresh_from_db(fields=['last_holder', 'last_event_at', 'updated'])
+
+class MaterialEvidenceEventViewSet(
+    ScopedQuerysetMixin, ConditionalGetMixin, RepresentationProfileMixin, viewsets.ModelViewSet
+):
     queryset = MaterialEvidenceEvent.objects.all()
     serializer_class = MaterialEvidenceEventSerializer
+    flat_serializer_class = MaterialEvidenceEventFlatSerializer
+    # Журнал событий только дополняется
+    http_method_names = ['get', 'post', 'head', 'options']
+    # Журнал только растёт — версии достаточно max(id) и числа строк;
+    # вложенные пользователь и ВД версионируются по updated
+    etag_field = 'id'
+    etag_related = related_paths(MATERIAL_EVIDENCE_EVENT_RELATED)
+    select_related = MATERIAL_EVIDENCE_EVENT_RELATED
+    flat_select_related = MATERIAL_EVIDENCE_EVENT_FLAT_RELATED
     permission_classes = [IsAuthenticated]
+    pagination_ordering = ('-created', '-id')
+    max_page_size = 100
+    pagination_count = False
+    # Событие хранит дело, поэтому руководителям хватает соединения с делом;
+    # обычный пользователь видит только события своих ВД
+    scope_department = 'case__department'
+    scope_owner = 'material_evidence__created_by'
 
     def get_queryset(self):
-        user = self.request.user
-        if user.role == 'REGION_HEAD':
-            # Видит все события ВД в своем регионе
-            material_evidence_ids = MaterialEvidence.objects.filter(case__department__region=user.region).values_list('id', flat=True)
-            return MaterialEvidenceEvent.objects.filter(material_evidence_id__in=material_evidence_ids).select_related('material_evidence', 'user')
-        elif user.role == 'DEPARTMENT_HEAD':
-            # Видит все события ВД в своем отделении
-            material_evidence_ids = MaterialEvidence.objects.filter(case__department=user.department).values_list('id', flat=True)
-            return MaterialEvidenceEvent.objects.filter(material_evidence_id__in=material_evidence_ids).select_related('material_evidence', 'user')
-        else:
-            # Обычный пользователь видит только события своих ВД
-            material_evidence_ids = MaterialEvidence.objects.filter(created_by=user).values_list('id', flat=True)
-            return MaterialEvidenceEvent.objects.filter(material_evidence_id__in=material_evidence_ids).select_related('material_evidence', 'user')
+        return self.scope_queryset(self.apply_query_plan(MaterialEvidenceEvent.objects.all()))
 
     def perform_create(self, serializer):
+        # Событие меняет статус и держателя ВД, поэтому добавить его можно только
+        # к ВД, которое пользователь может изменить (та же область, что у MaterialEvidenceViewSet)
+        evidence = serializer.validated_data['material_evidence']
+        if not self.scope.allows(department_id=evidence.case.department_id, owner_id=evidence.created_by_id):
+            raise NotFound('Вещественное доказательство не найдено.')
         serializer.save(user=self.request.user)
 
-class EvidenceGroupViewSet(viewsets.ModelViewSet):
+class EvidenceGroupViewSet(ScopedQuerysetMixin, ConditionalGetMixin, DeltaSyncMixin, viewsets.ModelViewSet):
     queryset = EvidenceGroup.objects.all()
     serializer_class = EvidenceGroupSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_ordering = ('-created', '-id')
+    # Вложенные ВД отдаются без дела и пользователей, так что все группы
+    # обычного дела помещаются на одну страницу
+    page_size = 50
+    max_page_size = 100
+    scope_department = 'case__department'
+    scope_owner = 'created_by'
+    # Группа отдаётся с вложенными ВД — их изменения тоже меняют ETag
+    etag_related = ('material_evidences',)
 
     def get_queryset(self):
-        user = self.request.user
         case_id = self.request.query_params.get('case')
-        queryset = self.queryset
+        # Все ВД страницы — одним запросом вместе с последним держателем
+        queryset = self.queryset.prefetch_related(
+            Prefetch(
+                'material_evidences',
+                queryset=MaterialEvidence.objects.select_related(*EVIDENCE_GROUP_ITEM_RELATED).order_by('created', 'id'),
+            )
+        )
 
         if case_id:
             queryset = queryset.filter(case_id=case_id)
 
-        if user.role == 'REGION_HEAD':
-            return queryset.filter(case__department__region=user.region)
-        elif user.role == 'DEPARTMENT_HEAD':
-            return queryset.filter(case__department=user.department)
-        else:
-            return queryset.filter(created_by=user)
+        return self.scope_queryset(queryset)
+
+    def get_serializer(self, *args, **kwargs):
+        if args and args[0] is not None:
+            self.attach_counts(args[0] if kwargs.get('many') else [args[0]])
+        return super().get_serializer(*args, **kwargs)
+
+    def attach_counts(self, groups):
+        """
+        Сводка по ВД для уже выбранных групп одним GROUP BY-запросом. Аннотации
+        на самом queryset'е групп превратили бы COUNT пагинации и агрегат ETag
+        в подзапросы с группировкой по всем строкам.
+        """
+        groups = list(groups)
+        if not groups:
+            return
+        rows = (
+            MaterialEvidence.objects.filter(group_id__in=[group.pk for group in groups])
+            .order_by().values('group_id').annotate(**EVIDENCE_GROUP_COUNTS)
+        )
+        counts = {row.pop('group_id'): row for row in rows}
+        for group in groups:
+            row = counts.get(group.pk, {})
+            for name in EVIDENCE_GROUP_COUNTS:
+                setattr(group, name, row.get(name, 0))
 
     def perform_create(self, serializer):
         user = self.request.user
@@ -213,24 +857,43 @@ class EvidenceGroupViewSet(viewsets.ModelViewSet):
 
         serializer.save(created_by=user)
 
-class SessionViewSet(viewsets.ModelViewSet):
+class SessionViewSet(ScopedQuerysetMixin, viewsets.ModelViewSet):
     queryset = Session.objects.all()
     serializer_class = SessionSerializer
     permission_classes = [IsAuthenticated]
+    pagination_ordering = ('-login', '-id')
+    max_page_size = 100
+    pagination_count = False
+    scope_region = 'user__region'
+    scope_department = 'user__department'
+    scope_owner = 'user'
 
     def get_queryset(self):
-        user = self.request.user
-        if user.role == 'REGION_HEAD':
-            return Session.objects.filter(user__region=user.region).select_related('user')
-        elif user.role == 'DEPARTMENT_HEAD':
-            return Session.objects.filter(user__department=user.department).select_related('user')
+        return self.scope_queryset(Session.objects.select_related('user__department'))
+
+def parse_moment(param, value, end=False):
+    # Дата без времени: created_to=2024-05-31 включает весь этот день
+    # (parse_datetime приняла бы и дату, поэтому она проверяется первой)
+    try:
+        day = parse_date(value)
+        if day is not None:
+            moment = datetime.datetime.combine(day + datetime.timedelta(days=1 if end else 0), datetime.time())
         else:
-            return Session.objects.filter(user=user).select_related('user')
+            moment = parse_datetime(value)
+            if moment is None:
+                raise ValueError(value)
+    except ValueError:
+        raise ValidationError({param: 'Ожидается дата (ГГГГ-ММ-ДД) или дата и время в формате ISO 8601.'})
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
 
-class CameraViewSet(viewsets.ModelViewSet):
+class CameraViewSet(ConditionalGetMixin, DeltaSyncMixin, viewsets.ModelViewSet):
     queryset = Camera.objects.all()
     serializer_class = CameraSerializer
     permission_classes = [IsAuthenticated, IsRegionHead]
+    pagination_ordering = ('-created', '-id')
+    max_page_size = 200
 
     def get_queryset(self):
         user = self.request.user
@@ -239,66 +902,259 @@ class CameraViewSet(viewsets.ModelViewSet):
         else:
             self.permission_denied(self.request, message='Недостаточно прав для доступа к камерам')
 
-class AuditEntryViewSet(viewsets.ModelViewSet):
+    def perform_destroy(self, instance):
+        # Записи камеры — доказательства, поэтому камеру с записями можно только отключить
+        if instance.segments.exists():
+            raise ValidationError('У камеры есть записи: её можно только отключить (active=false).')
+        instance.delete()
+
+    def recording_interval(self):
+        params = self.request.query_params
+        for param in ('start', 'end'):
+            if not params.get(param):
+                raise ValidationError({param: 'Обязательный параметр.'})
+        start = parse_moment('start', params['start'])
+        end = parse_moment('end', params['end'], end=True)
+        if end <= start:
+            raise ValidationError({'end': 'Конец интервала должен быть позже начала.'})
+        return start, end
+
+    @action(detail=True, methods=['get'])
+    def segments(self, request, pk=None):
+        """
+        Сегменты записи камеры за интервал ?start=&end= (дата или дата и время ISO 8601).
+        """
+        camera = self.get_object()
+        start, end = self.recording_interval()
+        segments = recording.segments_between(camera.pk, start, end)
+        return Response(RecordingSegmentSerializer(segments, many=True).data)
+
+    @action(detail=True, methods=['get'], content_negotiation_class=BinaryContentNegotiation)
+    def footage(self, request, pk=None):
+        """
+        Запись камеры за интервал ?start=&end= потоком MJPEG: кадры читаются из
+        сегментов по индексу времени и отдаются по мере чтения.
+        """
+        camera = self.get_object()
+        start, end = self.recording_interval()
+        segments = recording.segments_between(camera.pk, start, end)
+        if not segments:
+            raise NotFound('За этот интервал записей нет.')
+        response = StreamingHttpResponse(
+            recording.mjpeg_stream(recording.frames_between(segments, start, end)),
+            content_type=f'multipart/x-mixed-replace; boundary={recording.MJPEG_BOUNDARY}',
+        )
+        response['Cache-Control'] = 'private, no-store'
+        return response
+
+class AuditEntryViewSet(ScopedQuerysetMixin, ConditionalGetMixin, ExportMixin, viewsets.ReadOnlyModelViewSet):
+    # Журнал пишется только сигналами аудита (core/audit.py); через API — чтение и выгрузка
     queryset = AuditEntry.objects.all()
     serializer_class = AuditEntrySerializer
     permission_classes = [IsAuthenticated]
+    pagination_ordering = ('-created', '-id')
+    max_page_size = 500
+    pagination_count = False
+    etag_field = 'id'
+    # Регион и отделение денормализованы в записи — фильтр без соединения
+    scope_region = 'region'
+    scope_department = 'department'
+    scope_owner = 'user'
+    export_columns = exports.AUDIT_COLUMNS
+    export_ordering = ('created', 'id')
+    export_filename = 'audit'
 
     def get_queryset(self):
-        user = self.request.user
-        if user.role == 'REGION_HEAD':
-            return AuditEntry.objects.filter(user__region=user.region).select_related('user')
-        elif user.role == 'DEPARTMENT_HEAD':
-            return AuditEntry.objects.filter(user__department=user.department).select_related('user')
-        else:
-            return AuditEntry.objects.filter(user=user).select_related('user')
+        queryset = AuditEntry.objects.select_related('user__department')
+
+        # Период (?created_from=, ?created_to= — дата или дата и время); на PostgreSQL
+        # условие по created оставляет в плане только нужные месячные секции
+        for param, lookup in (('created_from', 'created__gte'), ('created_to', 'created__lt')):
+            value = self.request.query_params.get(param)
+            if value:
+                queryset = queryset.filter(**{lookup: parse_moment(param, value, end=lookup == 'created__lt')})
+
+        return self.scope_queryset(queryset)
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def dashboard_stats(request):
+    # Сводка для дашборда руководителя из таблицы счётчиков (core/stats.py)
+    scope = get_scope(request)
+    if scope.role not in (REGION, DEPARTMENT):
+        raise PermissionDenied('У вас нет прав для доступа к этому ресурсу.')
+    return Response(stats.summary(scope))
+
+async def event_stream(request):
+    """
+    Поток изменений дел, ВД, событий ВД и сессий (Server-Sent Events) в пределах
+    области видимости пользователя. ?kinds=case,materialevidence — фильтр по типам.
+    Работает только под ASGI: соединение долгое и не должно занимать поток WSGI.
+    Область видимости перепроверяется раз в PUSH_SCOPE_REFRESH секунд; если она
+    изменилась (или пользователь отключён), клиент получает resync и поток закрывается.
+    """
+    if not isinstance(request, ASGIRequest) or not push.enabled():
+        return JsonResponse({'detail': 'Поток изменений недоступен в этом режиме развёртывания.'}, status=503)
+    user = await request.auser()
+    if not user.is_authenticated:
+        return JsonResponse({'detail': 'Требуется аутентификация.'}, status=401)
+    scope = await sync_to_async(scopes.resolve)(user)
+    kinds = {kind for kind in request.GET.get('kinds', '').split(',') if kind}
+    heartbeat = getattr(settings, 'PUSH_HEARTBEAT', 20)
+    refresh = getattr(settings, 'PUSH_SCOPE_REFRESH', 60)
+    subscription = push.get_broker().subscribe()
+    loop = asyncio.get_running_loop()
+
+    async def scope_changed():
+        current = await User.objects.filter(pk=user.pk, is_active=True).afirst()
+        if current is None:
+            return True
+        fresh = await sync_to_async(scopes.resolve)(current)
+        return (fresh.role, fresh.region, fresh.department_id, fresh.department_ids) != (
+            scope.role, scope.region, scope.department_id, scope.department_ids
+        )
+
+    async def events():
+        refresh_at = loop.time() + refresh
+        try:
+            yield 'retry: 5000\n\n'
+            while True:
+                if loop.time() >= refresh_at:
+                    if await scope_changed():
+                        # Переподключение откроет поток уже с новой областью видимости
+                        yield f"event: {push.RESYNC['kind']}\ndata: {json.dumps(push.RESYNC)}\n\n"
+                        return
+                    refresh_at = loop.time() + refresh
+                try:
+                    message = await asyncio.wait_for(subscription.get(), timeout=heartbeat)
+                except asyncio.TimeoutError:
+                    # Комментарий SSE держит соединение открытым через прокси
+                    yield ': ping\n\n'
+                    continue
+                if message is not push.RESYNC and kinds and message['kind'] not in kinds:
+                    continue
+                if not push.visible(scope, message):
+                    continue
+                data = {key: value for key, value in message.items() if key not in ('department_id', 'owner_id')}
+                yield f"event: {message['kind']}\ndata: {json.dumps(data)}\n\n"
+        finally:
+            subscription.close()
+
+    response = StreamingHttpResponse(events(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+auth_logger = logging.getLogger('core.auth')
 
 # ---------------------------
 # Authentication and CSRF Views
 # ---------------------------
 
-# Заглушка для биометрической аутентификации
 @api_view(['POST'])
 @permission_classes([AllowAny])
+@parser_classes([MultiPartParser])
+@throttle_classes([BiometricAuthThrottle])
 def biometric_auth(request):
-    # TODO: Реализовать биометрическую аутентификацию позже
-    return Response({'message': 'Biometric authentication placeholder'})
+    # Вход по лицу: идентификация 1:N по индексу активных пользователей,
+    # опционально в пределах региона (region) и отделения (department_id).
+    # Выключен, пока не задан FACE_LOGIN_ENABLED и настоящий кодировщик
+    if not login_enabled():
+        return JsonResponse({'detail': 'Вход по лицу отключён.'}, status=404)
+    image = request.FILES.get('image')
+    if image is None:
+        return JsonResponse({'detail': 'Необходимо загрузить изображение.'}, status=400)
+    region = request.data.get('region') or None
+    department_id = request.data.get('department_id') or None
+    try:
+        department_id = int(department_id) if department_id is not None else None
+        vector = get_encoder().encode(image)
+    except ValueError:
+        return JsonResponse({'detail': 'Некорректные данные запроса.'}, status=400)
 
+    user_id, score = face_index.identify(vector, region=region, department_id=department_id)
+    user = User.objects.filter(pk=user_id, is_active=True).first() if user_id else None
+    if user is None:
+        return JsonResponse({'detail': 'Лицо не распознано'}, status=401)
+    login(request, user, backend='core.backends.ModelBackend')
+    return JsonResponse({'detail': 'Authentication successful'})
+
+# get_csrf_token, login_view, check_auth и current_user вызываются при каждой
+# загрузке страницы (AuthContext.js) — это нативные async-представления Django:
+# под ASGI они не занимают поток, а хеширование пароля уходит в пул core.backends.
+
+@require_GET
 @ensure_csrf_cookie
-@api_view(['GET'])
-@permission_classes([AllowAny])
-def get_csrf_token(request):
+async def get_csrf_token(request):
     return JsonResponse({'detail': 'CSRF cookie set'})
 
-@api_view(['POST'])
-@permission_classes([AllowAny])
-def login_view(request):
-    username = request.data.get('username')
-    password = request.data.get('password')
-    print(f"Попытка входа: {username}")
-    user = authenticate(request, username=username, password=password)
-    if user is not None:
-        print(f"Успешная аутентификация для пользователя: {user.username}")
-        login(request, user)
-        return JsonResponse({'detail': 'Authentication successful'})
-    else:
-        print(f"Аутентификация не удалась для пользователя: {username}")
+def _request_data(request):
+    if request.content_type == 'application/json':
+        try:
+            data = json.loads(request.body or b'{}')
+        except ValueError:
+            return None
+        return data if isinstance(data, dict) else None
+    return request.POST
+
+# login_view, check_auth и current_user асинхронные: в docker-compose nginx направляет
+# их в сервис asgi (uvicorn), под WSGI они работают через async_to_sync.
+# Как и прежнее DRF-представление, вход не требует CSRF-токена: у анонимного
+# пользователя нет сессии, которую можно было бы подделать
+@csrf_exempt
+@require_POST
+async def login_view(request):
+    data = _request_data(request)
+    if data is None:
+        return JsonResponse({'detail': 'Некорректные данные запроса.'}, status=400)
+    username = data.get('username')
+    user = await aauthenticate(request, username=username, password=data.get('password'))
+    if user is None:
+        auth_logger.info('Аутентификация не удалась', extra={'event': 'login_failed', 'username': username})
         return JsonResponse({'detail': 'Invalid credentials'}, status=401)
+    await alogin(request, user)
+    auth_logger.info('Успешная аутентификация', extra={'event': 'login', 'username': user.username, 'user_id': user.pk})
+    return JsonResponse({'detail': 'Authentication successful'})
 
 @api_view(['POST'])
 def logout_view(request):
     logout(request)
     return JsonResponse({'detail': 'Logout successful'})
 
-@api_view(['GET'])
-def check_auth(request):
-    if request.user.is_authenticated:
+@require_GET
+async def check_auth(request):
+    user = await request.auser()
+    if user.is_authenticated:
         return JsonResponse({'is_authenticated': True})
     else:
         return JsonResponse({'is_authenticated': False}, status=401)
 
-@api_view(['GET'])
-@permission_classes([IsAuthenticated])
-def current_user(request):
-    serializer = UserSerializer(request.user)
-    return Response(serializer.data)
+async def _cached_profile(request):
+    # Профиль из кэша годится, только если сессия прошла бы ту же проверку,
+    # что и в get_user(): известный бэкенд и хэш пароля на момент входа
+    user_id = await request.session.aget(SESSION_KEY)
+    if user_id is None or await request.session.aget(BACKEND_SESSION_KEY) not in settings.AUTHENTICATION_BACKENDS:
+        return None
+    profile = await profiles.aget(user_id)
+    if profile is None or not constant_time_compare(
+        await request.session.aget(HASH_SESSION_KEY, ''), profile['session_hash']
+    ):
+        return None
+    return profile
+
+@require_GET
+async def current_user(request):
+    # Частый случай — готовый JSON из кэша профилей без запросов к БД
+    profile = await _cached_profile(request)
+    if profile is None:
+        user = await request.auser()
+        if not user.is_authenticated:
+            return JsonResponse({'detail': str(NotAuthenticated.default_detail)}, status=403)
+        # Сериализатор читает отделение — синхронный ORM
+        profile = await sync_to_async(profiles.build)(user)
+    if etag_matches(request, profile['etag']):
+        return not_modified(profile['etag'])
+    response = HttpResponse(profile['body'], content_type='application/json')
+    response['ETag'] = profile['etag']
+    response['Cache-Control'] = 'private, no-cache'
+    return response
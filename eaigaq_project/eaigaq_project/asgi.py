@@ -1,4 +1,6 @@
 # eaigaq_project/eaigaq_project/asgi.py
+# Поток изменений /api/stream/ работает только под ASGI-сервером с PUSH_ENABLED=True:
+# в docker-compose это сервис asgi (uvicorn eaigaq_project.asgi:application).
 import os
 
 from django.core.asgi import get_asgi_application
@@ -1,5 +1,6 @@
 # eaigaq_project/eaigaq_project/settings.py
 
+import json
 import os
 from pathlib import Path
 from dotenv import load_dotenv
@@ -61,6 +62,24 @@ REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
+    # JSON через orjson (core/renderers.py, core/parsers.py); без orjson — стандартный json.
+    # Вернуть стандартные классы: rest_framework.renderers.JSONRenderer / rest_framework.parsers.JSONParser
+    'DEFAULT_RENDERER_CLASSES': [
+        'core.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'core.parsers.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
+    # Курсорная пагинация для всех списков (размер страницы можно переопределить во ViewSet)
+    'DEFAULT_PAGINATION_CLASS': 'core.pagination.KeysetPagination',
+    'PAGE_SIZE': 20,
+    # Частота попыток входа по лицу с одного адреса (core/throttles.py)
+    'DEFAULT_THROTTLE_RATES': {
+        'biometric_auth': os.environ.get('BIOMETRIC_AUTH_RATE', '5/min'),
+    },
 }
 
 # Middleware
@@ -71,6 +90,7 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',       # Убедитесь, что этот middleware не дублируется
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'core.audit.AuditUserMiddleware',                   # Текущий пользователь для журнала аудита
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -122,6 +142,8 @@ else:
 
 # Если используется PostgreSQL, проверяем, что параметры базы данных загружены
 if DATABASES['default']['ENGINE'] == 'django.db.backends.postgresql':
+    # Триграммные и полнотекстовые lookup'ы для поиска (core/search.py)
+    INSTALLED_APPS.append('django.contrib.postgres')
     if not DATABASES['default']['USER']:
         raise ValueError("Необходимо установить DB_USER в переменных окружения")
     if not DATABASES['default']['PASSWORD']:
@@ -130,6 +152,10 @@ if DATABASES['default']['ENGINE'] == 'django.db.backends.postgresql':
 # Валидация паролей
 AUTH_USER_MODEL = 'core.User'
 
+# Асинхронный вход проверяет пароль в ограниченном пуле потоков (core/backends.py)
+AUTHENTICATION_BACKENDS = ['core.backends.ModelBackend']
+AUTH_HASH_WORKERS = int(os.environ.get('AUTH_HASH_WORKERS', 4))
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -165,6 +191,106 @@ STATIC_URL = '/static/'
 # Место для сбора статических файлов
 STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
 
+# Хранилище данных лица (файлы адресуются по SHA-256 содержимого)
+FACE_DATA_ROOT = os.environ.get('FACE_DATA_ROOT', os.path.join(BASE_DIR, 'face_data'))
+
+# Этикетки со штрихкодами: кэш готовых изображений на диске, раскладка листа A4
+# и пул процессов для больших пачек (от LABEL_POOL_THRESHOLD этикеток)
+LABEL_CACHE_ROOT = os.environ.get('LABEL_CACHE_ROOT', os.path.join(BASE_DIR, 'label_cache'))
+LABEL_FONT = os.environ.get('LABEL_FONT', '/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf')
+LABEL_DPI = 300
+LABEL_GRID = (2, 8)  # колонки и строки: этикетки 100 x 36 мм
+LABEL_PAGE_MARGIN_MM = 5
+LABEL_RENDER_WORKERS = int(os.environ.get('LABEL_RENDER_WORKERS', os.cpu_count() or 1))
+LABEL_POOL_THRESHOLD = 50
+LABEL_BATCH_LIMIT = 2000
+
+# Запись камер типа REC (manage.py record_cameras): сегменты кадров JPEG на локальном
+# диске с индексом по времени. CAMERA_SOURCES — JSON {device_id: адрес источника},
+# см. core.cameras.open_source; без записи камера читается с устройства /dev/video<device_id>
+RECORDING_ROOT = os.environ.get('RECORDING_ROOT', os.path.join(BASE_DIR, 'recordings'))
+RECORDING_SEGMENT_SECONDS = 300
+RECORDING_SEGMENT_BYTES = 256 * 1024 * 1024
+RECORDING_WORKERS = int(os.environ.get('RECORDING_WORKERS', 2))  # потоков сжатия на камеру
+RECORDING_QUEUE_SIZE = 50  # кадров в обработке на камеру
+RECORDING_JPEG_QUALITY = 80
+CAMERA_SOURCES = json.loads(os.environ.get('CAMERA_SOURCES', '{}'))
+
+# Биометрическая аутентификация. Вход по лицу (biometric-auth/) выключен по умолчанию.
+# PixelProjectionEncoder не отличает похожие лица настолько надёжно, чтобы по нему
+# выдавать сессию, поэтому с ним не работают ни вход, ни распознавание с камер
+# (recognize_faces): для обоих нужен нейросетевой кодировщик в FACE_EMBEDDING_ENCODER.
+# FACE_ALLOW_PIXEL_ENCODER разрешает его распознаванию — только для тестов и разработки
+FACE_LOGIN_ENABLED = os.environ.get('FACE_LOGIN_ENABLED', 'False') == 'True'
+FACE_EMBEDDING_ENCODER = os.environ.get('FACE_EMBEDDING_ENCODER', 'core.biometrics.PixelProjectionEncoder')
+FACE_ALLOW_PIXEL_ENCODER = False
+FACE_MATCH_THRESHOLD = float(os.environ.get('FACE_MATCH_THRESHOLD', '0.9'))
+# Через сколько секунд индекс лиц перечитывается из БД (изменения из других процессов)
+FACE_INDEX_MAX_AGE = int(os.environ.get('FACE_INDEX_MAX_AGE', '300'))
+# Распознавание с камер FACE_ID (manage.py recognize_faces, core/recognition.py):
+# детектор лиц (core.recognition.HaarCascadeDetector — при установленном OpenCV),
+# процессы обнаружения и кодирования, пачка кадров, возраст, после которого кадр
+# устарел, и сколько секунд без распознаваний закрывает сессию присутствия
+FACE_DETECTOR = os.environ.get('FACE_DETECTOR', 'core.recognition.WholeFrameDetector')
+FACE_PIPELINE_WORKERS = int(os.environ.get('FACE_PIPELINE_WORKERS', os.cpu_count() or 1))
+FACE_PIPELINE_BATCH_SIZE = 32
+FACE_FRAME_MAX_AGE = 1.0  # секунды
+FACE_SESSION_TIMEOUT = 60  # секунды
+
+# Процессный кэш поиска ВД по штрихкоду
+BARCODE_CACHE_SIZE = int(os.environ.get('BARCODE_CACHE_SIZE', '10000'))
+BARCODE_CACHE_TTL = int(os.environ.get('BARCODE_CACHE_TTL', '60'))
+# Максимальное число штрихкодов в одном пакетном запросе
+BARCODE_BATCH_LIMIT = 1000
+# Максимальное число ВД в одном запросе пакетной регистрации
+EVIDENCE_BULK_LIMIT = 1000
+# Выгрузка CSV/XLSX: строк в одной пачке чтения из БД
+EXPORT_CHUNK_SIZE = 2000
+
+# Кэш Django: по умолчанию память процесса; CACHE_BACKEND/CACHE_LOCATION — например,
+# django.core.cache.backends.redis.RedisCache и redis://redis:6379/1
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get('CACHE_LOCATION', 'eaigaq'),
+    },
+}
+# Сессии читаются из кэша, в БД — только при промахе, и только если кэш общий для
+# всех процессов: с locmem другие воркеры видели бы устаревшую сессию после выхода
+SHARED_CACHE = CACHES['default']['BACKEND'] not in (
+    'django.core.cache.backends.locmem.LocMemCache', 'django.core.cache.backends.dummy.DummyCache',
+)
+SESSION_ENGINE = (
+    'django.contrib.sessions.backends.cached_db' if SHARED_CACHE else 'django.contrib.sessions.backends.db'
+)
+# Готовый JSON профиля для /api/current-user/, сбрасывается сигналами User/Department.
+# Только с общим кэшем (CACHE_BACKEND — Redis и т. п.); с locmem профиль не кэшируется
+PROFILE_CACHE_ALIAS = 'default'
+PROFILE_CACHE_TTL = 300  # секунды
+
+# Процессный кэш областей видимости пользователей (роль, регион, отделения региона).
+# Версия состава отделений — в кэше SCOPE_CACHE_ALIAS, общем для процессов при Redis
+SCOPE_CACHE_SIZE = 4096
+SCOPE_CACHE_TTL = int(os.environ.get('SCOPE_CACHE_TTL', '30'))
+SCOPE_CACHE_ALIAS = 'default'
+
+# Дельта-синхронизация: запас на незафиксированные транзакции и срок хранения надгробий
+SYNC_WATERMARK_LAG = 5  # секунды
+SYNC_TOMBSTONE_RETENTION_DAYS = 30
+
+# Поток изменений (SSE, только под ASGI): в docker-compose его обслуживает сервис asgi,
+# а публикуют изменения все процессы, поэтому там PUSH_ENABLED=True и PostgresBroker.
+# PUSH_BROKER — core.push.LocalBroker (один процесс) или core.push.PostgresBroker (LISTEN/NOTIFY)
+PUSH_ENABLED = os.environ.get('PUSH_ENABLED', 'False') == 'True'
+PUSH_BROKER = os.environ.get('PUSH_BROKER', 'core.push.LocalBroker')
+PUSH_QUEUE_SIZE = 1000
+PUSH_HEARTBEAT = 20  # секунды
+PUSH_SCOPE_REFRESH = 60  # секунды: как часто поток перепроверяет область видимости
+
+# Записи аудита кладутся в очередь (AuditOutbox) в транзакции изменения;
+# drain_audit переносит их в журнал пачками по AUDIT_BATCH_SIZE
+AUDIT_BATCH_SIZE = 500
+
 # Тип первичного ключа по умолчанию
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
@@ -172,10 +298,27 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 LOGGING = {
     'version': 1,
     'disable_existing_loggers': False,
+    'formatters': {
+        'structured': {
+            '()': 'core.log.StructuredFormatter',
+        },
+    },
     'handlers': {
         'console': {
             'class': 'logging.StreamHandler',
         },
+        # Входы и выходы: JSON-строки, запись в stdout в фоновом потоке
+        'auth': {
+            'class': 'core.log.NonBlockingHandler',
+            'formatter': 'structured',
+        },
+    },
+    'loggers': {
+        'core.auth': {
+            'handlers': ['auth'],
+            'level': 'INFO',
+            'propagate': False,
+        },
     },
     'root': {
         'handlers': ['console'],
@@ -2,6 +2,7 @@
 
 import React, { useState, useEffect, useContext } from 'react';
 import axios from '../axiosConfig';
+import { fetchPage } from '../pagination';
 import {
   Typography,
   Container,
@@ -23,6 +24,7 @@ import { AuthContext } from '../contexts/AuthContext';
 const AllEmployeesPage = () => {
   const { user } = useContext(AuthContext);
   const [employees, setEmployees] = useState([]);
+  const [employeesNext, setEmployeesNext] = useState(null);
   const [selectedEmployee, setSelectedEmployee] = useState(null);
   const [snackbar, setSnackbar] = useState({ open: false, message: '', severity: 'success' });
   const navigate = useNavigate();
@@ -32,16 +34,28 @@ const AllEmployeesPage = () => {
       navigate('/');
     }
 
-    axios
-      .get('/api/users/all_departments/')
-      .then((response) => {
-        setEmployees(response.data);
+    fetchPage('/api/users/all_departments/')
+      .then(({ results, next }) => {
+        setEmployees(results);
+        setEmployeesNext(next);
       })
       .catch((error) => {
         console.error('Ошибка при загрузке сотрудников:', error);
       });
   }, [user, navigate]);
 
+  // Следующая страница сотрудников дописывается в конец таблицы
+  const handleLoadMore = () => {
+    fetchPage(employeesNext)
+      .then(({ results, next }) => {
+        setEmployees((prev) => [...prev, ...results]);
+        setEmployeesNext(next);
+      })
+      .catch((error) => {
+        setSnackbar({ open: true, message: 'Ошибка при загрузке сотрудников.', severity: 'error' });
+      });
+  };
+
   const handleEmployeeSelect = (employee) => {
     if (selectedEmployee && selectedEmployee.id === employee.id) {
       setSelectedEmployee(null);
@@ -130,6 +144,14 @@ const AllEmployeesPage = () => {
         </Table>
       </TableContainer>
 
+      {employeesNext && (
+        <Box sx={{ display: 'flex', justifyContent: 'center', mt: 2 }}>
+          <Button variant="outlined" onClick={handleLoadMore}>
+            Загрузить ещё
+          </Button>
+        </Box>
+      )}
+
       {/* Snackbar для уведомлений */}
       <Snackbar
         open={snackbar.open}
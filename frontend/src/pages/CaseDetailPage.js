@@ -2,6 +2,7 @@
 
 import React, { useEffect, useState, useContext } from 'react';
 import axios from '../axiosConfig';
+import { fetchAllPages } from '../pagination';
 import { useParams, useNavigate } from 'react-router-dom';
 import {
   Typography,
@@ -68,11 +69,10 @@ const CaseDetailPage = () => {
         setSnackbar({ open: true, message: 'Ошибка при загрузке дела.', severity: 'error' });
       });
 
-    // Получаем группы и связанные с ними вещественные доказательства
-    axios
-      .get(`/api/evidence-groups/?case=${id}`)
-      .then((response) => {
-        setGroups(response.data);
+    // Получаем группы и связанные с ними вещественные доказательства (все страницы)
+    fetchAllPages('/api/evidence-groups/', { params: { case: id } })
+      .then((results) => {
+        setGroups(results);
       })
       .catch((error) => {
         console.error('Ошибка при получении групп:', error);
@@ -2,6 +2,7 @@
 
 import React, { useEffect, useState, useContext, useCallback } from 'react';
 import axios from '../axiosConfig';
+import { fetchAllPages, fetchPage } from '../pagination';
 import { useNavigate } from 'react-router-dom';
 import {
   Typography,
@@ -46,11 +47,15 @@ const Dashboard = () => {
   const { user, logout } = useContext(AuthContext);
   const theme = useTheme();
   const [cases, setCases] = useState([]);
+  const [casesNext, setCasesNext] = useState(null);
   const [filteredCases, setFilteredCases] = useState([]);
+  const [filteredCasesNext, setFilteredCasesNext] = useState(null);
   const [searchQuery, setSearchQuery] = useState('');
   const [selectedDepartment, setSelectedDepartment] = useState('');
   const [employees, setEmployees] = useState([]);
+  const [employeesNext, setEmployeesNext] = useState(null);
   const [departments, setDepartments] = useState([]);
+  const [stats, setStats] = useState(null);
   const [newCase, setNewCase] = useState({ name: '', description: '' });
   const [newEmployee, setNewEmployee] = useState({
     username: '',
@@ -81,12 +86,10 @@ const Dashboard = () => {
 
     // Загрузка дел
     const casesUrl = '/api/cases/';
-    axios
-      .get(casesUrl)
-      .then((response) => {
-        console.log('Полученные дела:', response.data);
-        setCases(response.data);
-        setFilteredCases(response.data);
+    fetchPage(casesUrl)
+      .then(({ results, next }) => {
+        setCases(results);
+        setCasesNext(next);
       })
       .catch((error) => {
         if (error.response && error.response.status === 401) {
@@ -96,31 +99,37 @@ const Dashboard = () => {
         }
       });
 
-    // Загрузка сотрудников
-    if (user.role === 'DEPARTMENT_HEAD') {
+    // Сводка для руководителя: счётчики считаются на сервере
+    if (user.role === 'DEPARTMENT_HEAD' || user.role === 'REGION_HEAD') {
       axios
-        .get('/api/users/')
+        .get('/api/stats/')
         .then((response) => {
-          setEmployees(response.data);
+          setStats(response.data);
         })
         .catch((error) => {
-          setError('Ошибка при загрузке сотрудников.');
+          setError('Ошибка при загрузке статистики.');
         });
-    } else if (user.role === 'REGION_HEAD') {
-      axios
-        .get('/api/users/all_departments/')
-        .then((response) => {
-          setEmployees(response.data);
+    }
+
+    // Загрузка сотрудников
+    if (user.role === 'DEPARTMENT_HEAD' || user.role === 'REGION_HEAD') {
+      const employeesUrl =
+        user.role === 'REGION_HEAD' ? '/api/users/all_departments/' : '/api/users/';
+      fetchPage(employeesUrl)
+        .then(({ results, next }) => {
+          setEmployees(results);
+          setEmployeesNext(next);
         })
         .catch((error) => {
           setError('Ошибка при загрузке сотрудников.');
         });
+    }
 
-      // Загрузка отделений региона
-      axios
-        .get('/api/departments/')
-        .then((response) => {
-          setDepartments(response.data);
+    if (user.role === 'REGION_HEAD') {
+      // Загрузка отделений региона: список для фильтра и формы нужен целиком
+      fetchAllPages('/api/departments/')
+        .then((results) => {
+          setDepartments(results);
         })
         .catch((error) => {
           setError('Ошибка при загрузке отделений.');
@@ -128,37 +137,74 @@ const Dashboard = () => {
     }
   }, [navigate, user]);
 
-  // Фильтрация дел
+  // Фильтрация дел: поиск и фильтр по отделению выполняются на сервере
   const filterCases = useCallback(
     (searchValue, departmentValue) => {
-      let filtered = [...cases];
+      const query = searchValue.trim();
+      if (!query && !departmentValue) {
+        setFilteredCases(cases);
+        setFilteredCasesNext(casesNext);
+        return;
+      }
 
+      const params = {};
       if (departmentValue) {
-        filtered = filtered.filter((caseItem) => {
-          if (caseItem.department && caseItem.department.id) {
-            return caseItem.department.id === parseInt(departmentValue);
-          }
-          return false;
-        });
+        params.department = departmentValue;
       }
-
-      if (searchValue) {
-        const lowercasedValue = searchValue.toLowerCase();
-        filtered = filtered.filter(
-          (caseItem) =>
-            caseItem.name.toLowerCase().includes(lowercasedValue) ||
-            (caseItem.creator_name &&
-              caseItem.creator_name.toLowerCase().includes(lowercasedValue))
-        );
+      let url = '/api/cases/';
+      if (query.length >= 2) {
+        url = '/api/cases/search/';
+        params.q = query;
       }
 
-      setFilteredCases(filtered);
+      fetchPage(url, { params })
+        .then(({ results, next }) => {
+          setFilteredCases(results);
+          setFilteredCasesNext(next);
+        })
+        .catch((error) => {
+          setError('Ошибка при поиске дел.');
+        });
     },
-    [cases]
+    [cases, casesNext]
   );
 
+  // «Загрузить ещё»: следующая страница дописывается в конец таблицы.
+  // Без поиска и фильтра страница идёт в общий список дел, иначе — в результаты поиска
+  const handleLoadMoreCases = () => {
+    const unfiltered = !searchQuery.trim() && !selectedDepartment;
+    fetchPage(filteredCasesNext)
+      .then(({ results, next }) => {
+        if (unfiltered) {
+          setCases((prev) => [...prev, ...results]);
+          setCasesNext(next);
+        } else {
+          setFilteredCases((prev) => [...prev, ...results]);
+          setFilteredCasesNext(next);
+        }
+      })
+      .catch((error) => {
+        setError('Ошибка при загрузке дел.');
+      });
+  };
+
+  const handleLoadMoreEmployees = () => {
+    fetchPage(employeesNext)
+      .then(({ results, next }) => {
+        setEmployees((prev) => [...prev, ...results]);
+        setEmployeesNext(next);
+      })
+      .catch((error) => {
+        setError('Ошибка при загрузке сотрудников.');
+      });
+  };
+
   useEffect(() => {
-    filterCases(searchQuery, selectedDepartment);
+    // Небольшая задержка, чтобы не отправлять запрос на каждое нажатие клавиши
+    const timer = setTimeout(() => {
+      filterCases(searchQuery, selectedDepartment);
+    }, 300);
+    return () => clearTimeout(timer);
   }, [searchQuery, selectedDepartment, cases, filterCases]);
 
   const handleLogout = async () => {
@@ -391,6 +437,26 @@ const Dashboard = () => {
       <Container
         sx={{ marginTop: theme.spacing(12), paddingTop: theme.spacing(4) }}
       >
+        {/* Сводка */}
+        {stats && (
+          <Paper sx={{ p: theme.spacing(2), mb: theme.spacing(3) }}>
+            <Box sx={{ display: 'flex', flexWrap: 'wrap', gap: theme.spacing(4) }}>
+              <Typography variant="body1">
+                Дел: <strong>{stats.cases.total}</strong>
+              </Typography>
+              <Typography variant="body1">
+                Вещественных доказательств: <strong>{stats.evidence.total}</strong>
+              </Typography>
+              <Typography variant="body1">
+                На хранении: <strong>{stats.evidence.by_status.IN_STORAGE}</strong>
+              </Typography>
+              <Typography variant="body1">
+                Активных сессий: <strong>{stats.active_sessions.total}</strong>
+              </Typography>
+            </Box>
+          </Paper>
+        )}
+
         {/* Вкладки */}
         {user &&
         (user.role === 'DEPARTMENT_HEAD' || user.role === 'REGION_HEAD') ? (
@@ -612,6 +678,14 @@ const Dashboard = () => {
               </TableContainer>
             </Paper>
 
+            {filteredCasesNext && (
+              <Box sx={{ display: 'flex', justifyContent: 'center', mt: 2 }}>
+                <Button variant="outlined" onClick={handleLoadMoreCases}>
+                  Загрузить ещё
+                </Button>
+              </Box>
+            )}
+
             {/* Диалоговое окно для добавления нового дела */}
             {user.role !== 'REGION_HEAD' && (
               <Dialog
@@ -749,6 +823,14 @@ const Dashboard = () => {
                 </TableContainer>
               </Paper>
 
+              {employeesNext && (
+                <Box sx={{ display: 'flex', justifyContent: 'center', mt: 2 }}>
+                  <Button variant="outlined" onClick={handleLoadMoreEmployees}>
+                    Загрузить ещё
+                  </Button>
+                </Box>
+              )}
+
               {/* Диалоговое окно для добавления нового сотрудника */}
               <Dialog
                 open={openEmployeeDialog}
@@ -0,0 +1,23 @@
+// src/pagination.js
+
+import axios from './axiosConfig';
+
+// Списки API отдаются курсорными страницами: { next, previous, results }.
+// next — готовая ссылка на следующую страницу (с курсором и исходными параметрами).
+
+// Следующая страница списка: для кнопки «Загрузить ещё»
+export const fetchPage = async (url, config) => {
+  const response = await axios.get(url, config);
+  return { results: response.data.results, next: response.data.next };
+};
+
+// Все страницы подряд: для выпадающих списков и данных, которые нужны целиком
+export const fetchAllPages = async (url, config) => {
+  let page = await fetchPage(url, config);
+  let results = page.results;
+  while (page.next) {
+    page = await fetchPage(page.next);
+    results = results.concat(page.results);
+  }
+  return results;
+};